@@ -1,19 +1,69 @@
+import json
+import os
 import socket
 import sys
+import time
 
 sys.path.append('../')
 from shared.protocol import *
 from shared.exceptions import NetworkException
+from shared.tracing import tracer
+
+OFFER_WINDOW = 0.3    # Seconds to keep collecting offers after the first one arrives
+PROBE_TIMEOUT = 0.5   # Seconds allowed for a TCP connect-time probe
+CACHE_TTL = 300       # Seconds a server stays in the cache without being seen again
+KEEPALIVE_IDLE = 30   # Seconds of silence before TCP keepalive probes start
+
+
+def default_cache_path():
+    """Per-user server cache: $XDG_CACHE_HOME/blackjack/servers.json (~/.cache by default)."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "blackjack", "servers.json")
+
 
 class Client:
-    def __init__(self):
+    def __init__(self, cache_path=None, probe_rtt=False):
         self.tcp_socket = None
         self.server_ip = None
         self.server_port = None
         self.status = 0
+        # Known servers: "ip:port" -> {ip, port, name, active, capacity, seen, rtt}.
+        # Persisted to cache_path (if given) so a new run can skip discovery.
+        self.cache_path = cache_path
+        # Connect to the candidates to time them (and weed out dead ones) before choosing.
+        # Off by default: every probe is a real connection the server accepts and logs.
+        self.probe_rtt = probe_rtt
+        self.servers = self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path) as f:
+                servers = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {key: s for key, s in servers.items() if now - s.get("seen", 0) < CACHE_TTL}
 
-    def listen_for_offers(self):
-        """Blocking: waits for UDP offer."""
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, "w") as f:
+                json.dump(self.servers, f)
+        except OSError:
+            pass  # The cache is only a shortcut
+
+    def listen_for_offers(self, window=OFFER_WINDOW):
+        """
+        Picks a server: a cached one (that still answers, when probing),
+        otherwise the best of the UDP offers collected for window seconds
+        after the first one.
+        """
+        if self.servers and self.choose_server():
+            return
         print("Client started, listening for offer requests...")
         udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         
@@ -24,42 +74,147 @@ class Client:
             
         udp_sock.bind(('', UDP_PORT))
 
-        while True:
-            data, addr = udp_sock.recvfrom(1024)
-            try:
-                port, name = unpack_offer(data)
-                self.server_ip = addr[0]
-                self.server_port = port
-                print(f"Received offer from {name} at {self.server_ip}:{self.server_port}")
-                break
-            except ProtocolException:
-                continue # Ignore bad packets
-        udp_sock.close()
+        deadline = None
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                udp_sock.settimeout(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                try:
+                    data, addr = udp_sock.recvfrom(1024)
+                except socket.timeout:
+                    break
+                try:
+                    port, name, active, capacity = unpack_offer_ext(data)
+                except ProtocolException:
+                    continue # Ignore bad packets
+                self._remember(addr[0], port, name, active, capacity)
+                if deadline is None:
+                    deadline = time.monotonic() + window
+        finally:
+            udp_sock.close()
+        self.choose_server()
+
+    def _remember(self, ip, port, name, active, capacity):
+        key = f"{ip}:{port}"
+        server = self.servers.setdefault(key, {"ip": ip, "port": port, "active": None, "capacity": 0, "rtt": None})
+        server["name"] = name
+        server["seen"] = time.time()
+        if active is not None:  # A plain v1 offer must not wipe the load from an extended one
+            server["active"], server["capacity"] = active, capacity
+
+    @staticmethod
+    def probe(ip, port, timeout=PROBE_TIMEOUT):
+        """TCP connect time to a server in seconds, or None if it does not answer."""
+        started = time.perf_counter()
+        try:
+            socket.create_connection((ip, port), timeout=timeout).close()
+        except OSError:
+            return None
+        return time.perf_counter() - started
+
+    @staticmethod
+    def _score(server):
+        """Sort key: servers with room first, then the least loaded (to 10%), then the fastest."""
+        active, capacity = server["active"], server["capacity"]
+        full = bool(capacity) and active is not None and active >= capacity
+        if active is None:
+            ratio = 0.5  # v1 offer: load unknown
+        else:
+            ratio = active / capacity if capacity else min(active / 100, 1.0)
+        return full, round(ratio, 1), server["rtt"]
+
+    def choose_server(self, max_probes=4):
+        """
+        Selects the best known server by advertised load. With probe_rtt, the
+        max_probes least loaded are probed first: ties go to the fastest, and
+        servers that do not answer are dropped. Returns False if none is left.
+        """
+        candidates = sorted(self.servers.values(), key=lambda s: self._score(dict(s, rtt=0)))
+        if self.probe_rtt:
+            candidates = candidates[:max_probes]
+            for server in candidates:
+                server["rtt"] = self.probe(server["ip"], server["port"])
+                if server["rtt"] is None:
+                    self._forget(server["ip"], server["port"])
+            alive = [s for s in candidates if s["rtt"] is not None]
+        else:
+            alive = candidates[:1]  # An unreachable one is dropped when connect() fails
+        self._save_cache()
+        if not alive:
+            return False
+        best = min(alive, key=self._score)
+        self.server_ip, self.server_port = best["ip"], best["port"]
+        load = "unknown load" if best["active"] is None else \
+            f"{best['active']}/{best['capacity'] or '?'} sessions"
+        rtt = f", {best['rtt'] * 1000:.1f} ms" if self.probe_rtt else ""
+        print(f"Received offer from {best['name']} at {self.server_ip}:{self.server_port} ({load}{rtt})")
+        return True
+
+    def _forget(self, ip, port):
+        self.servers.pop(f"{ip}:{port}", None)
 
     def connect(self):
-        """Connects to the discovered server via TCP."""
+        """Connects to the discovered server via TCP (replacing any open connection)."""
         if not self.server_ip or not self.server_port:
             raise NetworkException("No server found via UDP yet.")
         
+        self.close()
+        t = tracer.begin()
         try:
             self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.tcp_socket.connect((self.server_ip, self.server_port))
+            # The connection is kept between sessions; have the kernel check on idle peers
+            self.tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                self.tcp_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, KEEPALIVE_IDLE)
+            tracer.end("connect", t, server=f"{self.server_ip}:{self.server_port}")
             return True
         except Exception as e:
             self.status = f"Connection failed: {e}"
+            self.close()
+            if f"{self.server_ip}:{self.server_port}" in self.servers:  # Don't come back to it from the cache
+                self._forget(self.server_ip, self.server_port)
+                self._save_cache()
             return False
 
-    def run(self, callback):
-        """Runs the game session."""
+    def run(self, callback, keep_open=False):
+        """
+        Runs the game session. Returns the callback's result. With keep_open
+        the connection stays up for the next session, unless the callback
+        failed or returned False.
+        """
         if self.tcp_socket:
             try:
-                callback(self.tcp_socket)
+                result = callback(self.tcp_socket)
             except Exception as e:
                 # Re-raise so main.py can handle the error (print it and loop back)
+                self.close()
                 raise e 
-            finally:
+            if not keep_open or result is False:
                 self.close()
+            return result
+
+    def play(self, callback, on_rejected=None):
+        """
+        Runs one session over the kept-open connection, connecting first if
+        there is none. A reused connection that turns out to be closed (idle
+        timeout, or a server that serves one session per connection) is
+        replaced and the session retried. On a fresh connection, a False
+        result calls on_rejected(), which returns True to retry (e.g. after a
+        protocol downgrade). Returns the callback's result, or None if no
+        connection could be made.
+        """
+        while True:
+            reused = self.tcp_socket is not None
+            if not reused and not self.connect():
+                return None
+            result = self.run(callback, keep_open=True)
+            if result is not False:
+                return result
+            if not reused and not (on_rejected and on_rejected()):
+                return False
 
     def close(self):
+        """Closes the connection; the server sees EOF, which ends its session loop."""
         if self.tcp_socket:
-            self.tcp_socket.close()
\ No newline at end of file
+            self.tcp_socket.close()
+            self.tcp_socket = None
@@ -0,0 +1,197 @@
+"""
+Load generator and latency benchmark for the Blackjack server.
+Opens many concurrent sessions from one asyncio event loop, plays scripted
+Hit/Stand sequences and prints a JSON report, so runs can be compared over time.
+
+    python loadgen.py --server 127.0.0.1:12000 --sessions 5000 --concurrency 1000
+    python loadgen.py --sessions 200 --rounds 5 --script HS,S,HHS --out run.json
+
+Latencies reported (ms):
+    connect       TCP connect
+    first_card    request sent -> first card received
+    decision      Hit/Stand sent -> the server's next frame
+    round         round start (request, or the previous result) -> result
+    session       connect -> last result
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+
+sys.path.append('../')
+
+from client import Client
+from util import Timings
+from shared.protocol import *
+from shared.hand import Hand
+
+
+class Recorder:
+    """Latency samples (seconds) per metric plus outcome counters."""
+
+    METRICS = ("connect", "first_card", "decision", "round", "session")
+
+    def __init__(self):
+        self.samples = {name: [] for name in self.METRICS}
+        self.results = {"win": 0, "loss": 0, "tie": 0}
+        self.sessions_ok = 0
+        self.errors = {}
+
+    def add(self, metric, seconds):
+        self.samples[metric].append(seconds)
+
+    def error(self, e):
+        name = type(e).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, elapsed):
+        rounds = sum(self.results.values())
+        return {
+            "elapsed_s": elapsed,
+            "sessions_ok": self.sessions_ok,
+            "sessions_failed": sum(self.errors.values()),
+            "rounds": rounds,
+            "sessions_per_s": self.sessions_ok / elapsed if elapsed else 0.0,
+            "rounds_per_s": rounds / elapsed if elapsed else 0.0,
+            "results": self.results,
+            "errors": self.errors,
+            "latency_ms": {name: Timings.describe(s) for name, s in self.samples.items()},
+        }
+
+
+_RESULT_NAMES = {PAYLOAD_WIN: "win", PAYLOAD_LOSS: "loss", PAYLOAD_TIE: "tie"}
+
+
+async def _read_frame(reader, decoder):
+    while True:
+        frame = decoder.next_frame()
+        if frame is not None:
+            return frame
+        data = await reader.read(4096)
+        if not data:
+            raise ConnectionError("Server closed the connection.")
+        decoder.feed(data)
+
+
+async def play_session(host, port, args, scripts, rec):
+    """One connection: request, then args.rounds scripted rounds. Records into rec."""
+    now = time.perf_counter
+    started = now()
+    reader, writer = await asyncio.open_connection(host, port)
+    rec.add("connect", now() - started)
+    try:
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        writer.write(pack_request(args.rounds, args.team, args.protocol))
+        round_start = now()
+        waiting_first = True
+
+        for i in range(args.rounds):
+            script = iter(scripts[i % len(scripts)])
+            player, dealer = Hand(), Hand()
+            my_turn = True
+            decided_at = None
+            result = None
+
+            while result is None:
+                frame = await _read_frame(reader, decoder)
+                if waiting_first:
+                    rec.add("first_card", now() - round_start)
+                    waiting_first = False
+                if decided_at is not None:
+                    rec.add("decision", now() - decided_at)
+                    decided_at = None
+
+                for res, rank, suit in iter_server_events(*frame):
+                    if res != PAYLOAD_CONTINUE:
+                        result = res
+                        break
+                    # Same deal order as GameClient: 2 player cards, the upcard, then draws
+                    if player.size < 2 or (dealer.size >= 1 and my_turn):
+                        player.add(rank)
+                    else:
+                        dealer.add(rank)
+                    if my_turn and player.size >= 2 and dealer.size >= 1:
+                        if player.is_bust:
+                            my_turn = False
+                            continue
+                        decision = "Hit" if next(script, "S") == "H" else "Stand"
+                        writer.write(pack_payload(data_str=decision))
+                        decided_at = now()
+                        if decision == "Stand":
+                            my_turn = False
+
+            rec.results[_RESULT_NAMES.get(result, "tie")] += 1
+            finished = now()
+            rec.add("round", finished - round_start)
+            round_start = finished
+
+        rec.add("session", now() - started)
+        rec.sessions_ok += 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, args):
+    scripts = [s.strip().upper() or "S" for s in args.script.split(",")]
+    rec = Recorder()
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with gate:
+            try:
+                await asyncio.wait_for(play_session(host, port, args, scripts, rec), args.timeout)
+            except Exception as e:
+                rec.error(e)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.sessions)))
+    return rec.report(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the Blackjack server.")
+    parser.add_argument("--server", metavar="HOST:PORT", help="connect directly instead of waiting for an offer")
+    parser.add_argument("--sessions", type=int, default=1000, help="sessions to play in total")
+    parser.add_argument("--concurrency", type=int, default=100, help="sessions open at the same time")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per session (1-255)")
+    parser.add_argument("--script", default="HS",
+                        help="comma-separated H/S decision sequences, one per round (cycled); "
+                             "a round Stands once its sequence runs out")
+    parser.add_argument("--protocol", type=int, choices=[PROTOCOL_V1, PROTOCOL_V2], default=PROTOCOL_VERSION)
+    parser.add_argument("--team", default="LoadGen")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds allowed per session")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    if not 1 <= args.rounds <= 255:
+        parser.error("--rounds must be between 1 and 255")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if set(args.script.upper()) - set("HS,"):
+        parser.error("--script may only contain H, S and commas")
+
+    if args.server:
+        host, _, port = args.server.rpartition(":")
+        port = int(port)
+    else:
+        client = Client()
+        with contextlib.redirect_stdout(sys.stderr):  # Keep stdout pure JSON
+            client.listen_for_offers()
+        host, port = client.server_ip, client.server_port
+
+    report = asyncio.run(run(host, port, args))
+    report["config"] = {
+        "server": f"{host}:{port}", "sessions": args.sessions, "concurrency": args.concurrency,
+        "rounds": args.rounds, "script": args.script, "protocol": args.protocol,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
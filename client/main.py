@@ -1,22 +1,141 @@
+import argparse
+import importlib
 import sys
 import time
 sys.path.append('../')
 
-from client import Client
-from util import GameClient, Stats
+from client import Client, default_cache_path
+from util import GameClient, Stats, Timings, BufferedOutput, discard_output
 from shared.exceptions import HackathonException
+from shared.strategy import should_hit, threshold_table
+from shared.tracing import tracer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Blackjack client.")
+    parser.add_argument("--bot", action="store_true",
+                        help="play without prompts using --policy, for soak tests and automated play")
+    parser.add_argument("--policy", default="basic",
+                        help="bot policy: 'basic' (basic strategy), a number N (hit below N) "
+                             "or module:function returning True to Hit for (points, soft, upcard)")
+    parser.add_argument("--sessions", type=int, default=1, help="bot sessions to play back-to-back")
+    parser.add_argument("--rounds", type=int, default=10, help="rounds per bot session (1-255)")
+    parser.add_argument("--team", default="TeamBot", help="bot team name")
+    parser.add_argument("--server", metavar="HOST:PORT", help="connect directly instead of waiting for an offer")
+    parser.add_argument("--autoplay", choices=("rounds", "aggregate"), default=None,
+                        help="bot: let the server play each session with --policy compiled to a stand-on "
+                             "table, returning every round or only the totals")
+    parser.add_argument("--reconnect", action="store_true",
+                        help="bot: open a new connection for every session instead of keeping one open")
+    parser.add_argument("--server-cache", metavar="FILE", default=default_cache_path(),
+                        help="remember discovered servers here and reconnect without waiting for an offer "
+                             "('' = keep them in memory only; default: %(default)s)")
+    parser.add_argument("--probe", action="store_true",
+                        help="time a TCP connect to the least loaded servers before choosing one "
+                             "(each probe is a connection the server accepts)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="bot: print round progress, buffered and flushed after each session")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="record span traces and write Chrome trace JSON to FILE on exit")
+    args = parser.parse_args()
+    if not 1 <= args.rounds <= 255:
+        parser.error("--rounds must be between 1 and 255")
+    if args.sessions < 1:
+        parser.error("--sessions must be at least 1")
+    return args
+
+
+def make_policy(spec):
+    """Builds a policy(points, soft, upcard) -> True to Hit from its --policy string."""
+    if spec == "basic":
+        return should_hit
+    try:
+        stand_on = int(spec)
+    except ValueError:
+        pass
+    else:
+        return lambda points, soft, upcard: points < stand_on
+    module, _, name = spec.partition(":")
+    if not name:
+        raise HackathonException(f"Unknown policy: {spec}")
+    return getattr(importlib.import_module(module), name)
+
+
+def run_bot(args):
+    """Plays args.sessions sessions with no prompts or delays, then prints stats and timings."""
+    client = Client(args.server_cache, args.probe)
+    stats = Stats()
+    timings = Timings()
+    output = BufferedOutput() if args.verbose else discard_output
+    game_client = GameClient(args.team, stats, policy=make_policy(args.policy),
+                             output=output, result_delay=0, timings=timings)
+
+    if args.server:
+        host, _, port = args.server.rpartition(":")
+        client.server_ip, client.server_port = host, int(port)
+    else:
+        client.listen_for_offers()
+
+    if args.autoplay:
+        table = threshold_table(game_client.policy)
+        play = lambda sock: game_client.play_autoplay(sock, args.rounds, table, args.autoplay == "aggregate")
+    else:
+        play = lambda sock: game_client.play_session(sock, args.rounds)
+    # Rejected v2 request: replay the session over v1 (autoplay has no v1 equivalent)
+    on_rejected = None if args.autoplay else game_client.downgrade
+    try:
+        for _ in range(args.sessions):
+            started = time.perf_counter()
+            if args.reconnect:
+                client.close()
+            result = client.play(play, on_rejected)
+            if result is None:
+                print(f"Failed to connect: {client.status}")
+                break
+            if result is False and args.autoplay:
+                print("Server does not support autoplay.")
+                break
+            timings.add_session(time.perf_counter() - started)
+            if args.verbose:
+                output.flush()
+    except KeyboardInterrupt:
+        print("\nBot interrupted.")
+    finally:
+        client.close()
+
+    stats.print_summary(args.team)
+    timings.print_summary()
 
 
 def main():
+    args = parse_args()
+    if args.trace:
+        tracer.enable()
+    try:
+        if args.bot:
+            run_bot(args)
+        else:
+            run_interactive(args)
+    finally:
+        if args.trace:
+            print(f"Wrote {tracer.export(args.trace)} trace events to {args.trace}")
+
+
+def run_interactive(args):
+    """The prompt-driven game loop."""
     print("Client application started...")
     print("Looking for server...")
     
     # Initialize client and stats
-    client = Client()
+    client = Client(args.server_cache, args.probe)
     stats = Stats()
     
     try:
-        client.listen_for_offers()
+        if args.server:
+            host, _, port = args.server.rpartition(":")
+            client.server_ip, client.server_port = host, int(port)
+        else:
+            client.listen_for_offers()
     except KeyboardInterrupt:
         return
     
@@ -33,10 +152,8 @@ def main():
             # Get number of rounds
             num_rounds = GameClient.get_num_rounds()
             
-            # Connect and play all rounds
-            if client.connect():
-                client.run(lambda sock: game_client.play_session(sock, num_rounds))
-            else:
+            # Play all rounds, reusing the connection from the previous session
+            if client.play(lambda sock: game_client.play_session(sock, num_rounds), game_client.downgrade) is None:
                 print("Failed to connect. Retrying discovery...")
                 client.listen_for_offers()
 
@@ -49,6 +166,7 @@ def main():
             print(f"Error: {e}")
             time.sleep(1)
     
+    client.close()
     print("Exiting...")
 
 
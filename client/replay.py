@@ -0,0 +1,227 @@
+"""
+Replays recorded sessions (server --record-dir) against a server and checks
+that every round deals the same cards and ends with the same result.
+
+The server must run with --allow-replay and the --decks/--penetration of the
+recording: each replayed session asks it to shuffle from the recorded seed,
+then makes the recorded decisions. By default sessions start at their recorded
+offsets and each decision waits the client's recorded think time; --max-speed
+plays them back-to-back, --concurrency at a time.
+
+    python replay.py recordings/ --server 127.0.0.1:12000
+    python replay.py recordings/session-4242-0000.rec --max-speed --concurrency 200 --out replay.json
+
+Sessions whose client left or was evicted are replayed up to that round; the
+connection is then closed, as the client did.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+
+sys.path.append('../')
+
+from client import Client
+from util import Timings
+from shared.protocol import *
+from shared.recording import load_sessions, END_DONE, END_NAMES, RECORD_CARDS
+from shared.hand import Hand
+
+MAX_MISMATCHES = 20  # Mismatch details kept in the report
+
+
+class Report:
+    """Outcome counters of a replay."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.rounds = 0
+        self.matched = 0
+        self.mismatches = []
+        self.mismatched = 0
+        self.errors = {}
+        self.round_times = []
+
+    def mismatch(self, session, rnd, field, recorded, replayed):
+        self.mismatched += 1
+        if len(self.mismatches) < MAX_MISMATCHES:
+            self.mismatches.append({"pid": session["pid"], "session": session["session"], "round": rnd["round"],
+                                    "field": field, "recorded": recorded, "replayed": replayed})
+
+    def error(self, e):
+        name = type(e).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+    def as_dict(self, elapsed, recorded_span):
+        return {
+            "elapsed_s": elapsed,
+            "recorded_span_s": recorded_span,
+            "sessions": self.sessions,
+            "rounds": self.rounds,
+            "rounds_matched": self.matched,
+            "rounds_mismatched": self.mismatched,
+            "rounds_per_s": self.rounds / elapsed if elapsed else 0.0,
+            "errors": self.errors,
+            "mismatches": self.mismatches,
+            "round_ms": Timings.describe(self.round_times),
+        }
+
+
+def card_wire(index):
+    """(rank, suit) on the wire of a recorded card index."""
+    return index % 13 + 1, index // 13
+
+
+async def _read_frame(reader, decoder):
+    while True:
+        frame = decoder.next_frame()
+        if frame is not None:
+            return frame
+        data = await reader.read(4096)
+        if not data:
+            raise ConnectionError("Server closed the connection.")
+        decoder.feed(data)
+
+
+async def replay_session(host, port, session, pace, report):
+    """Replays one recorded session. pace scales the recorded think times (0 = none)."""
+    played = session["played"]
+    version = PROTOCOL_V2 if session["autoplay"] else session["version"]
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        writer.write(pack_replay(session["rounds"], session["team"], version, session["seed"]))
+
+        for rnd in played:
+            if rnd["end"] != END_DONE:
+                break  # The client went away here; the server plays the round out on its own
+            started = time.perf_counter()
+            think = pace * rnd["think"] / (rnd["hits"] + 1)  # Spread evenly over the decisions
+            player, dealer = [], []
+            hand = Hand()
+            hits = 0
+            my_turn = True
+            result = None
+
+            while result is None:
+                for res, rank, suit in iter_server_events(*await _read_frame(reader, decoder)):
+                    if res != PAYLOAD_CONTINUE:
+                        result = res
+                        break
+                    # Same deal order as GameClient: 2 player cards, the upcard, then draws
+                    if len(player) < 2 or (dealer and my_turn):
+                        player.append((rank, suit))
+                        hand.add(rank)
+                    else:
+                        dealer.append((rank, suit))
+                    if my_turn and len(player) >= 2 and dealer:
+                        if hand.is_bust:
+                            my_turn = False
+                            continue
+                        if think:
+                            await asyncio.sleep(think)
+                        hit = hits < rnd["hits"]
+                        writer.write(pack_payload(data_str="Hit" if hit else "Stand"))
+                        if hit:
+                            hits += 1
+                        else:
+                            my_turn = False
+
+            report.round_times.append(time.perf_counter() - started)
+            report.rounds += 1
+            ok = True
+            for field, recorded, replayed in (
+                    ("result", rnd["result"], result),
+                    ("player", [card_wire(c) for c in rnd["player"]], player[:RECORD_CARDS]),
+                    ("dealer", [card_wire(c) for c in rnd["dealer"]], dealer[:RECORD_CARDS])):
+                if recorded != replayed:
+                    report.mismatch(session, rnd, field, recorded, replayed)
+                    ok = False
+                    break
+            report.matched += ok
+        report.sessions += 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, sessions, args):
+    report = Report()
+    gate = asyncio.Semaphore(args.concurrency)
+    pace = 0.0 if args.max_speed else 1.0
+    first = sessions[0]["start"]
+    started = time.perf_counter()
+
+    async def one(session):
+        if not args.max_speed:
+            await asyncio.sleep(session["start"] - first - (time.perf_counter() - started))
+        async with gate:
+            try:
+                await asyncio.wait_for(replay_session(host, port, session, pace, report), args.timeout)
+            except Exception as e:
+                report.error(e)
+
+    await asyncio.gather(*(one(s) for s in sessions))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Blackjack sessions and check their outcomes.")
+    parser.add_argument("recordings", nargs="+", help="segment files, or directories of them")
+    parser.add_argument("--server", metavar="HOST:PORT", help="connect directly instead of waiting for an offer")
+    parser.add_argument("--max-speed", action="store_true",
+                        help="ignore the recorded timing: no think time, sessions back-to-back")
+    parser.add_argument("--concurrency", type=int, default=100, help="sessions replayed at the same time")
+    parser.add_argument("--team", default=None, help="replay every session under this team name")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N sessions (0 = all)")
+    parser.add_argument("--timeout", type=float, default=0,
+                        help="seconds allowed per session (0 = the recorded duration plus 30)")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    sessions = [s for s in load_sessions(args.recordings) if s["played"]]
+    if args.limit:
+        sessions = sessions[:args.limit]
+    if not sessions:
+        parser.error("no recorded sessions found")
+    if args.team:
+        for s in sessions:
+            s["team"] = args.team
+    settings = {(s["decks"], s["penetration"]) for s in sessions}
+    for decks, penetration in sorted(settings):
+        print(f"Recorded with --decks {decks} --penetration {penetration}", file=sys.stderr)
+    span = sessions[-1]["start"] - sessions[0]["start"]
+    if not args.timeout:
+        args.timeout = max(sum(r["duration"] for r in s["played"]) for s in sessions) + 30
+
+    if args.server:
+        host, _, port = args.server.rpartition(":")
+        port = int(port)
+    else:
+        client = Client()
+        with contextlib.redirect_stdout(sys.stderr):  # Keep stdout pure JSON
+            client.listen_for_offers()
+        host, port = client.server_ip, client.server_port
+
+    started = time.perf_counter()
+    report = asyncio.run(run(host, port, sessions, args))
+    result = report.as_dict(time.perf_counter() - started, span)
+    result["config"] = {
+        "server": f"{host}:{port}", "sessions": len(sessions), "max_speed": args.max_speed,
+        "concurrency": args.concurrency, "ends": {name: sum(r["end"] == code for s in sessions for r in s["played"])
+                                                  for code, name in END_NAMES.items()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    sys.exit(1 if report.mismatched or report.errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import sys
-from time import sleep
+from time import sleep, perf_counter
 sys.path.append('../')
 
 from shared.protocol import *
+from shared.hand import Hand
 from shared.exceptions import HackathonException
+from shared.tracing import tracer
 
 
 class Stats:
@@ -52,17 +54,95 @@ class Stats:
         print(f" {'Win Rate:':<25}{f'{win_rate:.2f}%':>13}")
         print("="*40 + "\n")
     
+    def current_stats(self):
+        """Returns the current stats line shown between rounds."""
+        return f"\n[Current Stats: Wins: {self.wins} | Losses: {self.losses} | Ties: {self.ties}]"
+    
     def print_current_stats(self):
         """Prints current stats between rounds."""
-        print(f"\n[Current Stats: Wins: {self.wins} | Losses: {self.losses} | Ties: {self.ties}]")
+        print(self.current_stats())
+
+
+class Timings:
+    """Collects per-round and per-session wall-clock durations (seconds)."""
+    
+    def __init__(self):
+        self.rounds = []
+        self.sessions = []
+    
+    def add_round(self, seconds):
+        self.rounds.append(seconds)
+    
+    def add_session(self, seconds):
+        self.sessions.append(seconds)
+    
+    @staticmethod
+    def describe(samples):
+        """Returns count, mean, p50, p95, p99 and max (in ms) of a list of durations."""
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        return {
+            "count": len(ordered),
+            "mean": sum(ordered) / len(ordered) * 1000,
+            "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99),
+            "max": ordered[-1] * 1000,
+        }
+    
+    def print_summary(self):
+        """Prints the timing summary."""
+        print("="*40)
+        print("       TIMINGS (ms)")
+        print("="*40)
+        for label, samples in (("Round", self.rounds), ("Session", self.sessions)):
+            d = self.describe(samples)
+            if d is None:
+                continue
+            print(f" {label + 's:':<25}{d['count']:>13}")
+            print(f"   mean {d['mean']:.2f} | p50 {d['p50']:.2f} | p95 {d['p95']:.2f} | p99 {d['p99']:.2f} | max {d['max']:.2f}")
+        if self.sessions:
+            rate = len(self.rounds) / sum(self.sessions)
+            print(f" {'Rounds/s:':<25}{f'{rate:.1f}':>13}")
+        print("="*40 + "\n")
+
+
+class BufferedOutput:
+    """print() replacement that collects lines until flush(), for bot runs."""
+    
+    def __init__(self):
+        self.lines = []
+    
+    def __call__(self, *args):
+        self.lines.append(" ".join(str(a) for a in args))
+    
+    def flush(self):
+        if self.lines:
+            sys.stdout.write("\n".join(self.lines) + "\n")
+            sys.stdout.flush()
+            self.lines.clear()
+
+
+def discard_output(*args):
+    """print() replacement that drops everything (quiet bot runs)."""
 
 
 class GameClient:
     """Handles client-side game logic."""
     
-    def __init__(self, team_name, stats):
+    def __init__(self, team_name, stats, protocol_version=PROTOCOL_VERSION, policy=None,
+                 output=print, result_delay=1, timings=None):
         self.team_name = team_name
         self.stats = stats
+        self.protocol_version = protocol_version
+        # Optional automatic player: policy(points, soft, dealer_upcard) -> True to Hit,
+        # e.g. shared.strategy.should_hit. None prompts the user instead.
+        self.policy = policy
+        self.output = output  # Where round progress goes: print, BufferedOutput or discard_output
+        self.result_delay = result_delay  # Pause (seconds) before showing a round result
+        self.timings = timings  # Optional Timings that receives each round's duration
+        self.decoder = None  # Per-connection frame decoder, created by play_session
+        self.round_started = False  # Whether the current round has received anything yet
     
     @staticmethod
     def get_user_input(prompt, args=None, error_msg=""):
@@ -122,149 +202,231 @@ class GameClient:
         return True
     
     @staticmethod
-    def get_card_value(rank):
-        """Helper to get blackjack value from rank."""
-        if rank == 1: return 11  # Ace initially 11
-        if rank >= 11: return 10  # Face cards
-        return rank
-    
-    @staticmethod
-    def calculate_score(current_score, aces, rank):
-        """Updates score and handles Ace logic (11 -> 1)."""
-        val = GameClient.get_card_value(rank)
-        if val == 11: aces += 1
-        current_score += val
-        
-        # If bust, try to convert Aces from 11 to 1
-        while current_score > 21 and aces > 0:
-            current_score -= 10
-            aces -= 1
-        return current_score, aces
+    def calculate_score(hand, rank):
+        """Adds a card to hand and returns its score (same scoring as the server)."""
+        hand.add(rank)
+        return hand.points
     
     def play_single_round(self, sock):
         """Plays exactly ONE round within an existing connection."""
-        packet_buffer = b""
         my_turn = True 
         
         player_cards = []
         dealer_cards = []
         
         # Track scores locally
+        player_hand = Hand()
         player_score = 0
-        player_aces = 0
         
+        dealer_hand = Hand()
         dealer_score = 0
-        dealer_aces = 0
         
-        print("\n--- New Round Started ---")
+        self.round_started = False
+        self.output("\n--- New Round Started ---")
+        round_start = tracer.begin()
         
         while True:
             try:
-                data = sock.recv(1024)
-                if not data: 
+                t = tracer.begin()
+                frame = self.decoder.read_frame(sock)
+                tracer.end("recv_wait", t)
+                if frame is None: 
+                    tracer.end("round", round_start, closed=True)
                     return False  # Connection closed
+                self.round_started = True
                 
-                packet_buffer += data
-                
-                while len(packet_buffer) >= 9:
-                    packet = packet_buffer[:9]
-                    packet_buffer = packet_buffer[9:]
-                    
-                    res, rank, suit = unpack_payload_server(packet)
-                    
+                for res, rank, suit in iter_server_events(*frame):
                     if res != PAYLOAD_CONTINUE:
                         # --- Round Over ---
-                        sleep(1)
-                        print("\n--- Round Results ---")
-                        print(f"Your Hand:   {', '.join(player_cards)} (Score: {player_score})")
-                        print(f"Dealer Hand: {', '.join(dealer_cards)} (Score: {dealer_score})")
-                        
+                        if self.result_delay:
+                            sleep(self.result_delay)
+                        self.output("\n--- Round Results ---")
+                        self.output(f"Your Hand:   {', '.join(player_cards)} (Score: {player_score})")
+                        self.output(f"Dealer Hand: {', '.join(dealer_cards)} (Score: {dealer_score})")
+                    
                         if res == PAYLOAD_WIN:
-                            print(">> Result: YOU WON! <<")
+                            self.output(">> Result: YOU WON! <<")
                             self.stats.add_win()
                         elif res == PAYLOAD_LOSS:
-                            print(">> Result: Dealer Won. <<")
+                            self.output(">> Result: Dealer Won. <<")
                             self.stats.add_loss()
                         else:
-                            print(">> Result: It's a Tie. <<")
+                            self.output(">> Result: It's a Tie. <<")
                             self.stats.add_tie()
-                        
+                    
+                        tracer.end("round", round_start, result=res)
                         return True  # Round complete
-                            
+                        
                     else:
                         # --- Card Received ---
                         card_desc = format_card(rank, suit)
-                        
+                    
                         if len(player_cards) < 2:
                             # Initial Deal: Player
                             player_cards.append(card_desc)
-                            player_score, player_aces = self.calculate_score(player_score, player_aces, rank)
-                            print(f"You were dealt: {card_desc}")
+                            player_score = self.calculate_score(player_hand, rank)
+                            self.output(f"You were dealt: {card_desc}")
                             if len(player_cards) == 2:
-                                print(f"   -> Your Score: {player_score}")
-                            
+                                self.output(f"   -> Your Score: {player_score}")
+                        
                         elif len(dealer_cards) < 1:
                             # Initial Deal: Dealer
                             dealer_cards.append(card_desc)
-                            dealer_score, dealer_aces = self.calculate_score(dealer_score, dealer_aces, rank)
-                            print(f"Dealer showing: {card_desc}")
-                            
+                            dealer_score = self.calculate_score(dealer_hand, rank)
+                            self.output(f"Dealer showing: {card_desc}")
+                        
                         else:
                             # Subsequent Cards
                             if my_turn:
                                 player_cards.append(card_desc)
-                                player_score, player_aces = self.calculate_score(player_score, player_aces, rank)
-                                print(f"You were dealt: {card_desc}")
-                                print(f"   -> Your Score: {player_score}")
+                                player_score = self.calculate_score(player_hand, rank)
+                                self.output(f"You were dealt: {card_desc}")
+                                self.output(f"   -> Your Score: {player_score}")
                             else:
                                 dealer_cards.append(card_desc)
-                                dealer_score, dealer_aces = self.calculate_score(dealer_score, dealer_aces, rank)
-                                
+                                dealer_score = self.calculate_score(dealer_hand, rank)
+                            
                                 if len(dealer_cards) == 2: 
-                                    print(f"Dealer revealed: {card_desc}")
+                                    self.output(f"Dealer revealed: {card_desc}")
                                 else: 
-                                    print(f"Dealer drew:    {card_desc}")
+                                    self.output(f"Dealer drew:    {card_desc}")
                                 if dealer_score >= 17: 
-                                    print(f"   -> Dealer Score: {dealer_score}")
-                        
+                                    self.output(f"   -> Dealer Score: {dealer_score}")
+                    
                         # --- Input Logic ---
                         if my_turn and len(player_cards) >= 2 and len(dealer_cards) >= 1:
-                            
+                        
                             if player_score > 21:
-                                print("   -> BUST! Waiting for result...")
+                                self.output("   -> BUST! Waiting for result...")
                                 my_turn = False
-                                
+                            
                             if my_turn:
-                                choice = self.get_user_input(
-                                    "Your move (Hit/Stand): ", 
-                                    ['hit', 'stand', 'h', 's']
-                                ).strip().lower()
+                                t = tracer.begin()
+                                if self.policy:
+                                    # Dealer hand holds only the upcard here, so its hard total is the upcard value
+                                    hit = self.policy(player_hand.points, player_hand.is_soft, dealer_hand.hard)
+                                    choice = 'h' if hit else 's'
+                                else:
+                                    choice = self.get_user_input(
+                                        "Your move (Hit/Stand): ", 
+                                        ['hit', 'stand', 'h', 's']
+                                    ).strip().lower()
+                                tracer.end("decide", t)
+                                t = tracer.begin()
                                 if choice == 'hit' or choice == 'h':
                                     sock.send(pack_payload(data_str="Hit"))
                                 elif choice == 'stand' or choice == 's':
                                     sock.send(pack_payload(data_str="Stand"))
                                     my_turn = False
-                                    print("Waiting for dealer's turn...")
+                                    self.output("Waiting for dealer's turn...")
+                                tracer.end("send", t, decision=choice)
 
             except Exception as e:
                 raise e
     
+    def downgrade(self):
+        """Falls back to protocol v1 after a rejected request. Returns False if already there."""
+        if self.protocol_version == PROTOCOL_V1:
+            return False
+        # A v1-only server drops the connection on a v2 request
+        self.output("Server does not support protocol v2, falling back to v1.")
+        self.protocol_version = PROTOCOL_V1
+        return True
+    
     def play_session(self, sock, num_rounds):
-        """Plays multiple rounds over a single connection."""
+        """
+        Plays multiple rounds over a single connection. Returns False if the
+        connection closed before anything arrived: the server rejected the
+        request version, or a kept-open connection had already been closed.
+        """
         # 1. Send Request with number of rounds
-        req_packet = pack_request(num_rounds, self.team_name)
-        sock.send(req_packet)
+        self.decoder = FrameDecoder(CLIENT_INBOUND)
+        req_packet = pack_request(num_rounds, self.team_name, self.protocol_version)
+        try:
+            sock.send(req_packet)
+        except ConnectionError:
+            return False
         
         # 2. Play all rounds
         for i in range(num_rounds):
-            print(f"\n{'='*40}")
-            print(f"  Round {i+1} of {num_rounds}")
-            print(f"{'='*40}")
+            self.output(f"\n{'='*40}")
+            self.output(f"  Round {i+1} of {num_rounds}")
+            self.output(f"{'='*40}")
             
-            if not self.play_single_round(sock):
-                print("Connection lost during round.")
+            started = perf_counter()
+            try:
+                played = self.play_single_round(sock)
+            except ConnectionError:
+                if i == 0 and not self.round_started:
+                    return False
+                raise
+            if not played:
+                if i == 0 and not self.round_started:
+                    return False
+                self.output("Connection lost during round.")
                 break
+            if self.timings is not None:
+                self.timings.add_round(perf_counter() - started)
             
             # Show current stats after each round
             if i < num_rounds - 1:  # Don't show for last round (summary will be shown)
-                self.stats.print_current_stats()
\ No newline at end of file
+                self.output(self.stats.current_stats())
+        return True
+    
+    def play_autoplay(self, sock, num_rounds, table, aggregate_only=False):
+        """
+        Has the server play every round with a stand-on table; reads the
+        summaries and totals. Returns False like play_session.
+        """
+        self.decoder = FrameDecoder(CLIENT_INBOUND)
+        started = perf_counter()
+        
+        round_no = 0
+        try:
+            sock.send(pack_autoplay(num_rounds, self.team_name, table, aggregate_only))
+            frame = self.decoder.read_frame(sock)
+        except ConnectionError:
+            frame = None
+        if frame is None:
+            return False  # Closed before anything arrived, like a rejected request
+        while True:
+            if frame is None:
+                self.output("Connection lost during autoplay.")
+                break
+            msg_type, data = frame
+            if msg_type == MSG_TYPE_AGGREGATE:
+                rounds, wins, losses, ties = unpack_aggregate(data)
+                if aggregate_only:
+                    # No per-round frames: take the totals as they are
+                    self.stats.wins += wins
+                    self.stats.losses += losses
+                    self.stats.ties += ties
+                    self.stats.rounds_played += rounds
+                    round_no = rounds
+                self.output(f"\nServer played {rounds} rounds: {wins} won, {losses} lost, {ties} tied")
+                break
+            if msg_type != MSG_TYPE_SUMMARY:
+                raise ProtocolException("Unexpected frame during autoplay.")
+            
+            res, player, dealer = unpack_round_summary(data)
+            round_no += 1
+            hand = Hand()
+            dealer_hand = Hand()
+            for rank, _ in player: hand.add(rank)
+            for rank, _ in dealer: dealer_hand.add(rank)
+            self.output(f"\nRound {round_no}: You {', '.join(format_card(r, s) for r, s in player)} ({hand.points})"
+                        f" | Dealer {', '.join(format_card(r, s) for r, s in dealer)} ({dealer_hand.points})")
+            if res == PAYLOAD_WIN:
+                self.stats.add_win()
+            elif res == PAYLOAD_LOSS:
+                self.stats.add_loss()
+            else:
+                self.stats.add_tie()
+            frame = self.decoder.read_frame(sock)
+        
+        if self.timings is not None and round_no:
+            # Only the whole exchange is observable; spread it evenly over the rounds
+            elapsed = perf_counter() - started
+            for _ in range(round_no):
+                self.timings.add_round(elapsed / round_no)
+        return True
@@ -0,0 +1,38 @@
+"""
+Per-team admission control: a token bucket per team name.
+
+Each request spends one token. A team earns `rate` tokens per second, up to
+`burst` tokens, so one client can't take over every worker by opening session
+after session. Buckets are kept in LRU order and capped at max_teams entries.
+A dropped bucket starts over full, which only ever errs towards admitting.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TeamLimiter:
+    def __init__(self, rate, burst, max_teams=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_teams = max_teams
+        self._buckets = OrderedDict()  # team -> [tokens, last refill (monotonic)]
+        self._lock = threading.Lock()
+
+    def allow(self, team):
+        """Takes a token for team. Returns False if the team is over its rate."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(team)
+            if bucket is None:
+                bucket = self._buckets[team] = [self.burst, now]
+                if len(self._buckets) > self.max_teams:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(team)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
@@ -0,0 +1,202 @@
+import asyncio
+import socket
+import time
+
+from server import Server
+from utils import Game, SessionMachine, AWAIT_DECISION, SESSION_OVER
+from shared.protocol import *
+from eventlog import log
+from timeouts import Watchdog
+from shared.tracing import tracer
+from shared.recording import END_DONE, END_EVICTED
+from metrics import metrics, ACCEPTED, CLOSED, PROTOCOL_ERRORS, CLIENT_ERRORS, H_DECISION
+
+
+async def read_frame(reader, decoder):
+    """Asyncio counterpart of FrameDecoder.read_frame. Returns None on EOF."""
+    while True:
+        frame = decoder.next_frame()
+        if frame is not None:
+            return frame
+        data = await reader.read(4096)
+        if not data:
+            return None
+        decoder.feed(data)
+
+
+async def flush(writer, out):
+    """Writes everything queued on out as one transport write."""
+    chunks = out.take()
+    if chunks:
+        if writer.is_closing():
+            raise ConnectionResetError("Connection lost.")  # A dead transport would only log and drop the write
+        writer.writelines(chunks)  # Joined into a single send by the transport
+        await writer.drain()
+
+
+class AsyncServer(Server):
+    """
+    Server variant that serves every client from a single asyncio event loop.
+    asyncio already enables TCP_NODELAY on the sockets it accepts.
+    """
+
+    def run(self, game_callback):
+        """Main loop: Accepts TCP connections as tasks on one event loop."""
+        try:
+            asyncio.run(self._serve(game_callback))
+        except KeyboardInterrupt:
+            self.close()
+
+    async def _serve(self, game_callback):
+        self.tcp_socket.setblocking(False)
+        server = await asyncio.start_server(
+            lambda reader, writer: self._handle_client(reader, writer, game_callback),
+            sock=self.tcp_socket
+        )
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_client(self, reader, writer, callback):
+        """Wrapper to safely run the game coroutine and close the stream."""
+        host, port = writer.get_extra_info('peername')[:2]
+        metrics.inc(ACCEPTED)
+        writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if tracer.enabled:
+            tracer.instant("accept", peer=f"{host}:{port}")
+        log.info("connect", peer=f"{host}:{port}")
+        self._track_active(1)
+        try:
+            await callback(reader, writer)
+        except Exception as e:
+            metrics.inc(CLIENT_ERRORS)
+            log.error("client_error", error=str(e))
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass  # Reset by the peer: closed all the same
+            self._track_active(-1)
+            metrics.inc(CLOSED)
+            log.info("disconnect")
+
+
+class AsyncGame:
+    """
+    Asyncio adapter around SessionMachine; sends exactly the same packets in
+    the same order as Game and shares its session bookkeeping.
+    """
+
+    @staticmethod
+    async def start(reader, writer):
+        """Entry point for handling a client connection: serves sessions until the client is done."""
+        decoder = FrameDecoder(SERVER_INBOUND)
+        watchdog = Watchdog(writer.get_extra_info('socket'))  # Shutting its read side ends reader.read()
+        first = True
+        try:
+            while await AsyncGame._serve_session(reader, writer, decoder, watchdog, first):
+                first = False
+        finally:
+            watchdog.close()
+
+    @staticmethod
+    async def _serve_session(reader, writer, decoder, watchdog, first=True):
+        """Waits for the next request and plays it. Returns False once the connection is done."""
+        session = watchdog.session = log.new_session()
+        started = time.perf_counter()
+
+        # 1. Wait for Request Message (Name + Rounds), or an Autoplay request
+        if first: watchdog.arm("request", Game.request_timeout)
+        else: watchdog.arm("idle", Game.idle_timeout)
+        t = tracer.begin()
+        try:
+            frame = await read_frame(reader, decoder)
+        except ProtocolException as e:
+            metrics.inc(PROTOCOL_ERRORS)
+            log.warning("protocol_error", session=session, error=str(e))
+            return False
+        finally:
+            watchdog.disarm()
+        if frame is None: return False
+        request = Game._open_session(frame, session, first, started, t)
+        if request is None: return False
+        num_rounds, team_name, version, table, aggregate_only, seed = request
+
+        # 2. Play all requested rounds over the same connection
+        out = OutputBuffer()
+        shoe, seed = Game._new_shoe(session, request)
+        started = time.perf_counter()
+        watchdog.arm_session(Game.session_timeout)
+        played, alive = 0, True
+        try:
+            if table is not None:
+                for played in Game._autoplay(out, shoe, num_rounds, team_name, table, aggregate_only, session, seed):
+                    await flush(writer, out)
+                played = num_rounds
+            else:
+                machine = SessionMachine(shoe, num_rounds, version, out)
+                while alive and machine.state != SESSION_OVER:
+                    # Client gone, misbehaving or evicted: the rest of the rounds are not played
+                    alive = await AsyncGame._play_single_round(reader, writer, out, decoder, machine, team_name,
+                                                               session, watchdog, seed)
+                played = machine.round_no
+            await flush(writer, out)  # The last result, also to an evicted client
+        except OSError as e:
+            if alive:  # Otherwise already counted when the round ended
+                Game._round_failed(session, played, e)
+            alive = False
+        finally:
+            watchdog.disarm_session()
+            shoe.release()  # Its buffer goes back to the pool for the next session
+        return Game._close_session(out, session, team_name, played, started, watchdog) and alive
+
+    @staticmethod
+    async def _play_single_round(reader, writer, out, decoder, machine, team_name, session=0, watchdog=None,
+                                 seed=0):
+        """
+        Plays the machine's next round. A client evicted while deciding loses
+        the round. Returns False if the session cannot go on (see Game).
+        """
+        started = time.perf_counter()
+        think = 0.0
+        round_start = t = tracer.begin()
+        machine.begin_round()
+        tracer.end("deal", t)
+
+        # Player Turn Loop
+        while machine.state == AWAIT_DECISION:
+            try:
+                t = tracer.begin()
+                await flush(writer, out)
+                tracer.end("send", t)
+                waiting = time.perf_counter()
+                t = tracer.begin()
+                if watchdog: watchdog.arm("decision", Game.decision_timeout)
+                frame = await read_frame(reader, decoder)
+                if watchdog: watchdog.disarm()
+                tracer.end("recv_wait", t)
+                if frame is None:
+                    if not (watchdog and watchdog.expired):
+                        Game._round_failed(session, machine.round_no)
+                    break
+                waiting = time.perf_counter() - waiting
+                think += waiting
+                metrics.observe(H_DECISION, waiting)
+
+                decision = unpack_payload_client(frame[1])
+                if log.debug_enabled:
+                    log.debug("decision", session=session, round=machine.round_no,
+                              decision="Hit" if "Hit" in decision else "Stand")
+                t = tracer.begin()
+                machine.receive(decision)
+                tracer.end("decision", t)
+            except Exception as e:
+                Game._round_failed(session, machine.round_no, e)
+                break
+
+        # Client gone, evicted or misbehaving: the dealer still plays out the round
+        end = Game._round_end(machine, watchdog)
+        machine.abandon(forfeit=end == END_EVICTED)
+        Game._record_round(machine, team_name, session, started, seed, think, end)
+        tracer.end("round", round_start, round=machine.round_no)
+        return end == END_DONE and not (watchdog and watchdog.expired)
@@ -0,0 +1,119 @@
+import itertools
+import random
+import threading
+
+from metrics import metrics, POOL_HITS, POOL_MISSES
+
+
+class ShufflePool:
+    """
+    Bounded pool of pre-shuffled shoe orderings, filled by a background thread,
+    so a Shoe reshuffle on the request path is usually a dict pop.
+
+    Shoes hand their previous storage back when they take a new ordering or
+    are released at the end of a session, and the producer reshuffles those
+    buffers, so the pool allocates nothing in steady state.
+
+    Orderings are numbered: the n-th take() always gets ordering n, shuffled
+    from the canonical order with its own RNG, rng_factory(seed derived from
+    the pool seed and n). The producer works ahead on the next numbers; on a
+    miss, take() shuffles its ordering inline instead of waiting. Either way
+    the sequence of orderings depends only on the seed, never on thread
+    timing. Shoes that recycle their discards mid-round shuffle with an RNG
+    from new_rng(), a separate numbered stream of the same seed.
+
+    Hits and misses of take() are counted in metrics (shuffle_pool_*_total).
+    """
+
+    def __init__(self, decks=1, size=32, seed=None, rng_factory=random.Random):
+        self.decks = decks
+        self.size = size
+        self.seed = seed
+        self._template = bytes(range(52)) * decks
+        self._rng_factory = rng_factory
+        self._base = random.Random(seed).getrandbits(64)  # Every derived seed starts from this
+        self._ready = {}           # Ordering number -> shuffled buffer, at most size of them
+        self._spare = []           # Returned buffers waiting to be refilled, at most size of them
+        self._next_take = 0        # Number of the ordering the next take() gets
+        self._next_make = 0        # Next number the producer has not claimed
+        self._cond = threading.Condition()  # Guards the above; the producer waits on it for room
+        self._rng_numbers = itertools.count()  # Numbers of new_rng() streams
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Starts the producer thread. Returns self for chaining."""
+        self._running = True
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stops the producer, waking it if it is waiting for room."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+    def _derive(self, n, stream):
+        """Seed of number n in a stream (0 = orderings, 1 = new_rng)."""
+        return (self._base << 64 | n) << 1 | stream
+
+    def _shuffled(self, n, buf=None):
+        """Resets buf (or a new buffer) to canonical order and shuffles it as ordering n."""
+        if buf is None:
+            buf = bytearray(self._template)
+        else:
+            buf[:] = self._template
+        self._rng_factory(self._derive(n, 0)).shuffle(buf)
+        return buf
+
+    def _recycle(self, buf):
+        """Keeps a returned buffer for reuse. Call with _cond held."""
+        if buf is not None and len(buf) == len(self._template) and len(self._spare) < self.size:
+            self._spare.append(buf)
+
+    def _produce(self):
+        while True:
+            with self._cond:
+                while self._running and len(self._ready) >= self.size:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                n = self._next_make = max(self._next_make, self._next_take)
+                self._next_make += 1
+                buf = self._spare.pop() if self._spare else None
+            buf = self._shuffled(n, buf)  # Outside the lock: takes go on meanwhile
+            with self._cond:
+                if n >= self._next_take:
+                    self._ready[n] = buf
+                else:
+                    self._recycle(buf)  # Its take() missed and shuffled inline
+
+    def take(self, old=None):
+        """
+        Returns a shuffled ordering (a bytearray of 52 * decks cards).
+        old, if given, is a buffer the caller is done with; it gets recycled.
+        """
+        with self._cond:
+            self._recycle(old)
+            n = self._next_take
+            self._next_take += 1
+            buf = self._ready.pop(n, None)
+            if buf is not None:
+                self._cond.notify()  # Room for the producer
+            else:
+                spare = self._spare.pop() if self._spare else None
+        if buf is not None:
+            metrics.inc(POOL_HITS)
+            return buf
+        metrics.inc(POOL_MISSES)
+        return self._shuffled(n, spare)
+
+    def give_back(self, buf):
+        """Returns a buffer the caller is done with, e.g. the shoe of a finished session."""
+        with self._cond:
+            self._recycle(buf)
+
+    def new_rng(self):
+        """Returns a fresh RNG for a shoe of this pool, seeded from the pool's seed."""
+        return self._rng_factory(self._derive(next(self._rng_numbers), 1))
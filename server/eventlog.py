@@ -0,0 +1,119 @@
+"""
+Structured server log: JSON lines written by a background thread.
+
+Callers only build a small tuple and push it onto a queue; formatting and the
+(batched) writes happen on the writer thread, so a slow terminal or pipe never
+stalls a round. Records below the current level are dropped before anything is
+built. Per-decision records are DEBUG, so they are off by default; hot paths
+also check log.debug_enabled first so that a disabled call costs one attribute
+read.
+
+    {"ts": 1712345678.123, "level": "info", "pid": 4242, "event": "round_end", "session": 7, "round": 2, ...}
+"""
+import itertools
+import json
+import multiprocessing.util
+import os
+import queue
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
+
+_STOP = object()  # Queue sentinel that ends the writer thread
+
+
+class Logger:
+    """Queue-backed JSON-lines logger. One per process (see log below)."""
+
+    def __init__(self, level=INFO, stream=None, batch=512):
+        self.stream = stream or sys.stdout
+        self.batch = batch  # Most records formatted and written per write() call
+        self.set_level(level)
+        self.dropped = 0  # Records that could not be written
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._session_ids = itertools.count(1)
+        self._pid = os.getpid()
+
+    def set_level(self, level):
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.debug_enabled = self.level <= DEBUG
+
+    def new_session(self):
+        """Returns a process-unique session ID (pair it with the record's pid across workers)."""
+        return next(self._session_ids)
+
+    def start(self):
+        """Starts the writer thread. Call once per process, after any fork. Returns self."""
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+        # Unlike atexit, Finalize also runs when a multiprocessing worker exits
+        multiprocessing.util.Finalize(self, self.close, exitpriority=10)
+        return self
+
+    def close(self):
+        """Writes everything still queued and stops the writer thread."""
+        thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    def log(self, level, event, **fields):
+        if level < self.level:
+            return
+        record = (time.time(), level, event, fields)
+        if self._thread is None:
+            self._write([record])  # Not started (tools, tests): write inline
+        else:
+            self._queue.put(record)
+
+    def debug(self, event, **fields):
+        self.log(DEBUG, event, **fields)
+
+    def info(self, event, **fields):
+        self.log(INFO, event, **fields)
+
+    def warning(self, event, **fields):
+        self.log(WARNING, event, **fields)
+
+    def error(self, event, **fields):
+        self.log(ERROR, event, **fields)
+
+    def _format(self, record):
+        ts, level, event, fields = record
+        head = {"ts": round(ts, 6), "level": _LEVEL_NAMES.get(level, level), "pid": self._pid, "event": event}
+        head.update(fields)
+        return json.dumps(head, default=str)
+
+    def _write(self, records):
+        try:
+            self.stream.write("".join(self._format(r) + "\n" for r in records))
+            self.stream.flush()
+        except (OSError, ValueError):
+            self.dropped += len(records)
+
+    def _write_loop(self):
+        """Blocks for one record, then takes whatever else is queued (up to batch) and writes it at once."""
+        get, get_nowait = self._queue.get, self._queue.get_nowait
+        while True:
+            records = [get()]
+            try:
+                while len(records) < self.batch:
+                    records.append(get_nowait())
+            except queue.Empty:
+                pass
+            stop = any(r is _STOP for r in records)
+            if stop:
+                records = [r for r in records if r is not _STOP]
+            if records:
+                self._write(records)
+            if stop:
+                return
+
+
+log = Logger()
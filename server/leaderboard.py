@@ -0,0 +1,226 @@
+"""
+Server-side team leaderboard: sessions and round outcomes per team name,
+kept across restarts in a SQLite file.
+
+Rounds only touch memory. Every thread counts into its own shard (a dict of
+running totals per team), so recording takes no lock. A background thread
+periodically works out what changed since its last flush and writes all of it
+as one transaction of additive upserts. Prefork workers each flush their own
+deltas into the same file (WAL mode, so readers never wait on a writer), which
+keeps the totals exact however many processes share it. The table is indexed
+by wins, so a top-N query reads N index entries.
+
+    leaderboard = Leaderboard("stats.db").start()
+    leaderboard.record(team, PAYLOAD_WIN)
+    leaderboard.top(10)   # As of the last flush of every worker
+    GET /leaderboard?top=10 on the metrics port (--stats-db with --metrics-port)
+
+    python leaderboard.py stats.db --top 20
+"""
+import argparse
+import json
+import multiprocessing.util
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.append('../')
+
+from eventlog import log
+from shared.protocol import PAYLOAD_WIN, PAYLOAD_LOSS, PAYLOAD_TIE
+
+_SESSIONS, _ROUNDS, _WINS, _LOSSES, _TIES = range(5)
+_COLUMNS = ("sessions", "rounds", "wins", "losses", "ties")
+_RESULT_COLUMN = {PAYLOAD_WIN: _WINS, PAYLOAD_LOSS: _LOSSES, PAYLOAD_TIE: _TIES}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS teams (
+    team     TEXT PRIMARY KEY,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    rounds   INTEGER NOT NULL DEFAULT 0,
+    wins     INTEGER NOT NULL DEFAULT 0,
+    losses   INTEGER NOT NULL DEFAULT 0,
+    ties     INTEGER NOT NULL DEFAULT 0,
+    updated  REAL
+);
+CREATE INDEX IF NOT EXISTS teams_by_wins ON teams (wins DESC, rounds);
+"""
+
+_UPSERT = """
+INSERT INTO teams (team, sessions, rounds, wins, losses, ties, updated) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (team) DO UPDATE SET
+    sessions = sessions + excluded.sessions, rounds = rounds + excluded.rounds, wins = wins + excluded.wins,
+    losses = losses + excluded.losses, ties = ties + excluded.ties, updated = excluded.updated
+"""
+
+_TOP = "SELECT team, sessions, rounds, wins, losses, ties FROM teams ORDER BY wins DESC, rounds LIMIT ?"
+
+
+def connect(path, timeout=5.0):
+    """Opens the stats database, creating the schema if needed."""
+    conn = sqlite3.connect(path, timeout=timeout)  # timeout: wait this long for another worker's write lock
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def top(conn, n=10):
+    """Returns the n teams with the most wins (fewest rounds first on a tie) as dicts."""
+    board = []
+    for rank, (team, *counts) in enumerate(conn.execute(_TOP, (n,)), 1):
+        entry = {"rank": rank, "team": team, **dict(zip(_COLUMNS, counts))}
+        entry["win_rate"] = entry["wins"] / entry["rounds"] if entry["rounds"] else 0.0
+        board.append(entry)
+    return board
+
+
+class _Shard:
+    __slots__ = ('counts', 'flushed')
+
+    def __init__(self):
+        self.counts = {}   # team -> running totals, written only by the owning thread
+        self.flushed = {}  # team -> totals already in the database, touched only by the flusher
+
+
+class Leaderboard:
+    """Per-thread team counters flushed to SQLite in batches. One per process."""
+
+    def __init__(self, path, flush_interval=2.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Guards the shard list, never taken when recording
+        self._shards = []              # (thread, shard)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _team(self, team):
+        counts = self._shard().counts
+        totals = counts.get(team)
+        if totals is None:
+            totals = counts[team] = [0] * len(_COLUMNS)
+        return totals
+
+    def record(self, team, result, n=1):
+        """Counts n rounds of team that ended with result (PAYLOAD_WIN/LOSS/TIE)."""
+        totals = self._team(team)
+        totals[_ROUNDS] += n
+        totals[_RESULT_COLUMN[result]] += n
+
+    def record_session(self, team):
+        self._team(team)[_SESSIONS] += 1
+
+    def start(self):
+        """Creates the schema and starts the flush thread. Call after any fork. Returns self."""
+        connect(self.path).close()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        # Unlike atexit, Finalize also runs when a multiprocessing worker exits
+        multiprocessing.util.Finalize(self, self.close, exitpriority=15)
+        return self
+
+    def close(self):
+        """Stops the flush thread after a last flush."""
+        thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._stop.set()
+            thread.join()
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while not self._stop.wait(self.flush_interval):
+                self._flush(conn)
+            self._flush(conn)
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """
+        Returns (rows, marks, finished): the upserts for everything not flushed
+        yet, what to mark flushed once they land, and the shards of threads
+        that had already exited (so nothing of theirs is missing from rows).
+        """
+        with self._lock:
+            shards = list(self._shards)
+        finished = [shard for thread, shard in shards if not thread.is_alive()]
+        deltas = {}
+        marks = []
+        for _, shard in shards:
+            for team, totals in list(shard.counts.items()):
+                current = tuple(totals)  # Copy: the owner keeps counting
+                done = shard.flushed.get(team)
+                if done == current:
+                    continue
+                delta = deltas.setdefault(team, [0] * len(_COLUMNS))
+                for i, v in enumerate(current):
+                    delta[i] += v - (done[i] if done else 0)
+                marks.append((shard, team, current))
+        now = time.time()
+        return [(team, *delta, now) for team, delta in deltas.items()], marks, finished
+
+    def _flush(self, conn):
+        rows, marks, finished = self._collect()
+        if rows:
+            try:
+                with conn:  # One transaction per flush
+                    conn.executemany(_UPSERT, rows)
+            except sqlite3.Error as e:
+                self.failed_flushes += 1  # Nothing is marked flushed: the next flush retries it all
+                log.error("leaderboard_error", error=str(e))
+                return
+            for shard, team, current in marks:
+                shard.flushed[team] = current
+            self.flushes += 1
+        if finished:
+            with self._lock:
+                self._shards = [(t, s) for t, s in self._shards if s not in finished]
+
+    def top(self, n=10):
+        """Top n teams from the database, i.e. as of the last flush of every worker."""
+        conn = connect(self.path)
+        try:
+            return top(conn, n)
+        finally:
+            conn.close()
+
+    def page(self, query):
+        """GET /leaderboard?top=N on the metrics port (see metrics.pages)."""
+        return "application/json", json.dumps(self.top(int(query.get("top", 10))), indent=2) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the team leaderboard from a server stats database.")
+    parser.add_argument("db", help="the server's --stats-db file")
+    parser.add_argument("--top", type=int, default=10, help="teams to show")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    board = top(conn, args.top)
+    conn.close()
+    if args.json:
+        print(json.dumps(board, indent=2))
+        return
+    print(f"{'#':>3}  {'Team':<32} {'Wins':>8} {'Losses':>8} {'Ties':>8} {'Rounds':>8} {'Win %':>6} {'Sessions':>8}")
+    for e in board:
+        print(f"{e['rank']:>3}  {e['team']:<32} {e['wins']:>8} {e['losses']:>8} {e['ties']:>8} {e['rounds']:>8} "
+              f"{e['win_rate'] * 100:>6.1f} {e['sessions']:>8}")
+
+
+if __name__ == "__main__":
+    main()
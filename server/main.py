@@ -1,10 +1,176 @@
-from server import Server
+import argparse
+import functools
+import multiprocessing.util
+import os
+import random
+import signal
+
+from server import Server, OVERLOAD_POLICIES
 from utils import Game
+from aio_server import AsyncServer, AsyncGame
+from prefork import PreforkSupervisor
+from deck_pool import ShufflePool
+from eventlog import log, LEVELS
+from metrics import start_http, pages
+from timeouts import timers
+from admission import TeamLimiter
+from recorder import Recorder
+from leaderboard import Leaderboard
+from shared.recording import RECORD_SIZE
+from profiling import profiler
+from shared.tracing import tracer
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Blackjack server.")
+    parser.add_argument("--mode", choices=["threaded", "asyncio"], default="threaded",
+                        help="threaded: one thread per client, asyncio: one event loop for all clients")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes sharing the port via SO_REUSEPORT (0 = one per core)")
+    parser.add_argument("--backlog", type=int, default=128, help="listen backlog (pending connections the kernel holds)")
+    parser.add_argument("--max-workers", type=int, default=0,
+                        help="threaded: serve connections from a pool of this many threads (0 = a thread per connection)")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="connections waiting for a pool thread before the overload policy applies")
+    parser.add_argument("--overload", choices=OVERLOAD_POLICIES, default="queue",
+                        help="full queue: stop accepting (queue), close new connections (reject), "
+                             "or evict the longest-idle kept-open connection (shed)")
+    parser.add_argument("--team-rate", type=float, default=0,
+                        help="sessions per second a team name may start, per worker process (0 = unlimited)")
+    parser.add_argument("--team-burst", type=int, default=10, help="sessions a team may start back-to-back")
+    parser.add_argument("--capacity", type=int, default=0,
+                        help="sessions the server is sized for, advertised in offers next to the active count "
+                             "(0 = unknown)")
+    parser.add_argument("--decks", type=int, default=Game.num_decks,
+                        help="decks per shoe; each session keeps one shoe")
+    parser.add_argument("--penetration", type=float, default=Game.penetration,
+                        help="fraction of the shoe dealt before reshuffling")
+    parser.add_argument("--request-timeout", type=float, default=Game.request_timeout,
+                        help="seconds from connect to the first request before the client is evicted (0 = none)")
+    parser.add_argument("--idle-timeout", type=float, default=Game.idle_timeout,
+                        help="seconds a connection may sit idle between sessions before it is closed (0 = never)")
+    parser.add_argument("--decision-timeout", type=float, default=Game.decision_timeout,
+                        help="seconds per Hit/Stand decision; a client that misses it loses the round "
+                             "(0 = none, the default: interactive players take their time)")
+    parser.add_argument("--session-timeout", type=float, default=Game.session_timeout,
+                        help="seconds from request to last result; the round in progress is lost (0 = none)")
+    parser.add_argument("--pool-size", type=int, default=32,
+                        help="pre-shuffled shoes kept ready by a background thread (0 = shuffle inline)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed the shuffles for reproducible runs (worker i uses seed + i)")
+    parser.add_argument("--record-dir", default=None,
+                        help="record every session and round into binary segment files here, for audits and "
+                             "client/replay.py (recorded sessions shuffle from their own seed, not --pool-size)")
+    parser.add_argument("--record-segment-mb", type=int, default=64, help="size of each preallocated segment file")
+    parser.add_argument("--allow-replay", action="store_true",
+                        help="accept replay requests, which pick the shoe seed; for test servers only")
+    parser.add_argument("--stats-db", default=None,
+                        help="keep per-team totals in this SQLite file (shared by all workers); "
+                             "GET /leaderboard?top=N on --metrics-port serves the top teams")
+    parser.add_argument("--stats-flush-interval", type=float, default=2.0,
+                        help="seconds between batched writes of the team totals to --stats-db")
+    parser.add_argument("--log-level", choices=list(LEVELS), default="info",
+                        help="debug adds a record per Hit/Stand decision")
+    parser.add_argument("--log-file", default=None,
+                        help="append JSON-lines logs to this file instead of stdout")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="serve plain-text metrics on http://127.0.0.1:PORT/metrics (worker i uses PORT + i; 0 = off)")
+    parser.add_argument("--profile-dir", default=None,
+                        help="enable the session profiler; SIGUSR1 toggles sampling, SIGUSR2 dumps results here")
+    parser.add_argument("--profile-fraction", type=float, default=0.01,
+                        help="fraction of sessions profiled while sampling is on")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also track allocations of sampled sessions with tracemalloc")
+    parser.add_argument("--profile-start", action="store_true", help="start with sampling on")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="record span traces and write Chrome trace JSON to FILE on exit (FILE-<pid> per worker)")
+    parser.add_argument("--trace-capacity", type=int, default=1 << 16, help="trace ring-buffer size in events")
+    args = parser.parse_args()
+    if args.decks < 1:
+        parser.error("--decks must be at least 1")
+    if not 0 < args.penetration <= 1:
+        parser.error("--penetration must be in (0, 1]")
+    if args.max_workers < 0 or args.queue_size < 1 or args.backlog < 1:
+        parser.error("--max-workers cannot be negative; --queue-size and --backlog must be at least 1")
+    if args.team_rate < 0 or args.team_burst < 1:
+        parser.error("--team-rate cannot be negative and --team-burst must be at least 1")
+    if not 0 <= args.capacity <= 0xFFFF:
+        parser.error("--capacity must be between 0 and 65535")
+    if args.stats_flush_interval <= 0:
+        parser.error("--stats-flush-interval must be positive")
+    if args.record_segment_mb < 1:
+        parser.error("--record-segment-mb must be at least 1")
+    if args.pool_size < 0:
+        parser.error("--pool-size cannot be negative")
+    if not 0 <= args.profile_fraction <= 1:
+        parser.error("--profile-fraction must be in [0, 1]")
+    return args
+
+def init_worker(args, index):
+    """Builds per-process game state. Runs once in every worker process."""
+    if args.profile_dir:
+        # First, so every thread started below inherits the profiler's signal mask
+        profiler.configure(args.profile_fraction, args.profile_dir, args.profile_memory)
+        profiler.enabled = args.profile_start
+        profiler.install_signals()
+    Game.num_decks = args.decks
+    Game.penetration = args.penetration
+    Game.request_timeout = args.request_timeout
+    Game.idle_timeout = args.idle_timeout
+    Game.decision_timeout = args.decision_timeout
+    Game.session_timeout = args.session_timeout
+    if args.team_rate:
+        Game.team_limiter = TeamLimiter(args.team_rate, args.team_burst)
+    log.set_level(args.log_level)
+    if args.log_file:
+        log.stream = open(args.log_file, "a")
+    log.start()
+    timers.start()
+    Game.allow_replay = args.allow_replay
+    if args.record_dir:
+        Game.recorder = Recorder(args.record_dir, args.record_segment_mb * (1 << 20) // RECORD_SIZE).start()
+    if args.stats_db:
+        Game.leaderboard = Leaderboard(args.stats_db, args.stats_flush_interval).start()
+        pages["/leaderboard"] = Game.leaderboard.page
+    if args.metrics_port:
+        start_http(args.metrics_port + index)
+    if args.trace:
+        path = args.trace
+        if args.workers != 1:
+            root, ext = os.path.splitext(path)
+            path = f"{root}-{os.getpid()}{ext}"
+        tracer.enable(args.trace_capacity)
+        multiprocessing.util.Finalize(tracer, tracer.export, (path,), exitpriority=20)
+    seed = None if args.seed is None else args.seed + index
+    Game.seeds = random.Random(seed)
+    if args.pool_size > 0:
+        Game.deck_pool = ShufflePool(args.decks, args.pool_size, seed=seed).start()
+    elif seed is not None:
+        random.seed(seed)
 
 def main():
-    srv = Server(tcp_port=12000, server_name="BlackjackMaster")
-    srv.start()
-    srv.run(Game.start)
+    args = parse_args()
+    if args.mode == "asyncio":
+        server_cls, callback = AsyncServer, AsyncGame.start
+    else:
+        server_cls, callback = Server, Game.start
+    if args.profile_dir:
+        callback = profiler.wrap(callback)
+
+    options = dict(backlog=args.backlog, queue_size=args.queue_size, overload=args.overload,
+                   max_workers=args.max_workers if server_cls is Server else 0)
+
+    if args.workers != 1:
+        supervisor = PreforkSupervisor(callback, workers=args.workers, tcp_port=12000,
+                                       server_name="BlackjackMaster", server_cls=server_cls,
+                                       worker_init=functools.partial(init_worker, args),
+                                       forward_signals=(signal.SIGUSR1, signal.SIGUSR2) if args.profile_dir else (),
+                                       capacity=args.capacity, server_options=options)
+        supervisor.run()
+    else:
+        init_worker(args, 0)
+        srv = server_cls(tcp_port=12000, server_name="BlackjackMaster", capacity=args.capacity, **options)
+        srv.start()
+        srv.run(callback)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
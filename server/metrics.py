@@ -0,0 +1,203 @@
+"""
+In-process metrics: counters and HDR-style latency histograms.
+
+Every thread writes only to its own shard (plain lists indexed by metric id),
+so recording takes no lock. A scrape merges all shards. Shards of finished
+threads are folded into a retired total, which keeps thread-per-client
+servers from piling them up.
+
+    metrics.inc(ROUNDS)
+    metrics.observe(H_ROUND, seconds)
+    start_http(9100)  # GET /metrics -> plain text, one "name value" per line
+    pages["/leaderboard"] = handler  # More pages on the same port
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# Counters
+(ACCEPTED, CLOSED, SESSIONS, ROUNDS, WINS, LOSSES, TIES,
+ PROTOCOL_ERRORS, CLIENT_ERRORS, FRAMES_SENT, SEND_CALLS, BYTES_SENT,
+ EVICT_REQUEST, EVICT_IDLE, EVICT_DECISION, EVICT_SESSION, REJECTED, SHED, THROTTLED,
+ RECORDS_DROPPED, ABANDONED, POOL_HITS, POOL_MISSES) = range(23)
+COUNTER_NAMES = (
+    "connections_accepted_total", "connections_closed_total", "sessions_total", "rounds_total",
+    "outcomes_total{result=\"win\"}", "outcomes_total{result=\"loss\"}", "outcomes_total{result=\"tie\"}",
+    "protocol_errors_total", "client_errors_total", "frames_sent_total", "send_calls_total", "bytes_sent_total",
+    "evictions_total{phase=\"request\"}", "evictions_total{phase=\"idle\"}",
+    "evictions_total{phase=\"decision\"}", "evictions_total{phase=\"session\"}",
+    "connections_rejected_total", "connections_shed_total", "requests_throttled_total",
+    "records_dropped_total", "sessions_abandoned_total", "shuffle_pool_hits_total", "shuffle_pool_misses_total",
+)
+
+# Latency histograms, one per phase
+H_REQUEST, H_DECISION, H_ROUND, H_SESSION = range(4)
+HISTOGRAM_PHASES = (
+    "request",   # Session started -> request parsed
+    "decision",  # Cards flushed -> the client's Hit/Stand arrived
+    "round",     # Whole round, including the client's decisions
+    "session",   # Request parsed -> last result sent
+)
+
+# Log-linear buckets over microseconds: values below 16 get exact buckets,
+# above that every power of two is split into 8 sub-buckets (<= 12.5% error).
+_SUB_BITS = 3
+_SUB = 1 << _SUB_BITS
+_EXACT = _SUB * 2
+BUCKETS = _EXACT + 40 * _SUB  # Up to about 2^43 us (100 days)
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_index(micros):
+    if micros < _EXACT:
+        return micros if micros > 0 else 0
+    shift = micros.bit_length() - _SUB_BITS - 1
+    return min(_EXACT + (shift - 1) * _SUB + (micros >> shift) - _SUB, BUCKETS - 1)
+
+
+def bucket_upper(index):
+    """Highest microsecond value that lands in bucket index."""
+    if index < _EXACT:
+        return index
+    shift, sub = divmod(index - _EXACT, _SUB)
+    shift += 1
+    return ((sub + _SUB + 1) << shift) - 1
+
+
+class _Shard:
+    __slots__ = ('counters', 'buckets', 'sums')
+
+    def __init__(self):
+        self.counters = [0] * len(COUNTER_NAMES)
+        self.buckets = [[0] * BUCKETS for _ in HISTOGRAM_PHASES]
+        self.sums = [0.0] * len(HISTOGRAM_PHASES)  # Seconds
+
+    def merge(self, other):
+        for i, v in enumerate(other.counters):
+            self.counters[i] += v
+        for mine, theirs in zip(self.buckets, other.buckets):
+            for i, v in enumerate(theirs):
+                if v:
+                    mine[i] += v
+        for i, v in enumerate(other.sums):
+            self.sums[i] += v
+
+
+class Registry:
+    """Per-thread metric shards, merged on scrape."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Guards the shard list, never taken when recording
+        self._shards = []              # (thread, shard)
+        self._retired = _Shard()       # Totals of threads that have finished
+        self._retire_at = 64
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+                if len(self._shards) >= self._retire_at:
+                    self._retire_dead()
+                    self._retire_at = 2 * len(self._shards) + 64
+            return shard
+
+    def _retire_dead(self):
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+
+    def inc(self, counter, n=1):
+        self._shard().counters[counter] += n
+
+    def observe(self, phase, seconds):
+        shard = self._shard()
+        shard.buckets[phase][bucket_index(int(seconds * 1_000_000))] += 1
+        shard.sums[phase] += seconds
+
+    def snapshot(self):
+        """Returns one _Shard with every thread's values added up."""
+        total = _Shard()
+        with self._lock:
+            self._retire_dead()
+            total.merge(self._retired)
+            for _, shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def render(self, prefix="blackjack_"):
+        """Plain-text exposition: counters, active connections and histogram quantiles (seconds)."""
+        snap = self.snapshot()
+        lines = [f"{prefix}{name} {value}" for name, value in zip(COUNTER_NAMES, snap.counters)]
+        lines.append(f"{prefix}active_connections {snap.counters[ACCEPTED] - snap.counters[CLOSED]}")
+        for phase, name in enumerate(HISTOGRAM_PHASES):
+            buckets = snap.buckets[phase]
+            count = sum(buckets)
+            metric = f'{prefix}latency_seconds'
+            for q in QUANTILES:
+                lines.append(f'{metric}{{phase="{name}",quantile="{q}"}} {_quantile(buckets, count, q) / 1e6:.6f}')
+            highest = max((i for i, v in enumerate(buckets) if v), default=0)
+            lines.append(f'{metric}_max{{phase="{name}"}} {bucket_upper(highest) / 1e6:.6f}')
+            lines.append(f'{metric}_sum{{phase="{name}"}} {snap.sums[phase]:.6f}')
+            lines.append(f'{metric}_count{{phase="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _quantile(buckets, count, q):
+    """Upper bound (us) of the bucket holding the q-th value; 0 when empty."""
+    if count == 0:
+        return 0
+    rank = max(1, int(q * count + 0.5))
+    seen = 0
+    for i, v in enumerate(buckets):
+        seen += v
+        if seen >= rank:
+            return bucket_upper(i)
+    return bucket_upper(BUCKETS - 1)
+
+
+metrics = Registry()
+
+
+# Extra GET pages on the metrics port: path -> callable(query dict) returning (content type, body str)
+pages = {}
+
+
+class _ScrapeHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path in pages:
+            try:
+                content_type, body = pages[path](dict(parse_qsl(query)))
+            except Exception as e:
+                self.send_error(500, str(e))
+                return
+            body = body.encode()
+        elif path in ("/", "/metrics"):
+            content_type, body = "text/plain; version=0.0.4", metrics.render().encode()
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+def start_http(port, host="127.0.0.1"):
+    """Serves GET /metrics on a daemon thread. Returns the HTTP server."""
+    httpd = ThreadingHTTPServer((host, port), _ScrapeHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
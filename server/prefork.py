@@ -0,0 +1,129 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import time
+
+from server import Server
+from shared.exceptions import NetworkException
+
+
+def _worker_main(server_cls, game_callback, tcp_port, server_name, index, worker_init, forwarded=(),
+                 load_board=None, capacity=0, server_options=None):
+    """Entry point of a worker process: a normal accept/game loop on a shared port."""
+    # Ctrl+C reaches the whole process group; only the supervisor reacts to it
+    # and forwards SIGTERM, which surfaces here as KeyboardInterrupt.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    for sig in forwarded:
+        signal.signal(sig, signal.SIG_IGN)  # Drop the supervisor's forwarder; worker_init may install its own
+
+    if worker_init:
+        worker_init(index)  # Per-process state (threads don't survive fork)
+    srv = server_cls(tcp_port=tcp_port, server_name=server_name, reuse_port=True, broadcast=False,
+                     capacity=capacity, **(server_options or {}))
+    srv.load_board, srv.load_slot = load_board, index  # Lets the supervisor advertise every worker's load
+    try:
+        srv.start()
+    except KeyboardInterrupt:
+        return
+    srv.run(game_callback)
+
+
+class PreforkSupervisor:
+    """Runs N worker processes that each bind tcp_port with SO_REUSEPORT.
+
+    The kernel spreads incoming connections across the workers, so every core
+    gets its own interpreter. The supervisor itself sends the UDP offers, so
+    clients see one offer per second no matter how many workers are running.
+    Workers publish their active session counts in a shared array, and the
+    offers advertise the sum.
+    """
+
+    STARTUP_GRACE = 1.0  # Seconds; a worker dying sooner is not restarted
+
+    def __init__(self, game_callback, workers=None, tcp_port=12000, server_name="MysticDealer", server_cls=Server,
+                 worker_init=None, forward_signals=(), capacity=0, server_options=None):
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise NetworkException("SO_REUSEPORT is not supported on this platform.")
+        self.game_callback = game_callback
+        self.workers = workers or os.cpu_count() or 1
+        self.tcp_port = tcp_port
+        self.server_name = server_name
+        self.server_cls = server_cls
+        self.worker_init = worker_init  # Called as worker_init(index) in each new worker
+        self.forward_signals = tuple(forward_signals)  # Relayed to every worker (e.g. runtime controls)
+        self.processes = []
+        self.spawned_at = []
+        self.running = True
+        # Fork keeps game_callback usable even when it is not picklable
+        self._ctx = multiprocessing.get_context("fork")
+        self.server_options = dict(server_options or {})  # Extra keyword arguments for each worker's server
+        # Advertised for the whole port, split evenly across workers; a worker pool implies one
+        self.capacity = capacity or self.workers * self.server_options.get("max_workers", 0)
+        self._load_board = self._ctx.RawArray('i', self.workers)  # Active sessions per worker slot
+        self._broadcaster = Server(tcp_port=tcp_port, server_name=server_name)
+        self._broadcaster.load = lambda: (sum(self._load_board), self.capacity)
+
+    def _spawn(self, index):
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(self.server_cls, self.game_callback, self.tcp_port, self.server_name, index, self.worker_init,
+                  self.forward_signals, self._load_board, -(-self.capacity // self.workers), self.server_options),
+            daemon=False
+        )
+        proc.start()
+        return proc
+
+    def run(self):
+        """Starts the workers and the broadcaster, then supervises until interrupted."""
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            self.processes = [self._spawn(i) for i in range(self.workers)]
+            self.spawned_at = [time.monotonic()] * self.workers
+            for sig in self.forward_signals:
+                signal.signal(sig, self._forward)
+            self._broadcaster.start_broadcast()
+            print(f"Supervisor started {self.workers} workers on port {self.tcp_port}")
+
+            # Restart any worker that dies on its own
+            while self.running:
+                sentinels = [p.sentinel for p in self.processes]
+                for ready in multiprocessing.connection.wait(sentinels):
+                    idx = sentinels.index(ready)
+                    dead = self.processes[idx]
+                    dead.join()
+                    if time.monotonic() - self.spawned_at[idx] < self.STARTUP_GRACE:
+                        # Failed during startup (e.g. port taken): restarting would just spin
+                        print(f"Worker {dead.pid} failed to start (exit code {dead.exitcode}).")
+                        return
+                    print(f"Worker {dead.pid} exited with code {dead.exitcode}, restarting.")
+                    self._load_board[idx] = 0  # Its sessions died with it
+                    self.processes[idx] = self._spawn(idx)
+                    self.spawned_at[idx] = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def _forward(self, signum, frame):
+        for proc in self.processes:
+            if proc.is_alive():
+                os.kill(proc.pid, signum)
+
+    def close(self, timeout=5.0):
+        """Stops broadcasting and propagates shutdown to every worker."""
+        self.running = False
+        self._broadcaster.running = False
+        if self._broadcaster.udp_socket: self._broadcaster.udp_socket.close()
+
+        for proc in self.processes:
+            if proc.is_alive():
+                proc.terminate()  # SIGTERM -> worker closes its listener
+        for proc in self.processes:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+        print("Server offline.")
@@ -0,0 +1,191 @@
+"""
+Opt-in session profiler: cProfile (and optionally tracemalloc) for a random
+fraction of sessions, switchable at runtime.
+
+    kill -USR1 <pid>   # toggle sampling on/off (turning it off also dumps)
+    kill -USR2 <pid>   # dump what has been aggregated since sampling was switched on
+
+Dumps go to <out_dir>/profile-<pid>.pstats (load with pstats or snakeviz),
+profile-<pid>.txt (top functions by cumulative time) and, with memory
+tracking, memory-<pid>.txt (allocation growth per source line, summed over
+the sampled sessions).
+
+While sampling is off, wrapped callbacks are called directly. Unsampled
+sessions only pay for one random draw. cProfile is per thread, and for
+coroutines it is enabled only while the sampled session's own steps run, so
+other sessions are never profiled. tracemalloc is process-wide: it runs only
+while at least one sampled session is in progress, and during that time its
+diff also counts allocations made by concurrent sessions.
+"""
+import asyncio
+import cProfile
+import io
+import multiprocessing.util
+import os
+import pstats
+import random
+import signal
+import threading
+import tracemalloc
+import types
+
+from eventlog import log
+
+# The profiler's own bookkeeping is not part of any session
+_OWN_ALLOCATIONS = [tracemalloc.Filter(False, path) for path in (__file__, tracemalloc.__file__, pstats.__file__,
+                                                                  cProfile.__file__)]
+
+
+@types.coroutine
+def _drive_profiled(coro, prof):
+    """Runs coro step by step with prof enabled only inside its own steps."""
+    value, error = None, None
+    while True:
+        prof.enable()
+        try:
+            if error is None:
+                yielded = coro.send(value)
+            else:
+                yielded = coro.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            prof.disable()
+        try:
+            value, error = (yield yielded), None
+        except BaseException as e:
+            value, error = None, e
+
+
+class SessionProfiler:
+    def __init__(self, fraction=0.01, out_dir=".", memory=False, top=40):
+        self.fraction = fraction
+        self.out_dir = out_dir
+        self.memory = memory  # Also diff tracemalloc snapshots around sampled sessions
+        self.top = top        # Lines per text report
+        self.enabled = False
+        self.sampled = 0      # Sessions profiled since sampling was switched on
+        self._rng = random.Random()  # Own RNG: never disturbs seeded shuffles
+        self._lock = threading.Lock()
+        self._stats = None           # Aggregated pstats.Stats
+        self._memory_growth = {}     # "file:line" -> (bytes, blocks)
+        self._tracing = 0            # Sampled sessions currently tracing memory
+
+    def configure(self, fraction=None, out_dir=None, memory=None):
+        if fraction is not None: self.fraction = fraction
+        if out_dir is not None: self.out_dir = out_dir
+        if memory is not None: self.memory = memory
+
+    def install_signals(self, toggle=signal.SIGUSR1, dump=signal.SIGUSR2):
+        """
+        Serves the runtime controls from a dedicated thread, and dumps at exit.
+        Call it from the main thread before starting other threads: they
+        inherit the mask that blocks both signals, so sigwait() here receives
+        them even while every other thread is stuck in accept() or recv().
+        """
+        signals = {toggle, dump}
+        signal.pthread_sigmask(signal.SIG_BLOCK, signals)
+        for sig in signals:
+            signal.signal(sig, signal.SIG_DFL)  # Ignored signals would never reach sigwait()
+
+        def wait():
+            while True:
+                if signal.sigwait(signals) == toggle:
+                    self.toggle()
+                else:
+                    self.dump()
+
+        threading.Thread(target=wait, daemon=True).start()
+        multiprocessing.util.Finalize(self, self.dump, exitpriority=20)  # Before the log closes
+
+    def toggle(self):
+        if not self.enabled:
+            with self._lock:
+                self._stats, self._memory_growth, self.sampled = None, {}, 0
+        self.enabled = not self.enabled
+        log.info("profiler", enabled=self.enabled, fraction=self.fraction)
+        if not self.enabled:
+            self.dump()
+
+    def wrap(self, callback):
+        """Returns callback (a function or a coroutine function) with sampling around each call."""
+        if asyncio.iscoroutinefunction(callback):
+            async def profiled(*args):
+                if not self.enabled or self._rng.random() >= self.fraction:
+                    return await callback(*args)
+                prof, before = self._begin()
+                try:
+                    return await _drive_profiled(callback(*args), prof)
+                finally:
+                    self._end(prof, before)
+        else:
+            def profiled(*args):
+                if not self.enabled or self._rng.random() >= self.fraction:
+                    return callback(*args)
+                prof, before = self._begin()
+                prof.enable()
+                try:
+                    return callback(*args)
+                finally:
+                    prof.disable()
+                    self._end(prof, before)
+        return profiled
+
+    def _begin(self):
+        before = None
+        if self.memory:
+            with self._lock:
+                if self._tracing == 0:
+                    tracemalloc.start()
+                self._tracing += 1
+                before = tracemalloc.take_snapshot().filter_traces(_OWN_ALLOCATIONS)
+        return cProfile.Profile(), before
+
+    def _end(self, prof, before):
+        with self._lock:
+            self.sampled += 1
+            if self._stats is None:
+                self._stats = pstats.Stats(prof)
+            else:
+                self._stats.add(prof)
+            if before is not None:
+                after = tracemalloc.take_snapshot().filter_traces(_OWN_ALLOCATIONS)
+                for diff in after.compare_to(before, 'lineno'):
+                    if diff.size_diff:
+                        frame = diff.traceback[0]
+                        key = f"{frame.filename}:{frame.lineno}"
+                        size, count = self._memory_growth.get(key, (0, 0))
+                        self._memory_growth[key] = (size + diff.size_diff, count + diff.count_diff)
+                self._tracing -= 1
+                if self._tracing == 0:
+                    tracemalloc.stop()
+
+    def dump(self):
+        """Writes the aggregated results (if any) to out_dir. Returns the paths written."""
+        with self._lock:
+            if self._stats is None:
+                return []
+            os.makedirs(self.out_dir, exist_ok=True)
+            path = lambda kind, ext: os.path.join(self.out_dir, f"{kind}-{os.getpid()}.{ext}")
+            paths = [path("profile", "pstats"), path("profile", "txt")]
+            self._stats.dump_stats(paths[0])
+            text = io.StringIO()
+            self._stats.stream = text
+            self._stats.sort_stats("cumulative").print_stats(self.top)
+            with open(paths[1], "w") as f:
+                f.write(f"{self.sampled} sampled sessions\n{text.getvalue()}")
+
+            if self._memory_growth:
+                paths.append(path("memory", "txt"))
+                top = sorted(self._memory_growth.items(), key=lambda kv: -abs(kv[1][0]))[:self.top]
+                with open(paths[-1], "w") as f:
+                    f.write(f"Allocation growth over {self.sampled} sampled sessions (bytes, blocks, line)\n")
+                    for key, (size, count) in top:
+                        f.write(f"{size:>12} {count:>8}  {key}\n")
+            sampled = self.sampled
+
+        log.info("profile_dump", sessions=sampled, files=paths)
+        return paths
+
+
+profiler = SessionProfiler()
@@ -0,0 +1,177 @@
+"""
+Session recorder: an audit trail of every hand, in the fixed-width format of
+shared/recording.py, replayable with client/replay.py.
+
+Records go straight into a memory-mapped, preallocated segment file. A writer
+reserves a slot by taking the next index from a counter and packs the record
+into the mapping, which is only a memory write; the kernel writes the pages
+back. A background thread does everything that touches the disk: it prepares
+the next segment before the current one fills up, and flushes and closes full
+ones. If the next segment is not ready in time, records are dropped and
+counted rather than waited for.
+
+    recorder = Recorder("recordings").start()
+    recorder.session(session, seed, team, rounds, version, decks, penetration)
+    recorder.round(machine, session, seed, started, think, end)
+
+Segments are named session-<pid>-<n>.rec, so prefork workers each write their own.
+"""
+import itertools
+import mmap
+import multiprocessing.util
+import os
+import struct
+import threading
+import time
+
+from eventlog import log
+from metrics import metrics, RECORDS_DROPPED
+from shared.recording import *
+
+_RETIRE_GRACE = 1.0  # Seconds a full segment stays mapped, for writers that reserved a slot just before
+_MAX_MICROS = 0xFFFFFFFF  # Round duration and think time fields are 32-bit: about 71.6 minutes
+
+
+class Segment:
+    __slots__ = ('path', 'fd', 'map', 'capacity', 'slots', 'retired')
+
+
+class Recorder:
+    """Appends session and round records to mmap segments. One per process."""
+
+    def __init__(self, directory, segment_records=1 << 20, flush_interval=1.0):
+        self.directory = directory
+        self.segment_records = segment_records
+        self.flush_interval = flush_interval  # Seconds between background msyncs of the current segment
+        self.dropped = 0
+        self._segment = None
+        self._spare = None     # Next segment, prepared by the background thread
+        self._retired = []     # Full segments waiting to be flushed and closed
+        self._lock = threading.Lock()  # Held only to swap segments, never for I/O
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self._names = itertools.count()
+
+    def start(self):
+        """Opens the first segment and starts the background thread. Call after any fork. Returns self."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._names = itertools.count()
+        self._segment = self._open()
+        self._running = True
+        self._wake.set()  # Prepare the first spare right away
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        multiprocessing.util.Finalize(self, self.close, exitpriority=15)
+        return self
+
+    def _open(self):
+        pid = os.getpid()
+        while True:
+            path = os.path.join(self.directory, f"session-{pid}-{next(self._names):04d}.rec")
+            try:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+                break
+            except FileExistsError:
+                continue  # Left over from an earlier process with the same pid
+        size = SEGMENT_HEADER.size + self.segment_records * RECORD_SIZE
+        try:
+            os.posix_fallocate(fd, 0, size)  # Allocate the blocks now, not on first touch
+        except (AttributeError, OSError):
+            os.ftruncate(fd, size)
+        seg = Segment()
+        seg.path, seg.fd, seg.capacity, seg.retired = path, fd, self.segment_records, 0.0
+        seg.map = mmap.mmap(fd, size)
+        seg.slots = itertools.count()
+        SEGMENT_HEADER.pack_into(seg.map, 0, SEGMENT_MAGIC, RECORD_SIZE, pid, int(time.time() * 1e6))
+        return seg
+
+    def _reserve(self):
+        """Returns (segment, byte offset) of a free slot, or None if the record has to be dropped."""
+        seg = self._segment
+        if seg is None:
+            return None  # Closed
+        i = next(seg.slots)  # Atomic under the GIL
+        if i >= seg.capacity:
+            with self._lock:
+                if self._segment is seg and self._spare is not None:
+                    seg.retired = time.monotonic()
+                    self._retired.append(seg)
+                    self._segment, self._spare = self._spare, None
+                    self._wake.set()  # Prepare the next spare
+                seg = self._segment
+            if seg is None:
+                return None
+            i = next(seg.slots)
+            if i >= seg.capacity:
+                return None
+        return seg, SEGMENT_HEADER.size + i * RECORD_SIZE
+
+    def _write(self, record, *fields):
+        slot = self._reserve()
+        try:
+            if slot is not None:
+                record.pack_into(slot[0].map, slot[1], *fields)
+                return
+        except ValueError:
+            pass  # Segment closed under us at shutdown
+        except struct.error as e:
+            log.error("recorder_error", error=str(e))  # A field out of range: drop, never fail the game
+        self.dropped += 1
+        metrics.inc(RECORDS_DROPPED)
+
+    def session(self, session, seed, team_name, num_rounds, version, decks, penetration, autoplay=False):
+        self._write(SESSION_RECORD, KIND_SESSION, version, decks, num_rounds, SESSION_AUTOPLAY if autoplay else 0,
+                    session, seed, int(time.time() * 1e6), penetration, team_name.encode('utf-8')[:32])
+
+    def round(self, machine, session, seed, started, think=0.0, end=END_DONE):
+        """Records the machine's last finished round; started is its time.perf_counter() start."""
+        duration = time.perf_counter() - started
+        player, dealer = machine.player_cards, machine.dealer_cards
+        self._write(ROUND_RECORD, KIND_ROUND, machine.round_no, machine.result, end, session, seed,
+                    int((time.time() - duration) * 1e6),
+                    min(int(duration * 1e6), _MAX_MICROS), min(int(think * 1e6), _MAX_MICROS),
+                    len(player) - 2, len(player), len(dealer),
+                    bytes(player[:RECORD_CARDS]), bytes(dealer[:RECORD_CARDS]))
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                if self._spare is None:
+                    self._spare = self._open()
+                now = time.monotonic()
+                while self._retired and now - self._retired[0].retired >= _RETIRE_GRACE:
+                    self._close_segment(self._retired.pop(0))
+                self._segment.map.flush()
+            except (OSError, ValueError) as e:
+                log.error("recorder_error", error=str(e))
+
+    @staticmethod
+    def _close_segment(seg, used=None):
+        """Flushes and closes a segment; used (records) truncates off the unused tail."""
+        seg.map.flush()
+        seg.map.close()
+        if used is not None:
+            os.ftruncate(seg.fd, SEGMENT_HEADER.size + used * RECORD_SIZE)
+        os.close(seg.fd)
+
+    def close(self):
+        """Stops the background thread, then flushes and closes every segment, dropping unused space."""
+        if not self._running:
+            return
+        self._running = False
+        self._wake.set()
+        self._thread.join()
+        with self._lock:
+            seg, self._segment = self._segment, None
+            spare, self._spare = self._spare, None
+        for old in self._retired:
+            self._close_segment(old)
+        self._retired = []
+        if spare is not None:
+            self._close_segment(spare)
+            os.unlink(spare.path)
+        if seg is not None:
+            self._close_segment(seg, min(next(seg.slots), seg.capacity))
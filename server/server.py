@@ -1,3 +1,4 @@
+import queue
 import socket
 import threading
 import time
@@ -7,11 +8,45 @@ sys.path.append('../')
 
 from shared.protocol import *
 from shared.exceptions import NetworkException
+from eventlog import log
+from metrics import metrics, ACCEPTED, CLOSED, CLIENT_ERRORS, REJECTED, SHED
+from shared.tracing import tracer
+from timeouts import shed_idle
+
+OVERLOAD_POLICIES = ("queue", "reject", "shed")
 
 class Server:
-    def __init__(self, tcp_port=12000, server_name="MysticDealer"):
+    """
+    Threaded server. By default every connection gets its own thread. With
+    max_workers, a fixed pool of threads serves connections from a queue of
+    at most queue_size. When that queue is full, the overload policy decides:
+    "queue" stops accepting until there is room (the listen backlog absorbs
+    the burst), "reject" closes the new connection at once, and "shed" evicts
+    the connection idle the longest between sessions (or else the oldest
+    queued one) to make room.
+    """
+
+    def __init__(self, tcp_port=12000, server_name="MysticDealer", reuse_port=False, broadcast=True, capacity=0,
+                 backlog=128, max_workers=0, queue_size=64, overload="queue"):
+        if overload not in OVERLOAD_POLICIES:
+            raise NetworkException(f"Unknown overload policy: {overload}")
         self.tcp_port = tcp_port
         self.server_name = server_name
+        self.reuse_port = reuse_port  # Lets several worker processes bind the same port
+        self.broadcast = broadcast  # Only one process per port should send offers
+        self.backlog = backlog  # Completed handshakes the kernel holds while we are busy
+        self.max_workers = max_workers  # 0 = one thread per connection
+        self.queue_size = queue_size
+        self.overload = overload
+        self._pending = None  # Accepted connections waiting for a pool thread
+        self._admitted = 0    # Pool connections being served or waiting
+        self._slots = threading.Condition()
+        # Sessions this server is sized for, advertised in offers (0 = unknown)
+        self.capacity = capacity or max_workers
+        self.active = 0  # Connections being served right now
+        self.load_board = None  # Optional shared array: slot load_slot mirrors self.active (prefork)
+        self.load_slot = 0
+        self._active_lock = threading.Lock()
         self.tcp_socket = None
         self.udp_socket = None
         self.running = True
@@ -22,22 +57,28 @@ class Server:
         try:
             # 1. Setup TCP
             self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if self.reuse_port:
+                self.tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self.tcp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
             self.tcp_socket.bind(('', self.tcp_port))
-            self.tcp_socket.listen(5)
+            self.tcp_socket.listen(self.backlog)
             
             # 2. Setup UDP Broadcast
-            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            
-            # 3. Start Broadcast Thread
-            self.broadcast_thread = threading.Thread(target=self._broadcast_offers, daemon=True)
-            self.broadcast_thread.start()
+            if self.broadcast:
+                self.start_broadcast()
             
             print(f"Server started, listening on IP address {self._get_ip()}")
             
         except Exception as e:
             raise NetworkException(f"Failed to start server: {e}")
 
+    def start_broadcast(self):
+        """Opens the UDP socket and starts the offer broadcast thread."""
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self.broadcast_thread = threading.Thread(target=self._broadcast_offers, daemon=True)
+        self.broadcast_thread.start()
+
     def _get_ip(self):
         # Helper to find local IP
         try:
@@ -49,23 +90,50 @@ class Server:
         except:
             return "127.0.0.1"
 
+    def load(self):
+        """Returns (active sessions, capacity) as advertised in the extended offer."""
+        return self.active, self.capacity
+
+    def _track_active(self, delta):
+        with self._active_lock:
+            self.active += delta
+            if self.load_board is not None:
+                self.load_board[self.load_slot] = self.active
+
     def _broadcast_offers(self):
-        """Background thread sending UDP offers."""
+        """Background thread sending UDP offers: the v1 offer, then the extended one with our load."""
         print("Server started broadcasting offers...")
         packet = pack_offer(self.tcp_port, self.server_name)
         while self.running:
             try:
                 self.udp_socket.sendto(packet, ('<broadcast>', UDP_PORT))
+                self.udp_socket.sendto(pack_offer_ext(self.tcp_port, self.server_name, *self.load()),
+                                       ('<broadcast>', UDP_PORT))
                 time.sleep(1)
             except Exception as e:
-                print(f"Broadcast error: {e}")
+                log.warning("broadcast_error", error=str(e))
 
     def run(self, game_callback):
-        """Main loop: Accepts TCP connections and spawns threads."""
+        """Main loop: Accepts TCP connections and hands them to new threads or the pool."""
+        if self.max_workers:
+            self._pending = queue.Queue()  # Bounded by the admitted count, see _admit
+            for _ in range(self.max_workers):
+                threading.Thread(target=self._pool_worker, args=(game_callback,), daemon=True).start()
         try:
             while self.running:
                 client_sock, addr = self.tcp_socket.accept()
-                print(f"Connection from {addr} established!")
+                # Frames are already coalesced per decision; don't let Nagle hold them back
+                client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                # Connections now carry many sessions; let the kernel notice peers that vanished
+                client_sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                metrics.inc(ACCEPTED)
+                if tracer.enabled:
+                    tracer.instant("accept", peer=f"{addr[0]}:{addr[1]}")
+                log.info("connect", peer=f"{addr[0]}:{addr[1]}")
+                
+                if self._pending is not None:
+                    self._admit(client_sock, addr)
+                    continue
                 
                 # Handle client in separate thread
                 client_thread = threading.Thread(
@@ -76,15 +144,56 @@ class Server:
         except KeyboardInterrupt:
             self.close()
 
+    def _admit(self, conn, addr):
+        """Queues a connection for the pool, applying the overload policy when every slot is taken."""
+        limit = self.max_workers + self.queue_size  # Served plus waiting
+        with self._slots:
+            if self._admitted >= limit:
+                if self.overload == "reject":
+                    metrics.inc(REJECTED)
+                    log.warning("rejected", peer=f"{addr[0]}:{addr[1]}")
+                    conn.close()
+                    metrics.inc(CLOSED)
+                    return
+                if self.overload == "shed" and not shed_idle():
+                    # Nobody is idle: drop the connection that has waited longest instead
+                    try:
+                        oldest = self._pending.get_nowait()
+                    except queue.Empty:
+                        pass
+                    else:
+                        metrics.inc(SHED)
+                        log.warning("shed", waiting="queued")
+                        oldest.close()
+                        metrics.inc(CLOSED)
+                        self._admitted -= 1
+                while self._admitted >= limit:
+                    self._slots.wait()  # Until a pool thread finishes a connection
+            self._admitted += 1
+        self._pending.put(conn)
+
+    def _pool_worker(self, callback):
+        """Pool thread: serves queued connections one at a time."""
+        while True:
+            conn = self._pending.get()
+            self._handle_client(conn, callback)
+            with self._slots:
+                self._admitted -= 1
+                self._slots.notify()
+
     def _handle_client(self, conn, callback):
         """Wrapper to safely run the game logic and close socket."""
+        self._track_active(1)
         try:
             callback(conn)
         except Exception as e:
-            print(f"Error handling client: {e}")
+            metrics.inc(CLIENT_ERRORS)
+            log.error("client_error", error=str(e))
         finally:
             conn.close()
-            print("Connection closed.")
+            self._track_active(-1)
+            metrics.inc(CLOSED)
+            log.info("disconnect")
 
     def close(self):
         self.running = False
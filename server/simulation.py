@@ -0,0 +1,248 @@
+"""
+Vectorized Monte Carlo simulation of the house rules (Round.dealer_turn /
+Round.get_winner), for measuring the house edge and the effect of rule changes.
+Whole batches of rounds are played at once as NumPy arrays. Only this tool
+needs NumPy; the server does not.
+
+    python simulation.py --rounds 5000000 --stand-on 17
+    python simulation.py --rounds 1000000 --hit-soft-17 --cross-check 20000
+"""
+import argparse
+import sys
+import time
+
+sys.path.append('../')
+
+import numpy as np
+
+from utils import Round, CARD_RANK
+from shared.hand import RANK_VALUE
+from shared.exceptions import GameException
+
+WIN, LOSS, TIE = 0, 1, 2
+
+_RANK = np.frombuffer(CARD_RANK, dtype=np.uint8).astype(np.int16)   # card index -> rank 1-13
+_VALUE = np.frombuffer(RANK_VALUE, dtype=np.uint8).astype(np.int16)  # rank -> value, Ace = 1
+
+
+class HouseRules:
+    """Dealer rules. The defaults are the ones Round implements."""
+
+    def __init__(self, dealer_stands_on=17, hit_soft_17=False, ties_push=True):
+        self.dealer_stands_on = dealer_stands_on
+        self.hit_soft_17 = hit_soft_17  # Dealer hits a soft 17 instead of standing
+        self.ties_push = ties_push      # False: the dealer wins ties
+
+
+def threshold_policy(stand_on):
+    """
+    Player policy: hit while the total is below stand_on.
+    A policy gets (points, soft, upcard) as equally shaped arrays, with upcard
+    being the dealer's visible card value (Ace = 1), and returns "hit" booleans.
+    Plain ints and bools work too, which the cross-check relies on.
+    """
+    def policy(points, soft, upcard):
+        return points < stand_on
+    return policy
+
+
+def shoe_depth(decks=1, rules=None):
+    """
+    Cards from the top of a shoe that any one round can use. The player stops
+    by a hard 21 + 10, the dealer by the highest hard total it still draws on
+    + 10 (or the 20 of its first two cards), so the cards of a round never add
+    up to more than both together. Once the lowest cards of the shoe exceed
+    that sum, no round can need more of them.
+    """
+    rules = rules or HouseRules()
+    dealer_draws_on = max(rules.dealer_stands_on - 1, 7 if rules.hit_soft_17 else 0)  # Soft 17 is a hard 7
+    bound = 21 + 10 + max(dealer_draws_on + 10, 20)
+    total = 0
+    for depth, value in enumerate(sorted(RANK_VALUE[r] for r in CARD_RANK * decks), 1):
+        total += value
+        if total > bound:
+            return depth
+    return 52 * decks
+
+
+def _points(hard, aces):
+    return np.where((aces > 0) & (hard <= 11), hard + 10, hard)
+
+
+def deal_matrix(rng, batch, decks=1, depth=None):
+    """
+    Returns a (batch, depth) matrix of card indices: the top of batch freshly
+    shuffled shoes. depth defaults to shoe_depth(decks) for the default rules.
+    """
+    size = 52 * decks
+    order = rng.random((batch, size)).argsort(axis=1)[:, :min(depth or shoe_depth(decks), size)]
+    return order % 52
+
+
+def play_batch(cards, policy, rules):
+    """
+    Plays one round per row of cards, dealt in Round's order (player, player,
+    dealer up, dealer hole, then draws). Returns (results, player_points, dealer_points).
+    """
+    batch, depth = cards.shape
+    rows = np.arange(batch)
+    ranks = _RANK[cards]
+    values = _VALUE[ranks]
+    is_ace = ranks == 1
+    upcard = values[:, 2]
+    pos = np.full(batch, 4)
+
+    # Player turn: one vectorized decision per step for every undecided round
+    p_hard = values[:, 0] + values[:, 1]
+    p_aces = is_ace[:, 0].astype(np.int16) + is_ace[:, 1]
+    playing = np.ones(batch, dtype=bool)
+    while True:
+        points = _points(p_hard, p_aces)
+        hit = playing & policy(points, (p_aces > 0) & (p_hard <= 11), upcard)
+        if not hit.any():
+            break
+        if (pos[hit] >= depth).any():
+            raise GameException("Shoe depth exceeded in simulation.")
+        drawn = np.minimum(pos, depth - 1)
+        p_hard += np.where(hit, values[rows, drawn], 0)
+        p_aces += hit & is_ace[rows, drawn]
+        pos += hit
+        playing = hit & (p_hard <= 21)
+
+    # Dealer turn, skipped when the player busted (as in Game)
+    d_hard = values[:, 2] + values[:, 3]
+    d_aces = is_ace[:, 2].astype(np.int16) + is_ace[:, 3]
+    drawing = p_hard <= 21
+    while True:
+        points = _points(d_hard, d_aces)
+        draw = drawing & (points < rules.dealer_stands_on)
+        if rules.hit_soft_17:
+            draw |= drawing & (points == 17) & (d_aces > 0) & (d_hard <= 11)
+        if not draw.any():
+            break
+        if (pos[draw] >= depth).any():
+            raise GameException("Shoe depth exceeded in simulation.")
+        drawn = np.minimum(pos, depth - 1)
+        d_hard += np.where(draw, values[rows, drawn], 0)
+        d_aces += draw & is_ace[rows, drawn]
+        pos += draw
+        drawing = draw
+
+    p = _points(p_hard, p_aces)
+    d = _points(d_hard, d_aces)
+    results = np.full(batch, TIE, dtype=np.int8)
+    results[(p <= 21) & ((d > 21) | (p > d))] = WIN
+    results[(p > 21) | ((d <= 21) & (d > p))] = LOSS
+    if not rules.ties_push:
+        results[results == TIE] = LOSS
+    return results, p, d
+
+
+def simulate(rounds, policy, rules=None, decks=1, batch=100_000, seed=None):
+    """
+    Plays rounds rounds in batches. Returns a dict with outcome counts and rates,
+    the house edge (even-money payouts) with its standard error, and the
+    distribution of final totals (anything over 21 is reported as 22).
+    """
+    rules = rules or HouseRules()
+    rng = np.random.default_rng(seed)
+    depth = shoe_depth(decks, rules)
+    outcomes = np.zeros(3, dtype=np.int64)
+    player_totals = np.zeros(23, dtype=np.int64)
+    dealer_totals = np.zeros(23, dtype=np.int64)
+
+    done = 0
+    while done < rounds:
+        n = min(batch, rounds - done)
+        results, p, d = play_batch(deal_matrix(rng, n, decks, depth), policy, rules)
+        outcomes += np.bincount(results, minlength=3)
+        player_totals += np.bincount(np.minimum(p, 22), minlength=23)
+        dealer_totals += np.bincount(np.minimum(d, 22), minlength=23)
+        done += n
+
+    wins, losses, ties = (int(x) for x in outcomes)
+    edge = (losses - wins) / rounds
+    variance = (wins + losses) / rounds - edge ** 2
+    return {
+        "rounds": rounds,
+        "wins": wins, "losses": losses, "ties": ties,
+        "win_rate": wins / rounds, "loss_rate": losses / rounds, "tie_rate": ties / rounds,
+        "house_edge": edge,
+        "house_edge_stderr": (variance / rounds) ** 0.5,
+        "player_totals": {t: int(c) for t, c in enumerate(player_totals) if c},
+        "dealer_totals": {t: int(c) for t, c in enumerate(dealer_totals) if c},
+    }
+
+
+class _FixedShoe:
+    """Shoe stand-in that deals one predetermined row of cards."""
+
+    def __init__(self, cards):
+        self.__cards = iter(int(c) for c in cards)
+
+    def begin_round(self):
+        pass
+
+    def deal(self):
+        return next(self.__cards)
+
+
+def cross_check(sample, policy, decks=1, seed=None):
+    """
+    Plays the same shuffled shoes through play_batch and through the scalar
+    Round (default rules only) and returns the number of rounds that disagree.
+    """
+    rng = np.random.default_rng(seed)
+    cards = deal_matrix(rng, sample, decks)
+    results, _, _ = play_batch(cards, policy, HouseRules())
+    expected = {"Player": WIN, "Dealer": LOSS, "Tie": TIE}
+
+    mismatches = 0
+    for row, vec_result in zip(cards, results):
+        game = Round(_FixedShoe(row))
+        game.deal_initial()
+        upcard = RANK_VALUE[CARD_RANK[row[2]]]
+        hand = game.player_hand
+        while not hand.is_bust and policy(hand.points, hand.is_soft, upcard):
+            game.player_hit()
+        if not hand.is_bust:
+            game.dealer_turn()
+        if expected[game.get_winner()] != vec_result:
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo simulation of the house rules.")
+    parser.add_argument("--rounds", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=100_000, help="rounds per NumPy batch")
+    parser.add_argument("--decks", type=int, default=1, help="decks per freshly shuffled shoe")
+    parser.add_argument("--stand-on", type=int, default=17, help="player hits below this total")
+    parser.add_argument("--dealer-stands-on", type=int, default=17)
+    parser.add_argument("--hit-soft-17", action="store_true", help="dealer hits soft 17")
+    parser.add_argument("--ties-lose", action="store_true", help="dealer wins ties")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cross-check", type=int, default=0, metavar="N",
+                        help="also compare N rounds against the scalar Round")
+    args = parser.parse_args()
+
+    policy = threshold_policy(args.stand_on)
+    rules = HouseRules(args.dealer_stands_on, args.hit_soft_17, not args.ties_lose)
+
+    started = time.perf_counter()
+    stats = simulate(args.rounds, policy, rules, args.decks, args.batch, args.seed)
+    elapsed = time.perf_counter() - started
+
+    print(f"Rounds:     {stats['rounds']:>12,} ({stats['rounds'] / elapsed:,.0f} rounds/s)")
+    print(f"Wins:       {stats['win_rate']:>12.4%}")
+    print(f"Losses:     {stats['loss_rate']:>12.4%}")
+    print(f"Ties:       {stats['tie_rate']:>12.4%}")
+    print(f"House edge: {stats['house_edge']:>12.4%} +/- {stats['house_edge_stderr']:.4%}")
+
+    if args.cross_check:
+        mismatches = cross_check(args.cross_check, policy, args.decks, args.seed)
+        print(f"Cross-check vs Round (default rules): {mismatches} of {args.cross_check} rounds differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Client deadlines on one hashed timer wheel per process.
+
+Every connection gets a Watchdog. Before waiting on the client, the game arms
+the current phase; it can also arm a deadline for the whole session:
+
+    watchdog.arm("decision", Game.decision_timeout)
+    frame = decoder.read_frame(sock)   # EOF if the deadline passed
+    watchdog.disarm()
+
+Nothing runs per socket. Timers sit in the wheel slot of the tick they expire
+on (scheduling and cancelling are a set add/discard), and a single thread
+advances the wheel. When a timer fires, it shuts down the socket's read side,
+so the recv blocked in the game thread, or the asyncio read, returns EOF. The
+write side stays open, which lets the game still send the evicted client its
+result.
+"""
+import socket
+import threading
+import time
+
+from eventlog import log
+from metrics import metrics, EVICT_REQUEST, EVICT_IDLE, EVICT_DECISION, EVICT_SESSION, SHED
+
+_EVICTION_COUNTERS = {"request": EVICT_REQUEST, "idle": EVICT_IDLE, "decision": EVICT_DECISION,
+                      "session": EVICT_SESSION, "shed": SHED}
+
+# Watchdogs whose connection sits idle between sessions, oldest first (dicts keep insertion order)
+_idle = {}
+_idle_lock = threading.Lock()
+
+
+class Timer:
+    __slots__ = ('expires', 'callback', 'args', 'slot')
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: slots * tick seconds per rotation. Later timers wait
+    in their slot for extra rotations. Timers fire within about a tick of
+    their deadline.
+    """
+
+    def __init__(self, tick=0.1, slots=1024):
+        self.tick = tick
+        self._slots = [set() for _ in range(slots)]
+        self._lock = threading.Lock()  # Held only for slot updates, never while callbacks run
+        self._ticks = 0                # Ticks processed so far
+        self._thread = None
+        self.fired = 0
+
+    def start(self):
+        """Starts the wheel thread. Returns self for chaining."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def schedule(self, delay, callback, *args):
+        """Calls callback(*args) on the wheel thread after delay seconds. Returns a Timer for cancel()."""
+        timer = Timer()
+        timer.expires = time.monotonic() + delay
+        timer.callback, timer.args = callback, args
+        ticks = max(1, int(delay / self.tick) + 1)
+        with self._lock:
+            timer.slot = (self._ticks + ticks) % len(self._slots)
+            self._slots[timer.slot].add(timer)
+        return timer
+
+    def cancel(self, timer):
+        with self._lock:
+            if timer.slot is not None:
+                self._slots[timer.slot].discard(timer)
+                timer.slot = None
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_tick += self.tick
+            now = time.monotonic() + self.tick  # Within a tick counts as due (float drift)
+            with self._lock:
+                self._ticks += 1
+                bucket = self._slots[self._ticks % len(self._slots)]
+                due = [t for t in bucket if t.expires <= now]
+                for t in due:
+                    bucket.discard(t)
+                    t.slot = None
+            for t in due:
+                self.fired += 1
+                try:
+                    t.callback(*t.args)
+                except Exception as e:
+                    log.error("timer_error", error=str(e))
+
+
+timers = TimerWheel()
+
+
+class Watchdog:
+    """
+    Deadlines of one connection: the current phase ("request", "idle",
+    "decision") and, optionally, the whole session. expired names the first
+    deadline that passed; from then on reads on the socket return EOF.
+    """
+
+    def __init__(self, sock, wheel=timers):
+        self.sock = sock
+        self.wheel = wheel
+        self.session = 0  # Log id of the session being watched
+        self.expired = None
+        self._phase = None
+        self._session = None
+        self._idle = False
+
+    def arm(self, phase, seconds):
+        """Starts the deadline of a phase, replacing the previous one. 0 seconds means none."""
+        self.disarm()
+        if seconds:
+            self._phase = self.wheel.schedule(seconds, self._expire, phase)
+        if phase == "idle":
+            with _idle_lock:
+                _idle[self] = None
+            self._idle = True
+
+    def disarm(self):
+        if self._phase is not None:
+            self.wheel.cancel(self._phase)
+            self._phase = None
+        if self._idle:
+            with _idle_lock:
+                _idle.pop(self, None)
+            self._idle = False
+
+    def arm_session(self, seconds):
+        self.disarm_session()
+        if seconds:
+            self._session = self.wheel.schedule(seconds, self._expire, "session")
+
+    def disarm_session(self):
+        if self._session is not None:
+            self.wheel.cancel(self._session)
+            self._session = None
+
+    def close(self):
+        self.disarm()
+        self.disarm_session()
+
+    def _expire(self, phase):
+        if self.expired:
+            return
+        self.expired = phase
+        metrics.inc(_EVICTION_COUNTERS[phase])
+        log.warning("evicted", session=self.session, phase=phase)
+        try:
+            self.sock.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass  # Already gone
+
+
+def shed_idle():
+    """Evicts the connection that has been idle between sessions the longest. Returns False if none is."""
+    with _idle_lock:
+        if not _idle:
+            return False
+        watchdog = next(iter(_idle))
+        del _idle[watchdog]
+    watchdog._expire("shed")
+    return True
@@ -1,81 +1,150 @@
 import random
+import time
 from shared.protocol import *
+from shared.exceptions import GameException
+from shared.hand import Hand
+from eventlog import log
+from timeouts import Watchdog
+from shared.tracing import tracer
+from shared.recording import END_DONE, END_GONE, END_EVICTED
+from metrics import (metrics, SESSIONS, ROUNDS, WINS, LOSSES, TIES, PROTOCOL_ERRORS, CLIENT_ERRORS,
+                     FRAMES_SENT, SEND_CALLS, BYTES_SENT, THROTTLED, ABANDONED, H_REQUEST, H_DECISION, H_ROUND, H_SESSION)
 
-class Card:
-    SUIT_MAP = {'Hearts': 0, 'Diamonds': 1, 'Clubs': 2, 'Spades': 3}
-    RANK_MAP = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 1}
+# Cards are small ints 0-51: suit * 13 + (rank - 1), using the wire encoding
+# (rank 1=Ace .. 13=King, suit 0-3 in HDCS order). Everything a card is ever
+# asked for is precomputed once here instead of per card per round.
+CARD_RANK = bytes(c % 13 + 1 for c in range(52))
+CARD_SUIT = bytes(c // 13 for c in range(52))
+CARD_SERIAL = tuple(zip(CARD_RANK, CARD_SUIT))  # (rank, suit) for pack_cards
+CARD_WIRE = tuple(pack_payload(result_code=PAYLOAD_CONTINUE, card_rank=r, card_suit=s) for r, s in CARD_SERIAL)
 
-    def __init__(self, suit, rank):
-        self.__suit = suit
-        self.__rank = rank
-        self.__hidden = True
+_ORDERED_DECK = bytes(range(52))
+_RESULT_CODES = {"Player": PAYLOAD_WIN, "Dealer": PAYLOAD_LOSS, "Tie": PAYLOAD_TIE}
 
-    def __str__(self):
-        return f"{self.__rank} of {self.__suit}"
-    
-    def get_raw_value(self):
-        """Returns standard blackjack value. Ace is 11 by default."""
-        if self.__rank in ['J', 'Q', 'K']: return 10
-        elif self.__rank == 'A': return 11
-        else: return int(self.__rank)
-        
-    def serialize(self):
-        """Returns (rank_int, suit_int) for protocol."""
-        return self.RANK_MAP[self.__rank], self.SUIT_MAP[self.__suit]
-    
-    def show(self): self.__hidden = False
-    def hide(self): self.__hidden = True
-    def is_hidden(self): return self.__hidden
+AUTOPLAY_FLUSH_ROUNDS = 64  # Autoplay summaries are streamed in batches of this many rounds
+
+class Shoe:
+    """
+    N decks dealt sequentially from one bytearray. A shoe lives for a whole
+    session: it is reshuffled only once the cut card (penetration) has been
+    reached, at the start of a round. With a pool (see deck_pool.ShufflePool)
+    a reshuffle swaps in a pre-shuffled ordering instead of shuffling here,
+    and recycling discards uses an RNG from the pool (unless rng is given).
+    """
+
+    def __init__(self, decks=1, penetration=0.75, rng=None, pool=None):
+        if decks < 1:
+            raise GameException("A shoe needs at least one deck.")
+        if not 0 < penetration <= 1:
+            raise GameException("Penetration must be in (0, 1].")
+        if pool is not None and pool.decks != decks:
+            raise GameException("Shuffle pool deck count does not match the shoe.")
+        self.decks = decks
+        self.__pool = pool
+        self.__cards = None if pool else bytearray(_ORDERED_DECK * decks)
+        self.__cut = max(1, int(52 * decks * penetration))
+        self.__rng = rng if rng is not None or pool is not None else random  # Pooled: made on first use
+        self.__pos = 0          # Next card to deal
+        self.__round_start = 0  # First card of the round in progress
+        self.shuffles = 0
+        self.shuffle()
+
+    def shuffle(self):
+        """Shuffles the whole shoe (in place, or by swapping buffers with the pool)."""
+        if self.__pool is not None:
+            self.__cards = self.__pool.take(self.__cards)
+        else:
+            self.__rng.shuffle(self.__cards)
+        self.__pos = self.__round_start = 0
+        self.shuffles += 1
+
+    def remaining(self):
+        return len(self.__cards) - self.__pos
 
-class Deck:
-    __suits = ['Hearts', 'Diamonds', 'Clubs', 'Spades']
-    __ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+    def release(self):
+        """Done with the shoe: a pooled shoe hands its buffer back for reuse. Do not deal from it again."""
+        if self.__pool is not None and self.__cards is not None:
+            self.__pool.give_back(self.__cards)
+            self.__cards = None
 
-    def __init__(self):
-        self.__cards = [Card(s, r) for s in self.__suits for r in self.__ranks]
-        random.shuffle(self.__cards)
+    def begin_round(self):
+        """Marks a round boundary, reshuffling first if the cut card was reached."""
+        if self.__pos >= self.__cut:
+            self.shuffle()
+        self.__round_start = self.__pos
 
     def deal(self):
-        return self.__cards.pop() if self.__cards else None
+        if self.__pos == len(self.__cards):
+            self.__recycle_discards()
+        card = self.__cards[self.__pos]
+        self.__pos += 1
+        return card
+
+    def __recycle_discards(self):
+        """
+        Shoe ran dry mid-round (small shoe, deep penetration): keep the cards
+        already in play at the front and shuffle the earlier discards behind them.
+        """
+        cards, start = self.__cards, self.__round_start
+        if start == 0:
+            raise GameException("Shoe exhausted within a single round.")
+        in_play = len(cards) - start
+        cards[:] = cards[start:] + cards[:start]
+        discards = cards[in_play:]
+        if self.__rng is None:
+            self.__rng = self.__pool.new_rng()
+        self.__rng.shuffle(discards)
+        cards[in_play:] = discards
+        self.__pos = in_play
+        self.__round_start = 0
+        self.shuffles += 1
 
 class Round:
-    def __init__(self):
-        self.__deck = Deck()
-        self.__player_hand = []
-        self.__dealer_hand = []
+    def __init__(self, shoe):
+        self.__deck = shoe
+        self.__player_hand = Hand()
+        self.__dealer_hand = Hand()
+        self.__hidden_card = None
+        self.restart()
+
+    def restart(self):
+        """Starts the next round on the same shoe, reusing this object and its hands."""
+        self.__deck.begin_round()
+        self.__player_hand.clear()
+        self.__dealer_hand.clear()
+        self.__hidden_card = None
         
     def deal_initial(self):
-        p1 = self.__deck.deal(); p1.show()
-        p2 = self.__deck.deal(); p2.show()
-        d1 = self.__deck.deal(); d1.show()
-        d2 = self.__deck.deal(); # d2 starts hidden
+        p1 = self.__deck.deal()
+        p2 = self.__deck.deal()
+        d1 = self.__deck.deal()
+        d2 = self.__deck.deal() # d2 starts hidden
         
-        self.__player_hand = [p1, p2]
-        self.__dealer_hand = [d1, d2]
+        self.__player_hand.add(CARD_RANK[p1])
+        self.__player_hand.add(CARD_RANK[p2])
+        self.__dealer_hand.add(CARD_RANK[d1])
+        self.__dealer_hand.add(CARD_RANK[d2])
+        self.__hidden_card = d2
         return p1, p2, d1 # Return visible cards to send to client
 
-    def _calculate_hand(self, hand):
-        """Calculates hand value handling Aces as 1 or 11."""
-        total = sum(c.get_raw_value() for c in hand)
-        ace_count = sum(1 for c in hand if c.get_raw_value() == 11)
-        
-        while total > 21 and ace_count > 0:
-            total -= 10 # Turn an Ace (11) into a 1
-            ace_count -= 1
-            
-        return total
+    @property
+    def player_hand(self):
+        return self.__player_hand
+
+    @property
+    def dealer_hand(self):
+        return self.__dealer_hand
 
     def get_player_points(self):
-        return self._calculate_hand(self.__player_hand)
+        return self.__player_hand.points
 
     def get_dealer_points(self):
-        return self._calculate_hand(self.__dealer_hand)
+        return self.__dealer_hand.points
 
     def player_hit(self):
         card = self.__deck.deal()
-        if card:
-            card.show()
-            self.__player_hand.append(card)
+        if card is not None:
+            self.__player_hand.add(CARD_RANK[card])
         return card
 
     def dealer_turn(self):
@@ -83,25 +152,28 @@ class Round:
         Reveal hidden card and play dealer turn.
         Returns: (hidden_card, list_of_new_drawn_cards)
         """
-        hidden_card = self.__dealer_hand[1]
-        hidden_card.show() # Reveal
+        hidden_card = self.reveal_hidden()
+        dealer = self.__dealer_hand
         
         drawn_cards = [] 
         
         # Dealer logic: Hit if < 17 [cite: 54], Stand if >= 17 [cite: 55]
-        while self.get_dealer_points() < 17:
+        while dealer.points < 17:
             card = self.__deck.deal()
-            if card:
-                card.show()
-                self.__dealer_hand.append(card)
+            if card is not None:
+                dealer.add(CARD_RANK[card])
                 drawn_cards.append(card)
             else:
                 break
         return hidden_card, drawn_cards
 
+    def reveal_hidden(self):
+        """Returns the dealer's hidden card."""
+        return self.__hidden_card
+
     def get_winner(self):
-        p = self.get_player_points()
-        d = self.get_dealer_points()
+        p = self.__player_hand.points
+        d = self.__dealer_hand.points
         
         # Logic matches assignment [cite: 57-63]
         if p > 21: return "Dealer" # Client busts
@@ -110,99 +182,427 @@ class Round:
         if d > p: return "Dealer"
         return "Tie"
 
+# SessionMachine states
+BETWEEN_ROUNDS, AWAIT_DECISION, SESSION_OVER = range(3)
+
+_RESULT_WIRE = {code: pack_payload(result_code=code) for code in (PAYLOAD_WIN, PAYLOAD_LOSS, PAYLOAD_TIE)}
+
+class SessionMachine:
+    """
+    Sans-IO blackjack session: the rules (via Round) and the frames a client
+    is sent, with no sockets, blocking, clocks or logging. An I/O engine
+    feeds it decoded decisions and sends whatever it wrote to out:
+
+        machine = SessionMachine(shoe, num_rounds, version, out)
+        while machine.state != SESSION_OVER:
+            machine.begin_round()
+            while machine.state == AWAIT_DECISION:
+                ...flush out, read a frame...
+                machine.receive(unpack_payload_client(data))   # or machine.abandon()
+            ...machine.result, machine.round_no...
+
+    out needs only write(bytes), e.g. an OutputBuffer; with None nothing is
+    encoded, for simulations. One Round and two card buffers serve every round.
+    """
+    __slots__ = ('shoe', 'num_rounds', 'version', 'out', 'round', 'round_no', 'state', 'result', 'upcard',
+                 'player_cards', 'dealer_cards')
+
+    def __init__(self, shoe, num_rounds, version=PROTOCOL_V1, out=None):
+        self.shoe = shoe
+        self.num_rounds = num_rounds
+        self.version = version
+        self.out = out
+        self.round = None
+        self.round_no = 0
+        self.state = BETWEEN_ROUNDS if num_rounds > 0 else SESSION_OVER
+        self.result = None       # Result code of the last finished round
+        self.upcard = 0          # Dealer upcard value (Ace = 1, face cards = 10)
+        self.player_cards = bytearray()
+        self.dealer_cards = bytearray()  # Upcard, hidden card, then the dealer's draws
+
+    @property
+    def player_hand(self):
+        return self.round.player_hand
+
+    @property
+    def dealer_hand(self):
+        return self.round.dealer_hand
+
+    def begin_round(self):
+        """Deals the next round and queues the visible cards. The player is then to decide."""
+        if self.state != BETWEEN_ROUNDS:
+            raise GameException("A round is already in progress or the session is over.")
+        if self.round is None:
+            self.round = Round(self.shoe)
+        else:
+            self.round.restart()
+        self.round_no += 1
+        self.result = None
+
+        p1, p2, d1 = self.round.deal_initial()
+        self.player_cards[:] = (p1, p2)
+        self.dealer_cards[:] = (d1,)
+        self.upcard = min(CARD_RANK[d1], 10)
+        out = self.out
+        if out is not None:
+            if self.version >= PROTOCOL_V2:
+                out.write(pack_cards([CARD_SERIAL[p1], CARD_SERIAL[p2], CARD_SERIAL[d1]], PAYLOAD_CONTINUE))
+            else:
+                out.write(CARD_WIRE[p1])
+                out.write(CARD_WIRE[p2])
+                out.write(CARD_WIRE[d1])
+        self.state = AWAIT_DECISION
+
+    def receive(self, decision):
+        """Applies a decoded client decision ("Hit" or "Stand"). Returns the new state."""
+        return self.decide("Hit" in decision)
+
+    def decide(self, hit):
+        """Applies Hit (True) or Stand (False). A bust or a Stand finishes the round. Returns the new state."""
+        if self.state != AWAIT_DECISION:
+            raise GameException("No decision is pending.")
+        if hit:
+            card = self.round.player_hit()
+            self.player_cards.append(card)
+            if self.out is not None:
+                self.out.write(CARD_WIRE[card])
+            if not self.round.player_hand.is_bust:
+                return self.state
+        self._finish(False)
+        return self.state
+
+    def abandon(self, forfeit=False):
+        """
+        Finishes the round without another decision: the client went away
+        (played as a Stand) or, with forfeit, was evicted (the round is lost).
+        """
+        if self.state == AWAIT_DECISION:
+            self._finish(forfeit)
+        return self.state
+
+    def _finish(self, forfeit):
+        game = self.round
+        # Dealer turn (skipped on a bust, but the hidden card is still shown)
+        if not game.player_hand.is_bust:
+            hidden_card, drawn_cards = game.dealer_turn()
+        else:
+            hidden_card, drawn_cards = game.reveal_hidden(), ()
+        self.dealer_cards.append(hidden_card)
+        self.dealer_cards.extend(drawn_cards)
+        self.result = PAYLOAD_LOSS if forfeit else _RESULT_CODES[game.get_winner()]
+
+        out = self.out
+        if out is not None:
+            if self.version >= PROTOCOL_V2:
+                # Reveal, dealer draws and result in a single frame
+                out.write(pack_cards([CARD_SERIAL[c] for c in self.dealer_cards[1:]], self.result))
+            else:
+                for c in self.dealer_cards[1:]:
+                    out.write(CARD_WIRE[c])
+                out.write(_RESULT_WIRE[self.result])
+        self.state = SESSION_OVER if self.round_no >= self.num_rounds else BETWEEN_ROUNDS
+
 class Game:
-    """Handles game logic for blackjack rounds."""
+    """
+    Blocking-socket adapter around SessionMachine, plus the per-session
+    bookkeeping (request parsing, logs, metrics) that AsyncGame shares.
+    """
+
+    num_decks = 1       # Decks per shoe; one shoe serves a whole session
+    penetration = 0.75  # Fraction of the shoe dealt before it is reshuffled
+    deck_pool = None    # Optional ShufflePool feeding pre-shuffled shoes
+    # Deadlines in seconds (0 = none); a client that misses one is evicted
+    request_timeout = 10   # Connect -> first request
+    idle_timeout = 60      # Between sessions on a kept-open connection
+    decision_timeout = 0   # Per Hit/Stand; off by default, since people play interactively
+    session_timeout = 0    # Request -> last result
+    team_limiter = None    # Optional admission.TeamLimiter, checked on every request
+    recorder = None        # Optional recorder.Recorder; recorded sessions deal from a seeded shoe
+    seeds = random.Random()  # Shoe seeds of recorded sessions
+    allow_replay = False   # Accept Replay requests (a client-chosen seed; for test servers only)
+    leaderboard = None     # Optional leaderboard.Leaderboard, counting every team's sessions and rounds
     
     @staticmethod
     def start(client_socket):
-        """Entry point for handling a client connection."""
-        # 1. Wait for Request Message (Name + Rounds)
-        data = client_socket.recv(1024)
+        """
+        Entry point for handling a client connection: serves one session per
+        request until the client closes the connection (the v1 way to end) or
+        misses a deadline.
+        """
+        decoder = FrameDecoder(SERVER_INBOUND)  # Kept across sessions: a request may already be buffered
+        watchdog = Watchdog(client_socket)
+        first = True
         try:
-            num_rounds, team_name = unpack_request(data)
-            print(f"Client {team_name} requested {num_rounds} rounds.")
+            while Game._serve_session(client_socket, decoder, watchdog, first):
+                first = False
+        finally:
+            watchdog.close()
+
+    @staticmethod
+    def _serve_session(client_socket, decoder, watchdog, first=True):
+        """Waits for the next request and plays it. Returns False once the connection is done."""
+        session = watchdog.session = log.new_session()
+        started = time.perf_counter()
+
+        # 1. Wait for Request Message (Name + Rounds), or an Autoplay request
+        if first: watchdog.arm("request", Game.request_timeout)
+        else: watchdog.arm("idle", Game.idle_timeout)
+        t = tracer.begin()
+        try:
+            frame = decoder.read_frame(client_socket)
         except ProtocolException as e:
-            print(f"Protocol Error: {e}")
-            return
+            metrics.inc(PROTOCOL_ERRORS)
+            log.warning("protocol_error", session=session, error=str(e))
+            return False
+        finally:
+            watchdog.disarm()
+        if frame is None: return False
+        request = Game._open_session(frame, session, first, started, t)
+        if request is None: return False
+        num_rounds, team_name, version, table, aggregate_only, seed = request
 
         # 2. Play all requested rounds over the same connection
-        for i in range(1, num_rounds + 1):
-            print(f"--- Round {i} of {num_rounds} with {team_name} ---")
-            Game._play_single_round(client_socket, team_name)
+        out = OutputBuffer(client_socket)
+        shoe, seed = Game._new_shoe(session, request)
+        started = time.perf_counter()
+        watchdog.arm_session(Game.session_timeout)
+        played, alive = 0, True
+        try:
+            if table is not None:
+                for played in Game._autoplay(out, shoe, num_rounds, team_name, table, aggregate_only, session, seed):
+                    out.flush()
+                played = num_rounds
+            else:
+                machine = SessionMachine(shoe, num_rounds, version, out)
+                while alive and machine.state != SESSION_OVER:
+                    # Client gone, misbehaving or evicted: the rest of the rounds are not played
+                    alive = Game._play_single_round(client_socket, out, decoder, machine, team_name, session,
+                                                    watchdog, seed)
+                played = machine.round_no
+            out.flush()  # The last result, also to an evicted client
+        except OSError as e:
+            if alive:  # Otherwise already counted when the round ended
+                Game._round_failed(session, played, e)
+            alive = False
+        finally:
+            watchdog.disarm_session()
+            shoe.release()  # Its buffer goes back to the pool for the next session
+        return Game._close_session(out, session, team_name, played, started, watchdog) and alive
 
     @staticmethod
-    def _play_single_round(sock, team_name):
-        """Plays a single round of blackjack."""
-        game = Round()
-        
-        # Deal Initial
-        p1, p2, d1 = game.deal_initial()
-        
-        # Send initial cards
-        Game._send_card(sock, p1)  # Player 1
-        Game._send_card(sock, p2)  # Player 2
-        Game._send_card(sock, d1)  # Dealer Visible
+    def _open_session(frame, session, first, started, t):
+        """
+        Parses a request frame and admits it. Returns (num_rounds, team_name,
+        version, table, aggregate_only, seed), or None if the session must not
+        run. seed is None unless the request replays a recorded session.
+        """
+        seed = None
+        try:
+            if frame[0] == MSG_TYPE_AUTOPLAY:
+                num_rounds, team_name, table, aggregate_only = unpack_autoplay(frame[1])
+                version = PROTOCOL_V2
+            elif frame[0] == MSG_TYPE_REPLAY:
+                if not Game.allow_replay:
+                    raise ProtocolException("Replay requests are disabled.")
+                num_rounds, team_name, version, seed = unpack_replay(frame[1])
+                table, aggregate_only = None, False
+            else:
+                num_rounds, team_name, version = unpack_request_v2(frame[1])
+                table, aggregate_only = None, False
+        except ProtocolException as e:
+            metrics.inc(PROTOCOL_ERRORS)
+            log.warning("protocol_error", session=session, error=str(e))
+            return None
+        if Game.team_limiter and not Game.team_limiter.allow(team_name):
+            metrics.inc(THROTTLED)
+            log.warning("throttled", session=session, team=team_name)
+            return None
+        tracer.set_track(session, f"session {session} ({team_name})")
+        tracer.end("request", t, rounds=num_rounds, version=version, autoplay=table is not None)
+        if first:  # Later requests follow an idle gap that is up to the client
+            metrics.observe(H_REQUEST, time.perf_counter() - started)
+        log.info("session_start", session=session, team=team_name, rounds=num_rounds, version=version,
+                 autoplay=table is not None, replay=seed is not None)
+        return num_rounds, team_name, version, table, aggregate_only, seed
+
+    @staticmethod
+    def _new_shoe(session, request):
+        """
+        Builds the shoe for an admitted request and records the session.
+        Returns (shoe, seed). Recorded and replayed sessions shuffle with their
+        own seeded RNG instead of the pool, so a replay deals the same cards;
+        seed is 0 for an unseeded shoe.
+        """
+        num_rounds, team_name, version, table, _, seed = request
+        if seed is None and Game.recorder is None:
+            return Shoe(Game.num_decks, Game.penetration, pool=Game.deck_pool), 0
+        if seed is None:
+            seed = Game.seeds.getrandbits(64) or 1
+        if Game.recorder is not None:
+            Game.recorder.session(session, seed, team_name, num_rounds, version, Game.num_decks, Game.penetration,
+                                  autoplay=table is not None)
+        return Shoe(Game.num_decks, Game.penetration, rng=random.Random(seed)), seed
+
+    @staticmethod
+    def _close_session(out, session, team_name, num_rounds, started, watchdog):
+        """
+        Records a session however it ended; num_rounds is the rounds actually
+        played. Returns whether the connection may carry another one.
+        """
+        metrics.observe(H_SESSION, time.perf_counter() - started)
+        metrics.inc(SESSIONS)
+        if Game.leaderboard is not None:
+            Game.leaderboard.record_session(team_name)
+        metrics.inc(FRAMES_SENT, out.frames)
+        metrics.inc(SEND_CALLS, out.syscalls)
+        metrics.inc(BYTES_SENT, out.bytes_sent)
+        log.info("session_end", session=session, team=team_name, rounds=num_rounds,
+                 frames=out.frames, sends=out.syscalls, bytes=out.bytes_sent, evicted=watchdog.expired)
+        return not watchdog.expired
+
+    @staticmethod
+    def _play_single_round(sock, out, decoder, machine, team_name, session=0, watchdog=None, seed=0):
+        """
+        Plays the machine's next round over a blocking socket.
+        Outgoing frames are queued on out and flushed only right before
+        waiting on the client, so each decision costs one send call.
+        A client evicted by the watchdog while deciding loses the round.
+        Returns False if the session cannot go on: the client closed the
+        connection, a send failed, it sent a bad frame or it was evicted.
+        """
+        started = time.perf_counter()
+        think = 0.0
+        round_start = t = tracer.begin()
+        machine.begin_round()
+        tracer.end("deal", t)
         
         # Player Turn Loop
-        while True:
+        while machine.state == AWAIT_DECISION:
             try:
-                data = sock.recv(1024)
-                if not data: break
-
-                decision = unpack_payload_client(data)  # "Hit" or "Stand"
-                
-                if "Hit" in decision:
-                    print(f"{team_name} decided to Hit.")
-                    card = game.player_hit()
-                    if card:
-                        Game._send_card(sock, card)
-                        if game.get_player_points() > 21:
-                            print(f"{team_name} Busted!")
-                            break  # End player turn immediately
-                else:
-                    print(f"{team_name} decided to Stand.")
-                    break  # Stand
+                t = tracer.begin()
+                out.flush()
+                tracer.end("send", t)
+                waiting = time.perf_counter()
+                t = tracer.begin()
+                if watchdog: watchdog.arm("decision", Game.decision_timeout)
+                frame = decoder.read_frame(sock)
+                if watchdog: watchdog.disarm()
+                tracer.end("recv_wait", t)
+                if frame is None:
+                    if not (watchdog and watchdog.expired):
+                        Game._round_failed(session, machine.round_no)
+                    break
+                waiting = time.perf_counter() - waiting
+                think += waiting
+                metrics.observe(H_DECISION, waiting)
+
+                decision = unpack_payload_client(frame[1])  # "Hit" or "Stand"
+                if log.debug_enabled:
+                    log.debug("decision", session=session, round=machine.round_no,
+                              decision="Hit" if "Hit" in decision else "Stand")
+                t = tracer.begin()
+                machine.receive(decision)
+                tracer.end("decision", t)
             except Exception as e:
-                print(f"Error processing client move: {e}")
+                Game._round_failed(session, machine.round_no, e)
                 break
 
-        # Dealer Turn (Logic runs even if player busted, to show the hidden card)
-        hidden_card = None
-        drawn_cards = []
-        
-        if game.get_player_points() <= 21:
-            # Normal play: reveal and draw to 17
-            hidden_card, drawn_cards = game.dealer_turn()
+        # Client gone, evicted or misbehaving: the dealer still plays out the round
+        end = Game._round_end(machine, watchdog)
+        machine.abandon(forfeit=end == END_EVICTED)
+        Game._record_round(machine, team_name, session, started, seed, think, end)
+        tracer.end("round", round_start, round=machine.round_no)
+        return end == END_DONE and not (watchdog and watchdog.expired)
+
+    @staticmethod
+    def _round_failed(session, round_no, e=None):
+        """
+        Counts why a session stopped early: the client went away (EOF or a
+        failed send, e None or an OSError) or it sent something invalid.
+        Called once per session, since the session ends with it.
+        """
+        if e is None or isinstance(e, OSError):
+            metrics.inc(ABANDONED)
+            log.info("client_gone", session=session, round=round_no, error=str(e) if e else None)
         else:
-            # Player busted: Just reveal the hidden card so user sees it
-            game._Round__dealer_hand[1].show()
-            hidden_card = game._Round__dealer_hand[1]
-            
-        # Send Dealer Hidden Card
-        Game._send_card(sock, hidden_card)
-        
-        # Send any extra cards dealer drew
-        for c in drawn_cards:
-            Game._send_card(sock, c)
-                
-        # Determine Winner
-        
-        winner = game.get_winner()
-        if (winner == "Player"): winner = team_name
-        
-        print(f"Round winner: {winner}")
-        
-        res_code = PAYLOAD_TIE
-        if winner == team_name: res_code = PAYLOAD_WIN
-        elif winner == "Dealer": res_code = PAYLOAD_LOSS
-        
-        # Send Final Result
-        packet = pack_payload(result_code=res_code)
-        sock.send(packet)
+            metrics.inc(PROTOCOL_ERRORS if isinstance(e, ProtocolException) else CLIENT_ERRORS)
+            log.warning("move_error", session=session, round=round_no, error=str(e))
+
+    @staticmethod
+    def _round_end(machine, watchdog):
+        """Recording end code of a round whose decision loop just ended."""
+        if machine.state != AWAIT_DECISION:
+            return END_DONE
+        return END_EVICTED if watchdog and watchdog.expired else END_GONE
 
     @staticmethod
-    def _send_card(sock, card):
-        """Sends a card to the client."""
-        rank, suit = card.serialize()
-        packet = pack_payload(result_code=PAYLOAD_CONTINUE, card_rank=rank, card_suit=suit)
-        sock.send(packet)
\ No newline at end of file
+    def _record_round(machine, team_name, session, started, seed=0, think=0.0, end=END_DONE):
+        """
+        Logs, counts and (with a recorder) records a finished round. Only
+        rounds the client played to the end (END_DONE) reach the leaderboard.
+        """
+        res_code = machine.result
+        winner = team_name if res_code == PAYLOAD_WIN else "Dealer" if res_code == PAYLOAD_LOSS else "Tie"
+        log.info("round_end", session=session, round=machine.round_no, winner=winner,
+                 player=machine.player_hand.points, dealer=machine.dealer_hand.points)
+        metrics.inc(ROUNDS)
+        metrics.inc(WINS if res_code == PAYLOAD_WIN else LOSSES if res_code == PAYLOAD_LOSS else TIES)
+        metrics.observe(H_ROUND, time.perf_counter() - started)
+        if Game.recorder is not None:
+            Game.recorder.round(machine, session, seed, started, think, end)
+        if Game.leaderboard is not None and end == END_DONE:
+            Game.leaderboard.record(team_name, res_code)
+
+    @staticmethod
+    def _autoplay(out, shoe, num_rounds, team_name, table, aggregate_only=False, session=0, seed=0):
+        """
+        Plays num_rounds rounds for the client with its stand-on table, queueing
+        a summary frame per round (unless aggregate_only) and the totals last.
+        Yields every AUTOPLAY_FLUSH_ROUNDS rounds so the caller can flush; the
+        final flush is left to the caller.
+        """
+        machine = SessionMachine(shoe, num_rounds)  # Silent: the summaries replace the round frames
+        totals = {PAYLOAD_WIN: 0, PAYLOAD_LOSS: 0, PAYLOAD_TIE: 0}
+        recorder = Game.recorder
+        while machine.state != SESSION_OVER:
+            started = time.perf_counter()
+            t = tracer.begin()
+            Game.autoplay_round(machine, table)
+            res_code, i = machine.result, machine.round_no
+            totals[res_code] += 1
+            metrics.inc(ROUNDS)
+            metrics.inc(WINS if res_code == PAYLOAD_WIN else LOSSES if res_code == PAYLOAD_LOSS else TIES)
+            metrics.observe(H_ROUND, time.perf_counter() - started)
+            if recorder is not None:
+                recorder.round(machine, session, seed, started)
+            if log.debug_enabled:
+                log.debug("round_end", session=session, round=i, result=res_code,
+                          player=len(machine.player_cards), dealer=len(machine.dealer_cards))
+            if not aggregate_only:
+                out.write(pack_round_summary(res_code, [CARD_SERIAL[c] for c in machine.player_cards],
+                                             [CARD_SERIAL[c] for c in machine.dealer_cards]))
+            tracer.end("round", t, round=i, result=res_code)
+            if i % AUTOPLAY_FLUSH_ROUNDS == 0 and not aggregate_only:
+                yield i
+
+        out.write(pack_aggregate(num_rounds, totals[PAYLOAD_WIN], totals[PAYLOAD_LOSS], totals[PAYLOAD_TIE]))
+        if Game.leaderboard is not None:
+            for res_code, n in totals.items():
+                if n:
+                    Game.leaderboard.record(team_name, res_code, n)
+        log.info("autoplay_end", session=session, team=team_name, rounds=num_rounds,
+                 wins=totals[PAYLOAD_WIN], losses=totals[PAYLOAD_LOSS], ties=totals[PAYLOAD_TIE])
+
+    @staticmethod
+    def autoplay_round(machine, table):
+        """
+        Plays the machine's next round without a client: the player hits while
+        their total is below table[soft * 10 + upcard - 1] (see
+        AUTOPLAY_TABLE_SIZE). Returns the result code.
+        """
+        machine.begin_round()
+        hand = machine.player_hand
+        upcard = machine.upcard - 1
+        while machine.state == AWAIT_DECISION:
+            machine.decide(hand.points < table[hand.is_soft * 10 + upcard])
+        return machine.result
@@ -0,0 +1,42 @@
+# Blackjack value per wire rank (1=Ace .. 13=King, index 0 unused).
+# Aces count 1 here; Hand.points promotes one of them to 11 when that fits.
+RANK_VALUE = bytes([0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10])
+
+
+class Hand:
+    """
+    Running blackjack hand total, shared by server and client scoring.
+    Keeps the hard total (every Ace as 1) and the Ace count, so adding a card
+    and asking for points, bust or soft are all O(1).
+    """
+    __slots__ = ('hard', 'aces', 'size')
+
+    def __init__(self):
+        self.hard = 0   # Total with every Ace counted as 1
+        self.aces = 0   # Aces in the hand
+        self.size = 0   # Cards in the hand
+
+    def add(self, rank):
+        """Adds a card by its wire rank (1-13)."""
+        self.hard += RANK_VALUE[rank]
+        if rank == 1: self.aces += 1
+        self.size += 1
+
+    def clear(self):
+        self.hard = self.aces = self.size = 0
+
+    @property
+    def points(self):
+        """Best total: one Ace counts 11 if that doesn't bust."""
+        if self.aces and self.hard <= 11:
+            return self.hard + 10
+        return self.hard
+
+    @property
+    def is_soft(self):
+        """True when an Ace is currently counted as 11."""
+        return self.aces > 0 and self.hard <= 11
+
+    @property
+    def is_bust(self):
+        return self.hard > 21
@@ -7,6 +7,22 @@ MAGIC_COOKIE = 0xabcddcba
 MSG_TYPE_OFFER = 0x2
 MSG_TYPE_REQUEST = 0x3
 MSG_TYPE_PAYLOAD = 0x4
+MSG_TYPE_REQUEST_V2 = 0x5  # v2: Request + highest protocol version the client speaks
+MSG_TYPE_CARDS = 0x6       # v2: Result + variable-length list of cards in one frame
+MSG_TYPE_AUTOPLAY = 0x7    # Request: the server plays every round itself with a stand-on table
+MSG_TYPE_SUMMARY = 0x8     # Autoplay: one finished round (result, player cards, dealer cards)
+MSG_TYPE_AGGREGATE = 0x9   # Autoplay: totals for the session; always the last frame
+MSG_TYPE_REPLAY = 0xA      # Request: replay a recorded session, dealing from its shoe seed
+
+# Protocol versions
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+PROTOCOL_VERSION = PROTOCOL_V2  # Highest version this code speaks
+
+# Autoplay: the table holds a stand-on total for every (soft, dealer upcard 1-10);
+# the player hits while their total is below it. Index = soft * 10 + upcard - 1.
+AUTOPLAY_TABLE_SIZE = 20
+AUTOPLAY_AGGREGATE_ONLY = 0x1  # Flag: skip the per-round summaries
 
 # Payloads
 PAYLOAD_WIN = 0x3
@@ -14,18 +30,62 @@ PAYLOAD_LOSS = 0x2
 PAYLOAD_TIE = 0x1
 PAYLOAD_CONTINUE = 0x0
 
+# Precompiled codecs (all network endian)
+_HEADER = struct.Struct('!IB')              # Cookie + Type, common to every message
+_OFFER = struct.Struct('!IBH32s')           # + Port + Server name
+_OFFER_EXT = struct.Struct('!IBH32sHH')     # Offer + Active sessions + Capacity (0 = unknown)
+_REQUEST = struct.Struct('!IBB32s')         # + Rounds + Team name
+_REQUEST_V2 = struct.Struct('!IBB32sB')     # + Rounds + Team name + Version
+_CLIENT_PAYLOAD = struct.Struct('!IB5s')    # + Decision
+_SERVER_PAYLOAD = struct.Struct('!IBBHB')   # + Result + Rank + Suit
+_CARDS_HEADER = struct.Struct('!IBBB')      # + Result + Card count
+_CARD = struct.Struct('!BB')                # Rank + Suit
+_AUTOPLAY = struct.Struct('!IBB32sB20s')    # + Rounds + Team name + Flags + Stand-on table
+_SUMMARY_HEADER = struct.Struct('!IBBBB')   # + Result + Player card count + Dealer card count
+_AGGREGATE = struct.Struct('!IBHHHH')       # + Rounds + Wins + Losses + Ties
+_REPLAY = struct.Struct('!IBB32sBQ')        # Request v2 + Shoe seed
+
+def _cards_frame_size(buf, offset, available):
+    """Size of a v2 cards frame, or None while its header is incomplete."""
+    if available < _CARDS_HEADER.size:
+        return None
+    return _CARDS_HEADER.size + buf[offset + _CARDS_HEADER.size - 1] * _CARD.size
+
+def _summary_frame_size(buf, offset, available):
+    """Size of an autoplay round summary, or None while its header is incomplete."""
+    if available < _SUMMARY_HEADER.size:
+        return None
+    counts = offset + _SUMMARY_HEADER.size - 2
+    return _SUMMARY_HEADER.size + (buf[counts] + buf[counts + 1]) * _CARD.size
+
+# Frame sizes per message type. The payload type is shared by both
+# directions with different layouts, so each side has its own table.
+# Variable-length frames map to a function of (buffer, offset, available).
+SERVER_INBOUND = {
+    MSG_TYPE_REQUEST: _REQUEST.size,
+    MSG_TYPE_REQUEST_V2: _REQUEST_V2.size,
+    MSG_TYPE_AUTOPLAY: _AUTOPLAY.size,
+    MSG_TYPE_REPLAY: _REPLAY.size,
+    MSG_TYPE_PAYLOAD: _CLIENT_PAYLOAD.size,
+}
+CLIENT_INBOUND = {
+    MSG_TYPE_PAYLOAD: _SERVER_PAYLOAD.size,
+    MSG_TYPE_CARDS: _cards_frame_size,
+    MSG_TYPE_SUMMARY: _summary_frame_size,
+    MSG_TYPE_AGGREGATE: _AGGREGATE.size,
+}
+
 def pack_offer(server_port, server_name):
     """Packs the UDP Offer message."""
-    # !IBH32s: Network Endian, Int, Byte, Short, 32-char string
     server_name_bytes = server_name.encode('utf-8')[:32].ljust(32, b'\x00')
-    return struct.pack('!IBH32s', MAGIC_COOKIE, MSG_TYPE_OFFER, server_port, server_name_bytes)
+    return _OFFER.pack(MAGIC_COOKIE, MSG_TYPE_OFFER, server_port, server_name_bytes)
 
 def unpack_offer(data):
     """Unpacks UDP Offer. Returns (server_port, server_name)."""
-    if len(data) != 39:
+    if len(data) != _OFFER.size:
         raise ProtocolException("Invalid offer packet size.")
     
-    cookie, msg_type, port, name_bytes = struct.unpack('!IBH32s', data)
+    cookie, msg_type, port, name_bytes = _OFFER.unpack(data)
     
     if cookie != MAGIC_COOKIE:
         raise ProtocolException("Invalid Magic Cookie.")
@@ -34,17 +94,47 @@ def unpack_offer(data):
         
     return port, name_bytes.decode('utf-8').strip('\x00')
 
-def pack_request(num_rounds, team_name):
-    """Packs the TCP Request message."""
+def pack_offer_ext(server_port, server_name, active, capacity=0):
+    """
+    Packs the extended Offer: the v1 offer followed by the server's load.
+    v1 clients reject it on size, so servers send it next to the plain offer.
+    """
+    server_name_bytes = server_name.encode('utf-8')[:32].ljust(32, b'\x00')
+    return _OFFER_EXT.pack(MAGIC_COOKIE, MSG_TYPE_OFFER, server_port, server_name_bytes,
+                           min(active, 0xFFFF), min(capacity, 0xFFFF))
+
+def unpack_offer_ext(data):
+    """
+    Unpacks either Offer. Returns (server_port, server_name, active, capacity);
+    active is None for a plain v1 offer, capacity 0 means unknown.
+    """
+    if len(data) == _OFFER.size:
+        return unpack_offer(data) + (None, 0)
+    if len(data) != _OFFER_EXT.size:
+        raise ProtocolException("Invalid offer packet size.")
+
+    cookie, msg_type, port, name_bytes, active, capacity = _OFFER_EXT.unpack(data)
+
+    if cookie != MAGIC_COOKIE:
+        raise ProtocolException("Invalid Magic Cookie.")
+    if msg_type != MSG_TYPE_OFFER:
+        raise ProtocolException("Invalid Message Type (Expected Offer).")
+
+    return port, name_bytes.decode('utf-8').strip('\x00'), active, capacity
+
+def pack_request(num_rounds, team_name, version=PROTOCOL_V1):
+    """Packs the TCP Request message. version > 1 sends the v2 request instead."""
     team_name_bytes = team_name.encode('utf-8')[:32].ljust(32, b'\x00')
-    return struct.pack('!IBB32s', MAGIC_COOKIE, MSG_TYPE_REQUEST, num_rounds, team_name_bytes)
+    if version > PROTOCOL_V1:
+        return _REQUEST_V2.pack(MAGIC_COOKIE, MSG_TYPE_REQUEST_V2, num_rounds, team_name_bytes, version)
+    return _REQUEST.pack(MAGIC_COOKIE, MSG_TYPE_REQUEST, num_rounds, team_name_bytes)
 
 def unpack_request(data):
     """Unpacks TCP Request. Returns (num_rounds, team_name)."""
-    if len(data) != 38:
+    if len(data) != _REQUEST.size:
         raise ProtocolException("Invalid request packet size.")
     
-    cookie, msg_type, rounds, name_bytes = struct.unpack('!IBB32s', data)
+    cookie, msg_type, rounds, name_bytes = _REQUEST.unpack(data)
     
     if cookie != MAGIC_COOKIE:
         raise ProtocolException("Invalid Magic Cookie.")
@@ -53,36 +143,173 @@ def unpack_request(data):
         
     return rounds, name_bytes.decode('utf-8').strip('\x00')
 
+def unpack_request_v2(data):
+    """Unpacks a v1 or v2 TCP Request. Returns (num_rounds, team_name, version)."""
+    if len(data) == _REQUEST.size:
+        return unpack_request(data) + (PROTOCOL_V1,)
+    if len(data) != _REQUEST_V2.size:
+        raise ProtocolException("Invalid request packet size.")
+
+    cookie, msg_type, rounds, name_bytes, version = _REQUEST_V2.unpack(data)
+
+    if cookie != MAGIC_COOKIE:
+        raise ProtocolException("Invalid Magic Cookie.")
+    if msg_type != MSG_TYPE_REQUEST_V2:
+        raise ProtocolException("Invalid Message Type (Expected Request).")
+
+    # Both sides speak the highest version they have in common
+    return rounds, name_bytes.decode('utf-8').strip('\x00'), min(version, PROTOCOL_VERSION)
+
 def pack_payload(data_str=None, result_code=0, card_rank=0, card_suit=0):
     """
     Generic packer for both Client (text) and Server (result/card) payloads.
     """
     if data_str: # Client sending "Hit" or "Stand"
         decision_bytes = data_str.encode('utf-8')[:5].ljust(5, b'\x00')
-        return struct.pack('!IB5s', MAGIC_COOKIE, MSG_TYPE_PAYLOAD, decision_bytes)
+        return _CLIENT_PAYLOAD.pack(MAGIC_COOKIE, MSG_TYPE_PAYLOAD, decision_bytes)
     else: # Server sending State
-        return struct.pack('!IBBHB', MAGIC_COOKIE, MSG_TYPE_PAYLOAD, result_code, card_rank, card_suit)
+        return _SERVER_PAYLOAD.pack(MAGIC_COOKIE, MSG_TYPE_PAYLOAD, result_code, card_rank, card_suit)
 
 def unpack_payload_server(data):
     """Unpacks payload FROM Server (Result + Card)."""
     # Expected: Cookie(4) + Type(1) + Result(1) + Rank(2) + Suit(1) = 9 bytes
-    if len(data) < 9: # Simple check
+    if len(data) < _SERVER_PAYLOAD.size: # Simple check
          raise ProtocolException("Payload too small.")
     
-    cookie, msg_type, result, rank, suit = struct.unpack('!IBBHB', data)
+    cookie, msg_type, result, rank, suit = _SERVER_PAYLOAD.unpack(data)
     if cookie != MAGIC_COOKIE: raise ProtocolException("Invalid Magic Cookie.")
     return result, rank, suit
 
 def unpack_payload_client(data):
     """Unpacks payload FROM Client (Decision string)."""
     # Expected: Cookie(4) + Type(1) + String(5) = 10 bytes
-    if len(data) < 10:
+    if len(data) < _CLIENT_PAYLOAD.size:
         raise ProtocolException("Payload too small.")
     
-    cookie, msg_type, decision = struct.unpack('!IB5s', data)
+    cookie, msg_type, decision = _CLIENT_PAYLOAD.unpack(data)
     if cookie != MAGIC_COOKIE: raise ProtocolException("Invalid Magic Cookie.")
     return decision.decode('utf-8').strip('\x00')
 
+def pack_cards(cards, result_code=PAYLOAD_CONTINUE):
+    """
+    Packs a v2 Cards message: up to 255 (rank, suit) pairs plus a result code,
+    e.g. the dealer's reveal, every draw and the round result in one frame.
+    """
+    count = len(cards)
+    if count > 255:
+        raise ProtocolException("Too many cards for one frame.")
+    buf = bytearray(_CARDS_HEADER.size + count * _CARD.size)
+    _CARDS_HEADER.pack_into(buf, 0, MAGIC_COOKIE, MSG_TYPE_CARDS, result_code, count)
+    offset = _CARDS_HEADER.size
+    for rank, suit in cards:
+        _CARD.pack_into(buf, offset, rank, suit)
+        offset += _CARD.size
+    return buf
+
+def unpack_cards(data):
+    """Unpacks a v2 Cards message. Returns (result, [(rank, suit), ...])."""
+    if len(data) < _CARDS_HEADER.size:
+        raise ProtocolException("Payload too small.")
+
+    cookie, msg_type, result, count = _CARDS_HEADER.unpack_from(data)
+    if cookie != MAGIC_COOKIE: raise ProtocolException("Invalid Magic Cookie.")
+    if len(data) != _CARDS_HEADER.size + count * _CARD.size:
+        raise ProtocolException("Invalid cards packet size.")
+    return result, list(_CARD.iter_unpack(data[_CARDS_HEADER.size:]))
+
+def pack_autoplay(num_rounds, team_name, table, aggregate_only=False):
+    """Packs an Autoplay request: table is AUTOPLAY_TABLE_SIZE stand-on totals (see above)."""
+    table = bytes(table)
+    if len(table) != AUTOPLAY_TABLE_SIZE:
+        raise ProtocolException("Autoplay table must have 20 entries.")
+    team_name_bytes = team_name.encode('utf-8')[:32].ljust(32, b'\x00')
+    flags = AUTOPLAY_AGGREGATE_ONLY if aggregate_only else 0
+    return _AUTOPLAY.pack(MAGIC_COOKIE, MSG_TYPE_AUTOPLAY, num_rounds, team_name_bytes, flags, table)
+
+def unpack_autoplay(data):
+    """Unpacks an Autoplay request. Returns (num_rounds, team_name, table, aggregate_only)."""
+    if len(data) != _AUTOPLAY.size:
+        raise ProtocolException("Invalid autoplay packet size.")
+
+    cookie, msg_type, rounds, name_bytes, flags, table = _AUTOPLAY.unpack(data)
+
+    if cookie != MAGIC_COOKIE:
+        raise ProtocolException("Invalid Magic Cookie.")
+    if msg_type != MSG_TYPE_AUTOPLAY:
+        raise ProtocolException("Invalid Message Type (Expected Autoplay).")
+
+    return rounds, name_bytes.decode('utf-8').strip('\x00'), table, bool(flags & AUTOPLAY_AGGREGATE_ONLY)
+
+def pack_replay(num_rounds, team_name, version, seed):
+    """Packs a Replay request: a normal session whose shoe is shuffled from seed."""
+    team_name_bytes = team_name.encode('utf-8')[:32].ljust(32, b'\x00')
+    return _REPLAY.pack(MAGIC_COOKIE, MSG_TYPE_REPLAY, num_rounds, team_name_bytes, version, seed)
+
+def unpack_replay(data):
+    """Unpacks a Replay request. Returns (num_rounds, team_name, version, seed)."""
+    if len(data) != _REPLAY.size:
+        raise ProtocolException("Invalid replay packet size.")
+
+    cookie, msg_type, rounds, name_bytes, version, seed = _REPLAY.unpack(data)
+
+    if cookie != MAGIC_COOKIE:
+        raise ProtocolException("Invalid Magic Cookie.")
+    if msg_type != MSG_TYPE_REPLAY:
+        raise ProtocolException("Invalid Message Type (Expected Replay).")
+
+    return rounds, name_bytes.decode('utf-8').strip('\x00'), min(version, PROTOCOL_VERSION), seed
+
+def pack_round_summary(result_code, player_cards, dealer_cards):
+    """Packs one autoplayed round: result plus the (rank, suit) pairs of both hands."""
+    cards = list(player_cards) + list(dealer_cards)
+    buf = bytearray(_SUMMARY_HEADER.size + len(cards) * _CARD.size)
+    _SUMMARY_HEADER.pack_into(buf, 0, MAGIC_COOKIE, MSG_TYPE_SUMMARY, result_code,
+                              len(player_cards), len(dealer_cards))
+    offset = _SUMMARY_HEADER.size
+    for rank, suit in cards:
+        _CARD.pack_into(buf, offset, rank, suit)
+        offset += _CARD.size
+    return buf
+
+def unpack_round_summary(data):
+    """Unpacks a round summary. Returns (result, player_cards, dealer_cards)."""
+    if len(data) < _SUMMARY_HEADER.size:
+        raise ProtocolException("Payload too small.")
+
+    cookie, msg_type, result, n_player, n_dealer = _SUMMARY_HEADER.unpack_from(data)
+    if cookie != MAGIC_COOKIE: raise ProtocolException("Invalid Magic Cookie.")
+    if len(data) != _SUMMARY_HEADER.size + (n_player + n_dealer) * _CARD.size:
+        raise ProtocolException("Invalid summary packet size.")
+    cards = list(_CARD.iter_unpack(data[_SUMMARY_HEADER.size:]))
+    return result, cards[:n_player], cards[n_player:]
+
+def pack_aggregate(rounds, wins, losses, ties):
+    """Packs the autoplay session totals."""
+    return _AGGREGATE.pack(MAGIC_COOKIE, MSG_TYPE_AGGREGATE, rounds, wins, losses, ties)
+
+def unpack_aggregate(data):
+    """Unpacks the autoplay session totals. Returns (rounds, wins, losses, ties)."""
+    if len(data) != _AGGREGATE.size:
+        raise ProtocolException("Invalid aggregate packet size.")
+    cookie, msg_type, rounds, wins, losses, ties = _AGGREGATE.unpack(data)
+    if cookie != MAGIC_COOKIE: raise ProtocolException("Invalid Magic Cookie.")
+    return rounds, wins, losses, ties
+
+def iter_server_events(msg_type, data):
+    """
+    Yields (result, rank, suit) for every event in a server frame.
+    A v1 payload is one event; a v2 Cards frame yields its cards with
+    PAYLOAD_CONTINUE first and then its result, unless that is PAYLOAD_CONTINUE.
+    """
+    if msg_type == MSG_TYPE_CARDS:
+        result, cards = unpack_cards(data)
+        for rank, suit in cards:
+            yield PAYLOAD_CONTINUE, rank, suit
+        if result != PAYLOAD_CONTINUE:
+            yield result, 0, 0
+    else:
+        yield unpack_payload_server(data)
+
 def format_card(rank, suit):
     """
     Converts rank (1-13) and suit (0-3) into a human-readable string.
@@ -95,4 +322,125 @@ def format_card(rank, suit):
     rank_str = rank_map.get(rank, str(rank))
     suit_str = suit_map.get(suit, 'Unknown')
     
-    return f"{rank_str} of {suit_str}"
\ No newline at end of file
+    return f"{rank_str} of {suit_str}"
+
+
+class FrameDecoder:
+    """
+    Incremental decoder for a TCP byte stream.
+    TCP may split or coalesce messages, so bytes are received into one
+    preallocated buffer and cut into whole frames by their message type.
+    Frames are returned as memoryview slices of that buffer: they stay valid
+    only until the next recv_from()/feed() call.
+    """
+
+    def __init__(self, frame_sizes, capacity=4096):
+        self._sizes = frame_sizes
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0  # First unconsumed byte
+        self._end = 0    # One past the last received byte
+
+    def _make_room(self):
+        """Moves unconsumed bytes to the front of the buffer."""
+        pending = self._end - self._start
+        if self._start == 0 and pending == len(self._buf):
+            raise ProtocolException("Frame larger than receive buffer.")
+        self._view[:pending] = self._view[self._start:self._end]
+        self._start, self._end = 0, pending
+
+    def recv_from(self, sock):
+        """Reads once from sock straight into the buffer. Returns bytes read (0 = EOF)."""
+        if self._end == len(self._buf):
+            self._make_room()
+        n = sock.recv_into(self._view[self._end:])
+        self._end += n
+        return n
+
+    def feed(self, data):
+        """Appends bytes obtained elsewhere (e.g. an asyncio stream)."""
+        data = memoryview(data)
+        while data:
+            if self._end == len(self._buf):
+                self._make_room()
+            n = min(len(data), len(self._buf) - self._end)
+            self._view[self._end:self._end + n] = data[:n]
+            self._end += n
+            data = data[n:]
+
+    def next_frame(self):
+        """Returns (msg_type, frame) for the next complete frame, or None if incomplete."""
+        available = self._end - self._start
+        if available < _HEADER.size:
+            if available == 0:
+                self._start = self._end = 0  # Reset for free when drained
+            return None
+
+        cookie, msg_type = _HEADER.unpack_from(self._buf, self._start)
+        if cookie != MAGIC_COOKIE:
+            raise ProtocolException("Invalid Magic Cookie.")
+        size = self._sizes.get(msg_type)
+        if size is None:
+            raise ProtocolException(f"Unexpected message type {msg_type:#x}.")
+        if type(size) is not int:
+            size = size(self._buf, self._start, available)
+        if size is None or available < size:
+            return None
+
+        frame = self._view[self._start:self._start + size]
+        self._start += size
+        return msg_type, frame
+
+    def read_frame(self, sock):
+        """Blocking: returns the next (msg_type, frame), or None if the peer closed."""
+        while True:
+            frame = self.next_frame()
+            if frame is not None:
+                return frame
+            if self.recv_from(sock) == 0:
+                return None
+
+
+class OutputBuffer:
+    """
+    Collects outgoing frames for one connection and writes them with a single
+    scatter-gather send on flush(), instead of one send() per frame.
+    """
+
+    def __init__(self, sock=None):
+        self.sock = sock
+        self._chunks = []
+        self._pending = 0    # Bytes queued but not yet sent
+        self.frames = 0      # Frames queued so far
+        self.syscalls = 0    # Send calls made so far
+        self.bytes_sent = 0
+
+    def write(self, frame):
+        """Queues one frame. Nothing is sent until flush()."""
+        self._chunks.append(frame)
+        self._pending += len(frame)
+        self.frames += 1
+
+    def take(self):
+        """Returns and clears the queued frames, counting them as one send."""
+        chunks, self._chunks = self._chunks, []
+        if chunks:
+            self.syscalls += 1
+            self.bytes_sent += self._pending
+            self._pending = 0
+        return chunks
+
+    def flush(self):
+        """Sends everything queued on self.sock, usually in one syscall."""
+        total = self._pending
+        chunks = self.take()
+        if not chunks:
+            return
+        if not hasattr(self.sock, 'sendmsg'):  # e.g. Windows
+            self.sock.sendall(b''.join(chunks))
+            return
+        sent = self.sock.sendmsg(chunks)
+        if sent < total:
+            # Kernel buffer was full: send the rest the simple way
+            self.syscalls += 1
+            self.sock.sendall(b''.join(chunks)[sent:])
@@ -0,0 +1,107 @@
+"""
+Session recording format, shared by the server's recorder and the replay tool.
+
+A segment file holds the records of one server process: a 64-byte header,
+then fixed-width 64-byte records. Segments are preallocated, so slots past
+the last record (or reserved by a writer that never filled them) are zero,
+i.e. kind 0, and readers skip them.
+
+    session  kind, version, decks, rounds, flags, session id, shoe seed,
+             start (epoch us), penetration, team name
+    round    kind, round, result, end, session id, shoe seed, start (epoch us),
+             duration (us), client think time (us), Hits, card counts, cards
+
+Cards are stored as server card indexes (suit * 13 + rank - 1), at most
+RECORD_CARDS per hand; the counts are exact, and the seed deals the rest.
+The Hits plus the end code are the client's decisions: it hit that many
+times, then stood unless it busted, left or was evicted.
+"""
+import glob
+import os
+import struct
+
+SEGMENT_MAGIC = b'BJREC001'
+RECORD_SIZE = 64
+RECORD_CARDS = 14  # Cards stored per hand
+
+SEGMENT_HEADER = struct.Struct('!8sHxxIQ40x')          # Magic + Record size + pid + Created (epoch us)
+SESSION_RECORD = struct.Struct('!BBBBB3xIQQf32s')      # See above
+ROUND_RECORD = struct.Struct('!BBBBIQQII3Bx14s14s')
+
+KIND_SESSION = 1
+KIND_ROUND = 2
+
+SESSION_AUTOPLAY = 0x1  # Session flag: played by the server with a stand-on table
+
+# Round end codes
+END_DONE = 0     # The client stood or busted
+END_GONE = 1     # The client left or misbehaved; played out as a Stand
+END_EVICTED = 2  # The client missed a deadline and forfeited the round
+
+END_NAMES = {END_DONE: "done", END_GONE: "gone", END_EVICTED: "evicted"}
+
+
+def segment_paths(paths):
+    """Expands directories to the segment files in them, oldest first."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, "*.rec")), key=os.path.getmtime))
+        else:
+            found.append(path)
+    return found
+
+
+def read_segment(path):
+    """Returns (pid, records) for a segment file; records are unpacked tuples starting with their kind."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < SEGMENT_HEADER.size:
+        raise ValueError(f"{path}: not a session recording")
+    magic, record_size, pid, _ = SEGMENT_HEADER.unpack_from(data)
+    if magic != SEGMENT_MAGIC or record_size != RECORD_SIZE:
+        raise ValueError(f"{path}: not a session recording")
+    records = []
+    for offset in range(SEGMENT_HEADER.size, len(data) - RECORD_SIZE + 1, RECORD_SIZE):
+        kind = data[offset]
+        if kind == KIND_SESSION:
+            records.append(SESSION_RECORD.unpack_from(data, offset))
+        elif kind == KIND_ROUND:
+            records.append(ROUND_RECORD.unpack_from(data, offset))
+    return pid, records
+
+
+def load_sessions(paths):
+    """
+    Reads segments and groups their records by session. Returns dicts in start
+    order; rounds without a session record (its slot was dropped) are skipped.
+    """
+    sessions = {}
+    rounds = []
+    for path in segment_paths(paths):
+        pid, records = read_segment(path)
+        for rec in records:
+            if rec[0] == KIND_SESSION:
+                _, version, decks, num_rounds, flags, session, seed, start_us, penetration, team = rec
+                sessions[pid, session] = {
+                    "pid": pid, "session": session, "seed": seed, "version": version, "decks": decks,
+                    "penetration": round(penetration, 6), "rounds": num_rounds,
+                    "autoplay": bool(flags & SESSION_AUTOPLAY), "start": start_us / 1e6,
+                    "team": team.decode('utf-8', 'replace').strip('\x00'), "played": [],
+                }
+            else:
+                rounds.append((pid, rec))
+    for pid, rec in rounds:
+        (_, round_no, result, end, session, _, start_us, duration_us, think_us,
+         hits, n_player, n_dealer, player, dealer) = rec
+        owner = sessions.get((pid, session))
+        if owner is not None:
+            owner["played"].append({
+                "round": round_no, "result": result, "end": end, "start": start_us / 1e6,
+                "duration": duration_us / 1e6, "think": think_us / 1e6, "hits": hits,
+                "player_count": n_player, "dealer_count": n_dealer,
+                "player": player[:min(n_player, RECORD_CARDS)], "dealer": dealer[:min(n_dealer, RECORD_CARDS)],
+            })
+    for s in sessions.values():
+        s["played"].sort(key=lambda r: r["round"])
+    return sorted(sessions.values(), key=lambda s: s["start"])
@@ -0,0 +1,153 @@
+"""
+Exact-probability Hit/Stand strategy for the house rules: the dealer draws
+below 17 (stands on soft 17), a player bust always loses, ties push and every
+win pays even money.
+
+Hands are described the way Hand reports them: points, a soft flag and the
+dealer's upcard value (Ace = 1, face cards = 10). A composition is a tuple of
+the remaining card counts for values 1..10. None means an infinite shoe.
+
+Everything is computed by dynamic programming over (hand, composition) states
+with bounded memo caches. The infinite-shoe basic strategy is precompiled into
+a lookup table at import, so the common decision is a single index.
+"""
+from functools import lru_cache
+
+from .exceptions import GameException
+from .hand import RANK_VALUE
+
+CACHE_SIZE = 1 << 16  # Entries per memo cache
+
+_BUST = 5  # Index of "bust" in a dealer distribution; 0-4 are totals 17-21
+_INFINITE_DRAWS = tuple((v, 1 / 13, None) for v in range(1, 10)) + ((10, 4 / 13, None),)
+
+
+def shoe_composition(decks=1, seen=()):
+    """Composition of a shoe of decks decks after the given wire ranks (1-13) were dealt."""
+    counts = [4 * decks] * 9 + [16 * decks]
+    for rank in seen:
+        counts[RANK_VALUE[rank] - 1] -= 1
+    if min(counts) < 0:
+        raise GameException("More cards seen than the shoe holds.")
+    return tuple(counts)
+
+
+def _draws(comp):
+    """(value, probability, composition after drawing it) for every possible next card."""
+    if comp is None:
+        return _INFINITE_DRAWS
+    total = sum(comp)
+    if total == 0:
+        raise GameException("Composition is empty.")
+    return tuple((v, n / total, comp[:v - 1] + (n - 1,) + comp[v:])
+                 for v, n in enumerate(comp, 1) if n)
+
+
+def _to_hard(points, soft):
+    """(points, soft) -> (hard total with Aces as 1, whether an Ace can still count 11)."""
+    return (points - 10, True) if soft else (points, False)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _dealer_final(hard, ace, comp):
+    """Probabilities of the dealer finishing on 17, 18, 19, 20, 21 or busting."""
+    points = hard + 10 if ace and hard <= 11 else hard
+    if points >= 17:
+        final = [0.0] * 6
+        final[_BUST if points > 21 else points - 17] = 1.0
+        return tuple(final)
+
+    dist = [0.0] * 6
+    for value, p, rest in _draws(comp):
+        sub = _dealer_final(hard + value, ace or value == 1, rest)
+        for i in range(6):
+            dist[i] += p * sub[i]
+    return tuple(dist)
+
+
+def _stand_ev(points, final):
+    win = final[_BUST]
+    lose = 0.0
+    for i in range(5):
+        if points > 17 + i: win += final[i]
+        elif points < 17 + i: lose += final[i]
+    return win - lose
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _player_ev(hard, ace, upcard, comp):
+    """(stand EV, hit EV) of a player hand, playing on optimally after a hit."""
+    points = hard + 10 if ace and hard <= 11 else hard
+    stand = _stand_ev(points, _dealer_final(upcard, upcard == 1, comp))
+    hit = 0.0
+    for value, p, rest in _draws(comp):
+        if hard + value > 21:
+            hit -= p
+        else:
+            hit += p * max(_player_ev(hard + value, ace or value == 1, upcard, rest))
+    return stand, hit
+
+
+def dealer_distribution(upcard, composition=None):
+    """Probability of each dealer final total given the upcard: {17: p, ..., 21: p, 'bust': p}."""
+    final = _dealer_final(upcard, upcard == 1, composition)
+    dist = {17 + i: final[i] for i in range(5)}
+    dist['bust'] = final[_BUST]
+    return dist
+
+
+def expected_values(points, soft, upcard, composition=None):
+    """Returns (stand EV, hit EV) in units of the bet."""
+    if points > 21:
+        return -1.0, -1.0
+    hard, ace = _to_hard(points, soft)
+    return _player_ev(hard, ace, upcard, composition)
+
+
+def _compile_basic_strategy():
+    """Hit (1) / Stand (0) for every (soft, points 0-21, upcard 1-10) with an infinite shoe."""
+    table = bytearray(2 * 22 * 11)
+    for soft in (0, 1):
+        for points in range(12 if soft else 2, 22):
+            for upcard in range(1, 11):
+                stand, hit = expected_values(points, soft, upcard)
+                table[(soft * 22 + points) * 11 + upcard] = hit > stand
+    return bytes(table)
+
+
+BASIC_STRATEGY = _compile_basic_strategy()
+
+
+def should_hit(points, soft, upcard, composition=None):
+    """
+    True if hitting has the higher EV. Without a composition this is a lookup
+    in BASIC_STRATEGY; with one it is computed exactly (and memoized).
+    Matches the policy signature (points, soft, upcard) used by the clients.
+    """
+    if points >= 21:
+        return False
+    if composition is None:
+        return bool(BASIC_STRATEGY[(bool(soft) * 22 + points) * 11 + upcard])
+    stand, hit = expected_values(points, soft, upcard, composition)
+    return hit > stand
+
+
+def decide(points, soft, upcard, composition=None):
+    """Returns the protocol decision string, "Hit" or "Stand"."""
+    return "Hit" if should_hit(points, soft, upcard, composition) else "Stand"
+
+
+def threshold_table(policy=should_hit):
+    """
+    Compiles policy(points, soft, upcard) into the 20-entry stand-on table used
+    by autoplay requests: for each (soft, upcard 1-10) the lowest total from
+    which the policy stands on every higher total. Index = soft * 10 + upcard - 1.
+    """
+    table = bytearray(20)
+    for soft in (0, 1):
+        for upcard in range(1, 11):
+            stand_on = 22
+            while stand_on > 4 and not policy(stand_on - 1, bool(soft), upcard):
+                stand_on -= 1
+            table[soft * 10 + upcard - 1] = stand_on
+    return bytes(table)
@@ -0,0 +1,103 @@
+"""
+Lightweight span tracing with Chrome / Perfetto trace-event export.
+
+Events are stored in a fixed-size ring buffer (the newest `capacity` events
+win) with time.monotonic_ns() timestamps. A span is a begin() token plus an
+end() call:
+
+    t = tracer.begin()          # 0 while tracing is off
+    ...
+    tracer.end("deal", t)       # returns at once for a 0 token
+
+While tracing is off that is one attribute check per call. Call sites that
+would build arguments first (e.g. accept instants) test tracer.enabled
+themselves, which avoids even that call.
+
+Events go on a track: the current thread, or whatever set_track() chose for
+the running thread or asyncio task (e.g. one track per server session).
+tracer.export(path) writes JSON that chrome://tracing and ui.perfetto.dev open.
+"""
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+_track = contextvars.ContextVar("trace_track", default=None)
+
+
+class Tracer:
+    def __init__(self, capacity=1 << 16):
+        self.enabled = False
+        self.capacity = capacity
+        self._events = [None] * capacity
+        self._seq = itertools.count()  # Next slot; next() is atomic under the GIL
+
+    def enable(self, capacity=None):
+        if capacity and capacity != self.capacity:
+            self.capacity = capacity
+            self._events = [None] * capacity
+        self.enabled = True
+
+    def set_track(self, track, label=None):
+        """Sends this thread's / task's events to track (any hashable), optionally naming it."""
+        if self.enabled:
+            _track.set(track)
+            if label:
+                # Stored in the ring too, so labels age out with their track's events
+                self._record((label, "M", time.monotonic_ns(), 0, track, None))
+
+    def _record(self, event):
+        self._events[next(self._seq) % self.capacity] = event
+
+    def _current_track(self):
+        track = _track.get()
+        return threading.get_ident() if track is None else track
+
+    def begin(self):
+        """Returns a start token for end(): a monotonic_ns timestamp, or 0 while disabled."""
+        return time.monotonic_ns() if self.enabled else 0
+
+    def end(self, name, start, **args):
+        """Records a complete span from a begin() token to now."""
+        if start:
+            now = time.monotonic_ns()
+            self._record((name, "X", start, now - start, self._current_track(), args))
+
+    def instant(self, name, **args):
+        if self.enabled:
+            self._record((name, "i", time.monotonic_ns(), 0, self._current_track(), args))
+
+    def events(self):
+        """Buffered events, oldest first."""
+        count = next(self._seq)  # Burns one slot, which is harmless
+        if count <= self.capacity:
+            return [e for e in self._events[:count] if e is not None]
+        start = count % self.capacity
+        return [e for e in self._events[start:] + self._events[:start] if e is not None]
+
+    def export(self, path):
+        """Writes the buffer as Chrome trace-event JSON. Returns the number of events written."""
+        pid = os.getpid()
+        out = []
+        tracks = {}
+        for name, ph, ts, dur, track, args in self.events():
+            tid = tracks.setdefault(track, len(tracks) + 1)
+            if ph == "M":
+                out.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+                continue
+            event = {"name": name, "ph": ph, "ts": ts / 1000, "pid": pid, "tid": tid}
+            if ph == "X":
+                event["dur"] = dur / 1000
+            else:
+                event["s"] = "t"
+            if args:
+                event["args"] = args
+            out.append(event)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": out, "displayTimeUnit": "ns"}, f, default=str)
+        return len(out)
+
+
+tracer = Tracer()
@@ -0,0 +1,15 @@
+"""
+Unit tests. Run from the repository root:
+
+    python -m unittest discover -s tests -t .     (or: python -m pytest tests)
+
+Server modules import each other by bare name, so server/ goes on the path
+next to the repository root, the same way server/main.py sees them.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "server")):  # server/ first: server.py shadows the directory
+    if path not in sys.path:
+        sys.path.insert(0, path)
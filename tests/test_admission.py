@@ -0,0 +1,112 @@
+import queue
+import socket
+import threading
+import time
+import unittest
+
+from eventlog import log
+from admission import TeamLimiter
+from metrics import metrics, REJECTED, SHED, SESSIONS, THROTTLED
+from server import Server
+from utils import Game
+from shared.protocol import *
+from shared.exceptions import NetworkException
+
+log.set_level("error")
+
+
+class OverloadPolicyTest(unittest.TestCase):
+    """Server._admit with every pool slot and queue place taken."""
+
+    def full_server(self, overload):
+        server = Server(max_workers=1, queue_size=1, overload=overload, broadcast=False)
+        server._pending = queue.Queue()
+        self.waiting, peer = socket.socketpair()
+        self.addCleanup(peer.close)
+        self.addCleanup(self.waiting.close)
+        server._pending.put(self.waiting)
+        server._admitted = 2
+        return server
+
+    def new_connection(self):
+        conn, peer = socket.socketpair()
+        self.addCleanup(peer.close)
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_reject_closes_new_connection(self):
+        server = self.full_server("reject")
+        before = metrics.snapshot().counters[REJECTED]
+        conn = self.new_connection()
+        server._admit(conn, ("127.0.0.1", 1))
+        self.assertEqual(conn.fileno(), -1)
+        self.assertEqual((server._admitted, server._pending.qsize()), (2, 1))
+        self.assertEqual(metrics.snapshot().counters[REJECTED], before + 1)
+
+    def test_shed_drops_oldest_queued(self):
+        server = self.full_server("shed")
+        before = metrics.snapshot().counters[SHED]
+        conn = self.new_connection()
+        server._admit(conn, ("127.0.0.1", 1))
+        self.assertEqual(self.waiting.fileno(), -1)
+        self.assertIs(server._pending.get_nowait(), conn)
+        self.assertEqual(server._admitted, 2)
+        self.assertEqual(metrics.snapshot().counters[SHED], before + 1)
+
+    def test_queue_waits_for_a_slot(self):
+        server = self.full_server("queue")
+        conn = self.new_connection()
+        admit = threading.Thread(target=server._admit, args=(conn, ("127.0.0.1", 1)), daemon=True)
+        admit.start()
+        admit.join(0.1)
+        self.assertTrue(admit.is_alive())
+        with server._slots:  # A pool thread finishes a connection
+            server._admitted -= 1
+            server._slots.notify()
+        admit.join(1)
+        self.assertFalse(admit.is_alive())
+        self.assertEqual((server._admitted, server._pending.qsize()), (2, 2))
+
+    def test_unknown_policy(self):
+        with self.assertRaises(NetworkException):
+            Server(overload="drop")
+
+
+class TeamLimiterTest(unittest.TestCase):
+
+    def test_burst_then_throttled(self):
+        limiter = TeamLimiter(rate=0, burst=2)
+        self.assertEqual([limiter.allow("A") for _ in range(3)], [True, True, False])
+        self.assertTrue(limiter.allow("B"))  # Buckets are per team
+
+    def test_tokens_refill_at_rate(self):
+        limiter = TeamLimiter(rate=100, burst=1)
+        self.assertTrue(limiter.allow("A"))
+        self.assertFalse(limiter.allow("A"))
+        time.sleep(0.05)
+        self.assertTrue(limiter.allow("A"))
+
+    def test_least_recently_used_bucket_is_dropped(self):
+        limiter = TeamLimiter(rate=0, burst=1, max_teams=2)
+        for team in "ABC":
+            limiter.allow(team)
+        self.assertEqual(list(limiter._buckets), ["B", "C"])
+        self.assertTrue(limiter.allow("A"))  # Starts over full
+
+    def test_throttled_request_is_not_a_session(self):
+        Game.team_limiter = TeamLimiter(rate=0, burst=0)
+        self.addCleanup(setattr, Game, "team_limiter", None)
+        before = metrics.snapshot().counters
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=lambda: (Game.start(server), server.close()), daemon=True)
+        thread.start()
+        with client:
+            client.sendall(pack_request(5, "Flooder", PROTOCOL_V2))
+            self.assertEqual(client.recv(64), b"")  # Closed without a deal
+        thread.join(5)
+        after = metrics.snapshot().counters
+        self.assertEqual((after[THROTTLED] - before[THROTTLED], after[SESSIONS] - before[SESSIONS]), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
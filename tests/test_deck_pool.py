@@ -0,0 +1,110 @@
+import socket
+import threading
+import time
+import unittest
+
+from deck_pool import ShufflePool
+from metrics import metrics, POOL_HITS, POOL_MISSES
+from utils import Game, Shoe
+from shared.protocol import *
+from shared.exceptions import GameException
+
+
+class ShufflePoolTest(unittest.TestCase):
+
+    def pool(self, seed, size=4, start=True):
+        pool = ShufflePool(1, size=size, seed=seed)
+        if start:
+            pool.start()
+            self.addCleanup(pool.close)
+        return pool
+
+    def takes(self, pool, n, pause=0.0):
+        orderings, old = [], None
+        for _ in range(n):
+            old = pool.take(old)
+            orderings.append(bytes(old))
+            time.sleep(pause)
+        return orderings
+
+    def test_orderings_depend_only_on_the_seed(self):
+        inline = self.takes(self.pool(5, start=False), 20)  # Every take misses and shuffles inline
+        produced = self.takes(self.pool(5), 20, pause=0.002)  # Mostly hits
+        self.assertEqual(inline, produced)
+        self.assertEqual(sorted(inline[0]), list(range(52)))
+        self.assertNotEqual(inline, self.takes(self.pool(6, start=False), 20))
+        self.assertEqual(len(set(inline)), 20)
+
+    def test_miss_does_not_block(self):
+        pool = self.pool(1, size=2, start=False)  # No producer at all
+        done = threading.Event()
+        threading.Thread(target=lambda: (pool.take(), done.set()), daemon=True).start()
+        self.assertTrue(done.wait(1))
+
+    def test_hits_and_misses_are_counted(self):
+        before = metrics.snapshot().counters
+        pool = self.pool(1, size=2)
+        deadline = time.monotonic() + 1
+        while len(pool._ready) < 2 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        self.takes(pool, 2)
+        self.takes(self.pool(1, start=False), 1)
+        after = metrics.snapshot().counters
+        self.assertEqual((after[POOL_HITS] - before[POOL_HITS], after[POOL_MISSES] - before[POOL_MISSES]), (2, 1))
+
+    def test_close_wakes_a_full_producer(self):
+        pool = ShufflePool(1, size=1, seed=1).start()
+        deadline = time.monotonic() + 1
+        while not pool._ready and time.monotonic() < deadline:
+            time.sleep(0.001)
+        pool.close()  # The producer is waiting for room
+        pool._thread.join(1)
+        self.assertFalse(pool._thread.is_alive())
+
+    def deal_with_recycling(self, pool):
+        shoe = Shoe(1, 1.0, pool=pool)
+        cards = [shoe.deal() for _ in range(50)]
+        shoe.begin_round()
+        cards += [shoe.deal() for _ in range(30)]  # Runs dry: the discards are shuffled back in
+        self.assertEqual(shoe.shuffles, 2)
+        return cards
+
+    def test_seeded_pool_recycles_reproducibly(self):
+        self.assertEqual(self.deal_with_recycling(self.pool(5, start=False)),
+                         self.deal_with_recycling(self.pool(5, start=False)))
+        self.assertNotEqual(self.deal_with_recycling(self.pool(5, start=False)),
+                            self.deal_with_recycling(self.pool(6, start=False)))
+
+    def test_released_shoe_buffer_is_reused(self):
+        pool = self.pool(1, start=False)
+        shoe = Shoe(1, pool=pool)
+        shoe.release()
+        self.assertEqual(len(pool._spare), 1)
+        buf = pool._spare[0]
+        shoe.release()  # Twice is harmless
+        self.assertEqual(len(pool._spare), 1)
+        self.assertIs(pool.take(), buf)  # The next shoe's ordering is shuffled into it
+
+    def test_session_gives_its_buffer_back(self):
+        pool = self.pool(1, start=False)
+        Game.deck_pool = pool
+        self.addCleanup(setattr, Game, "deck_pool", None)
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=lambda: (Game.start(server), server.close()), daemon=True)
+        thread.start()
+        with client:
+            client.sendall(pack_request(1, "Pooled", PROTOCOL_V2))
+            decoder = FrameDecoder(CLIENT_INBOUND)
+            decoder.read_frame(client)
+            client.sendall(pack_payload(data_str="Stand"))
+            decoder.read_frame(client)
+        thread.join(5)
+        self.assertEqual(len(pool._spare), 1)
+
+    def test_deck_count_must_match(self):
+        with self.assertRaises(GameException):
+            Shoe(2, pool=ShufflePool(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import socket
+import unittest
+
+from shared.exceptions import ProtocolException
+from shared.protocol import *
+
+
+class FrameDecoderTest(unittest.TestCase):
+
+    def frames(self, decoder):
+        out = []
+        while True:
+            frame = decoder.next_frame()
+            if frame is None:
+                return out
+            out.append((frame[0], bytes(frame[1])))
+
+    def test_frame_split_byte_by_byte(self):
+        request = pack_request(5, "Team", PROTOCOL_V2)
+        decoder = FrameDecoder(SERVER_INBOUND)
+        for i in range(len(request) - 1):
+            decoder.feed(request[i:i + 1])
+            self.assertIsNone(decoder.next_frame())
+        decoder.feed(request[-1:])
+        self.assertEqual(self.frames(decoder), [(MSG_TYPE_REQUEST_V2, request)])
+
+    def test_coalesced_frames(self):
+        stand = pack_payload(data_str="Stand")
+        decoder = FrameDecoder(SERVER_INBOUND)
+        decoder.feed(pack_request(3, "Team") + stand + stand[:4])
+        self.assertEqual([t for t, _ in self.frames(decoder)], [MSG_TYPE_REQUEST, MSG_TYPE_PAYLOAD])
+        decoder.feed(stand[4:])
+        self.assertEqual(self.frames(decoder), [(MSG_TYPE_PAYLOAD, stand)])
+
+    def test_variable_size_cards_frame(self):
+        cards = bytes(pack_cards([(1, 0), (13, 3), (7, 2)], PAYLOAD_WIN))
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        decoder.feed(cards[:6])  # Header only: the size is not known yet
+        self.assertIsNone(decoder.next_frame())
+        decoder.feed(cards[6:])
+        msg_type, frame = decoder.next_frame()
+        self.assertEqual(unpack_cards(frame), (PAYLOAD_WIN, [(1, 0), (13, 3), (7, 2)]))
+
+    def test_buffer_is_reused_across_frames(self):
+        stand = pack_payload(data_str="Stand")  # 10 bytes
+        decoder = FrameDecoder(SERVER_INBOUND, capacity=32)
+        stream = stand * 100
+        frames = 0
+        for i in range(0, len(stream), 7):  # Frames straddle every read
+            decoder.feed(stream[i:i + 7])
+            frames += len(self.frames(decoder))
+        self.assertEqual(frames, 100)
+
+    def test_bad_cookie(self):
+        decoder = FrameDecoder(SERVER_INBOUND)
+        decoder.feed(b"\x00" * 10)
+        with self.assertRaises(ProtocolException):
+            decoder.next_frame()
+
+    def test_unexpected_message_type(self):
+        decoder = FrameDecoder(SERVER_INBOUND)
+        decoder.feed(pack_offer(12000, "Server"))  # Server-bound stream: offers are not expected
+        with self.assertRaises(ProtocolException):
+            decoder.next_frame()
+
+    def test_frame_larger_than_buffer(self):
+        decoder = FrameDecoder(SERVER_INBOUND, capacity=16)
+        with self.assertRaises(ProtocolException):
+            decoder.feed(pack_request(1, "Team"))  # 38 bytes, and no frame fits to make room
+
+    def test_read_frame_eof(self):
+        a, b = socket.socketpair()
+        with a, b:
+            a.sendall(pack_payload(data_str="Hit"))
+            a.close()
+            decoder = FrameDecoder(SERVER_INBOUND)
+            self.assertEqual(unpack_payload_client(decoder.read_frame(b)[1]), "Hit")
+            self.assertIsNone(decoder.read_frame(b))
+
+
+if __name__ == "__main__":
+    unittest.main()
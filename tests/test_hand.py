@@ -0,0 +1,71 @@
+import random
+import unittest
+
+from utils import Round, Shoe, CARD_RANK
+from shared.hand import Hand
+
+
+def recount(ranks):
+    """Hand total the slow way: Aces as 11, then as 1 while over 21."""
+    total = sum(11 if r == 1 else min(r, 10) for r in ranks)
+    aces = ranks.count(1)
+    while total > 21 and aces:
+        total -= 10
+        aces -= 1
+    return total
+
+
+class HandTest(unittest.TestCase):
+
+    def hand(self, *ranks):
+        h = Hand()
+        for r in ranks:
+            h.add(r)
+        return h
+
+    def test_soft_totals(self):
+        h = self.hand(1, 6)
+        self.assertEqual((h.points, h.is_soft), (17, True))
+        h.add(10)
+        self.assertEqual((h.points, h.is_soft), (17, False))
+
+    def test_two_aces(self):
+        h = self.hand(1, 1)
+        self.assertEqual((h.points, h.is_soft), (12, True))
+        h.add(9)
+        self.assertEqual((h.points, h.is_soft, h.is_bust), (21, True, False))
+
+    def test_face_cards_and_bust(self):
+        h = self.hand(13, 12)
+        self.assertEqual((h.points, h.is_bust), (20, False))
+        h.add(2)
+        self.assertEqual((h.points, h.is_bust, h.size), (22, True, 3))
+        h.clear()
+        self.assertEqual((h.points, h.size), (0, 0))
+
+    def test_matches_recount(self):
+        rng = random.Random(9)
+        for _ in range(2000):
+            ranks = [rng.randint(1, 13) for _ in range(rng.randint(2, 8))]
+            self.assertEqual(self.hand(*ranks).points, recount(ranks), ranks)
+
+
+class RoundHandTest(unittest.TestCase):
+
+    def test_round_totals_follow_the_cards(self):
+        game = Round(Shoe(2, rng=random.Random(4)))
+        for _ in range(300):
+            p1, p2, d1 = game.deal_initial()
+            player = [CARD_RANK[p1], CARD_RANK[p2]]
+            while game.get_player_points() < 17:
+                player.append(CARD_RANK[game.player_hit()])
+            self.assertEqual(game.get_player_points(), recount(player))
+            hidden, drawn = game.dealer_turn()
+            dealer = [CARD_RANK[c] for c in (d1, hidden, *drawn)]
+            self.assertEqual(game.get_dealer_points(), recount(dealer))
+            self.assertEqual(game.player_hand.size, len(player))
+            game.restart()
+
+
+if __name__ == "__main__":
+    unittest.main()
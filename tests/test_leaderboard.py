@@ -0,0 +1,101 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from eventlog import log
+from leaderboard import Leaderboard, connect, top
+from utils import Game
+from shared.protocol import *
+
+log.set_level("error")
+
+
+class LeaderboardTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "stats.db")
+        self.conn = connect(self.path)
+        self.addCleanup(self.conn.close)
+
+    def board(self):
+        return {e["team"]: (e["sessions"], e["rounds"], e["wins"], e["losses"], e["ties"]) for e in top(self.conn, 100)}
+
+    def test_flushes_only_deltas(self):
+        board = Leaderboard(self.path)
+        board.record_session("A")
+        board.record("A", PAYLOAD_WIN, 3)
+        board.record("B", PAYLOAD_TIE)
+        board._flush(self.conn)
+        self.assertEqual(self.board(), {"A": (1, 3, 3, 0, 0), "B": (0, 1, 0, 0, 1)})
+        board._flush(self.conn)  # Nothing new: nothing written
+        self.assertEqual(board.flushes, 1)
+        board.record("A", PAYLOAD_LOSS)
+        board._flush(self.conn)
+        self.assertEqual(self.board()["A"], (1, 4, 3, 1, 0))
+        self.assertEqual(board.flushes, 2)
+
+    def test_threads_and_processes_add_up(self):
+        boards = Leaderboard(self.path), Leaderboard(self.path)  # Two workers sharing the file
+
+        def play(board):
+            for _ in range(100):
+                board.record("A", PAYLOAD_WIN)
+        threads = [threading.Thread(target=play, args=(b,)) for b in boards for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for board in boards:
+            board._flush(self.conn)
+            board._flush(self.conn)
+            self.assertEqual(board._shards, [])  # Exited threads are dropped once flushed
+        self.assertEqual(self.board()["A"], (0, 400, 400, 0, 0))
+
+    def test_close_flushes(self):
+        board = Leaderboard(self.path, flush_interval=60).start()
+        board.record("A", PAYLOAD_LOSS)
+        board.close()
+        self.assertEqual(self.board()["A"], (0, 1, 0, 1, 0))
+
+
+class GameLeaderboardTest(unittest.TestCase):
+    """Only rounds a client played to the end are credited; every session is counted."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "stats.db")
+        Game.leaderboard = Leaderboard(self.path, flush_interval=60).start()
+        self.addCleanup(setattr, Game, "leaderboard", None)
+
+    def test_client_leaves_mid_session(self):
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=lambda: (Game.start(server), server.close()), daemon=True)
+        thread.start()
+        with client:
+            client.sendall(pack_request(50, "Leaver", PROTOCOL_V2))
+            decoder = FrameDecoder(CLIENT_INBOUND)
+            finished = 0
+            while finished < 2:
+                result, _ = unpack_cards(decoder.read_frame(client)[1])
+                if result == PAYLOAD_CONTINUE:
+                    client.sendall(pack_payload(data_str="Stand"))
+                else:
+                    finished += 1
+            decoder.read_frame(client)  # Dealt round 3, then gone
+        thread.join(5)
+        Game.leaderboard.close()
+        conn = connect(self.path)
+        [entry] = top(conn)
+        conn.close()
+        self.assertEqual((entry["team"], entry["sessions"], entry["rounds"]), ("Leaver", 1, 2))
+        self.assertEqual(entry["wins"] + entry["losses"] + entry["ties"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
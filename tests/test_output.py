@@ -0,0 +1,63 @@
+import socket
+import threading
+import unittest
+
+from eventlog import log
+from metrics import metrics, FRAMES_SENT, SEND_CALLS
+from utils import Game
+from shared.protocol import *
+
+log.set_level("error")
+
+
+class OutputBufferTest(unittest.TestCase):
+
+    def test_flush_is_one_send(self):
+        a, b = socket.socketpair()
+        with a, b:
+            out = OutputBuffer(a)
+            frames = [pack_payload(result_code=PAYLOAD_CONTINUE, card_rank=r, card_suit=0) for r in (1, 2, 3)]
+            for f in frames:
+                out.write(f)
+            self.assertEqual(out.syscalls, 0)
+            out.flush()
+            out.flush()  # Nothing queued: no send
+            self.assertEqual((out.frames, out.syscalls, out.bytes_sent), (3, 1, sum(map(len, frames))))
+            self.assertEqual(b.recv(1024), b"".join(frames))
+
+    def test_flush_to_closed_peer_raises(self):
+        a, b = socket.socketpair()
+        b.close()
+        with a:
+            out = OutputBuffer(a)
+            out.write(pack_payload(result_code=PAYLOAD_WIN))
+            with self.assertRaises(OSError):
+                out.flush()
+
+    def test_one_send_per_decision(self):
+        before = metrics.snapshot().counters
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=lambda: (Game.start(server), server.close()), daemon=True)
+        thread.start()
+        with client:
+            client.sendall(pack_request(3, "Coalesced", PROTOCOL_V1))
+            decoder = FrameDecoder(CLIENT_INBOUND)
+            for _ in range(3):
+                cards = 0
+                while True:
+                    msg_type, frame = decoder.read_frame(client)
+                    result, _, _ = unpack_payload_server(frame)
+                    if result != PAYLOAD_CONTINUE:
+                        break
+                    cards += 1
+                    if cards == 3:
+                        client.sendall(pack_payload(data_str="Stand"))
+        thread.join(5)
+        after = metrics.snapshot().counters
+        # One send per decision: a round's result goes out with the next round's deal, the last one on its own
+        self.assertEqual(after[SEND_CALLS] - before[SEND_CALLS], 4)
+        self.assertGreaterEqual(after[FRAMES_SENT] - before[FRAMES_SENT], 15)  # 3 dealt, the reveal, the result
+
+
+if __name__ == "__main__":
+    unittest.main()
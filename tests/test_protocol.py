@@ -0,0 +1,65 @@
+import socket
+import threading
+import unittest
+
+from eventlog import log
+from utils import Game
+from shared.exceptions import ProtocolException
+from shared.protocol import *
+
+log.set_level("error")
+
+
+class ProtocolV2Test(unittest.TestCase):
+
+    def test_version_negotiation(self):
+        self.assertEqual(unpack_request_v2(pack_request(4, "Old")), (4, "Old", PROTOCOL_V1))
+        self.assertEqual(unpack_request_v2(pack_request(4, "New", PROTOCOL_V2)), (4, "New", PROTOCOL_V2))
+        # A newer client gets the highest version both sides speak
+        self.assertEqual(unpack_request_v2(pack_request(4, "Newer", PROTOCOL_VERSION + 3))[2], PROTOCOL_VERSION)
+        with self.assertRaises(ProtocolException):
+            unpack_request_v2(pack_request(4, "Short")[:-1])
+
+    def test_cards_frame_round_trip(self):
+        cards = [(1, 0), (10, 1), (13, 3)]
+        frame = bytes(pack_cards(cards, PAYLOAD_TIE))
+        self.assertEqual(unpack_cards(frame), (PAYLOAD_TIE, cards))
+        self.assertEqual(list(iter_server_events(MSG_TYPE_CARDS, frame)),
+                         [(PAYLOAD_CONTINUE, 1, 0), (PAYLOAD_CONTINUE, 10, 1), (PAYLOAD_CONTINUE, 13, 3),
+                          (PAYLOAD_TIE, 0, 0)])
+        deal = bytes(pack_cards(cards[:2]))
+        self.assertEqual(len(list(iter_server_events(MSG_TYPE_CARDS, deal))), 2)  # No result event yet
+
+    def serve_one_round(self, version):
+        """Plays a one-round session at version, standing. Returns the server's frame types."""
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=lambda: (Game.start(server), server.close()), daemon=True)
+        thread.start()
+        types = []
+        with client:
+            client.sendall(pack_request(1, "Versioned", version))
+            decoder = FrameDecoder(CLIENT_INBOUND)
+            events = 0
+            while True:
+                msg_type, frame = decoder.read_frame(client)
+                types.append(msg_type)
+                results = [e for e in iter_server_events(msg_type, frame) if e[0] != PAYLOAD_CONTINUE]
+                events += 1
+                if results:
+                    break
+                if (version == PROTOCOL_V1 and events == 3) or version > PROTOCOL_V1:
+                    client.sendall(pack_payload(data_str="Stand"))
+        thread.join(5)
+        return types
+
+    def test_v1_client_gets_one_card_per_frame(self):
+        types = self.serve_one_round(PROTOCOL_V1)
+        self.assertEqual(set(types), {MSG_TYPE_PAYLOAD})
+        self.assertGreaterEqual(len(types), 5)  # 3 dealt, the reveal, any draws, the result
+
+    def test_v2_client_gets_batched_frames(self):
+        self.assertEqual(self.serve_one_round(PROTOCOL_V2), [MSG_TYPE_CARDS, MSG_TYPE_CARDS])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import random
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+from eventlog import log
+from recorder import Recorder
+from utils import Game, Shoe, SessionMachine
+from shared.protocol import *
+from shared.recording import load_sessions, END_DONE, END_GONE
+
+log.set_level("error")
+
+
+class RecorderTest(unittest.TestCase):
+    """Sessions served by Game into a recorder, read back the way replay.py does."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        Game.recorder = Recorder(self.directory, segment_records=64).start()
+        self.addCleanup(setattr, Game, "recorder", None)
+        self.addCleanup(Game.recorder.close)  # Before the directory goes
+
+    def play(self, num_rounds, stand_rounds):
+        """Stands in stand_rounds rounds of a num_rounds session, then leaves. Returns the recorded sessions."""
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=lambda: (Game.start(server), server.close()), daemon=True)
+        thread.start()
+        with client:
+            client.sendall(pack_request(num_rounds, "Recorded", PROTOCOL_V2))
+            decoder = FrameDecoder(CLIENT_INBOUND)
+            finished = 0
+            while finished < stand_rounds:
+                result, _ = unpack_cards(decoder.read_frame(client)[1])
+                if result == PAYLOAD_CONTINUE:
+                    client.sendall(pack_payload(data_str="Stand"))
+                else:
+                    finished += 1
+            if stand_rounds < num_rounds:
+                decoder.read_frame(client)  # Dealt the next round, then gone
+        thread.join(5)
+        Game.recorder.close()
+        return load_sessions([self.directory])
+
+    def test_completed_session(self):
+        [session] = self.play(3, 3)
+        self.assertEqual((session["team"], session["rounds"]), ("Recorded", 3))
+        self.assertEqual([r["end"] for r in session["played"]], [END_DONE] * 3)
+
+    def test_client_gone_is_recorded_once(self):
+        [session] = self.play(50, 2)
+        self.assertEqual([(r["round"], r["end"]) for r in session["played"]],
+                         [(1, END_DONE), (2, END_DONE), (3, END_GONE)])
+
+    def test_huge_think_time_is_clamped(self):
+        machine = SessionMachine(Shoe(1, rng=random.Random(1)), 1)
+        machine.begin_round()
+        machine.receive("Stand")
+        Game.recorder.session(1, 1, "Thinker", 1, PROTOCOL_V2, 1, 0.75)
+        hours = 5 * 3600.0  # Past the 32-bit microsecond fields
+        Game.recorder.round(machine, 1, 1, time.perf_counter() - hours, think=hours)
+        self.assertEqual(Game.recorder.dropped, 0)
+        Game.recorder.close()
+        [session] = load_sessions([self.directory])
+        [rnd] = session["played"]
+        self.assertEqual((rnd["duration"], rnd["think"]), (0xFFFFFFFF / 1e6, 0xFFFFFFFF / 1e6))
+
+    def test_out_of_range_field_is_dropped(self):
+        Game.recorder.session(1, 1, "Decks", 1, PROTOCOL_V2, 300, 0.75)  # decks is one byte
+        self.assertEqual(Game.recorder.dropped, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
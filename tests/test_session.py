@@ -0,0 +1,162 @@
+import random
+import socket
+import threading
+import unittest
+
+from eventlog import log
+from metrics import metrics, SESSIONS, ROUNDS, ABANDONED, CLIENT_ERRORS, PROTOCOL_ERRORS
+from timeouts import timers
+from utils import Game, Shoe, SessionMachine, BETWEEN_ROUNDS, AWAIT_DECISION, SESSION_OVER
+from shared.exceptions import GameException
+from shared.protocol import *
+
+log.set_level("error")
+
+
+def seeded_shoe(seed=7):
+    return Shoe(1, 0.75, rng=random.Random(seed))
+
+
+class SessionMachineTest(unittest.TestCase):
+
+    def test_stand_finishes_round(self):
+        machine = SessionMachine(seeded_shoe(), 2)
+        self.assertEqual(machine.state, BETWEEN_ROUNDS)
+        machine.begin_round()
+        self.assertEqual((machine.state, machine.round_no, len(machine.player_cards)), (AWAIT_DECISION, 1, 2))
+        self.assertEqual(machine.receive("Stand"), BETWEEN_ROUNDS)
+        self.assertIn(machine.result, (PAYLOAD_WIN, PAYLOAD_LOSS, PAYLOAD_TIE))
+        self.assertGreaterEqual(len(machine.dealer_cards), 2)
+        machine.begin_round()
+        self.assertEqual(machine.receive("Stand"), SESSION_OVER)
+
+    def test_hits_until_bust(self):
+        machine = SessionMachine(seeded_shoe(), 1)
+        machine.begin_round()
+        while machine.state == AWAIT_DECISION:
+            machine.decide(True)
+        self.assertTrue(machine.player_hand.is_bust)
+        self.assertEqual((machine.state, machine.result), (SESSION_OVER, PAYLOAD_LOSS))
+        self.assertEqual(len(machine.dealer_cards), 2)  # No dealer turn after a bust
+
+    def test_abandon_plays_out_as_stand(self):
+        stood, left = SessionMachine(seeded_shoe(3), 1), SessionMachine(seeded_shoe(3), 1)
+        stood.begin_round()
+        stood.receive("Stand")
+        left.begin_round()
+        self.assertEqual(left.abandon(), SESSION_OVER)
+        self.assertEqual((left.result, left.dealer_cards), (stood.result, stood.dealer_cards))
+
+    def test_abandon_forfeit_loses(self):
+        machine = SessionMachine(seeded_shoe(), 3)
+        machine.begin_round()
+        self.assertEqual(machine.abandon(forfeit=True), BETWEEN_ROUNDS)
+        self.assertEqual(machine.result, PAYLOAD_LOSS)
+        self.assertEqual(machine.abandon(), BETWEEN_ROUNDS)  # Nothing pending: no-op
+
+    def test_out_of_turn(self):
+        machine = SessionMachine(seeded_shoe(), 1)
+        with self.assertRaises(GameException):
+            machine.decide(False)
+        machine.begin_round()
+        with self.assertRaises(GameException):
+            machine.begin_round()
+        self.assertEqual(SessionMachine(seeded_shoe(), 0).state, SESSION_OVER)
+
+    def test_wire_frames_v2(self):
+        out = OutputBuffer()
+        machine = SessionMachine(seeded_shoe(), 1, PROTOCOL_V2, out)
+        machine.begin_round()
+        machine.receive("Stand")
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        for chunk in out.take():
+            decoder.feed(chunk)
+        events = []
+        while (frame := decoder.next_frame()) is not None:
+            events.extend(iter_server_events(*frame))
+        self.assertEqual(len(events), 3 + len(machine.dealer_cards) - 1 + 1)  # Deal, reveal + draws, result
+        self.assertEqual(events[-1][0], machine.result)
+        self.assertTrue(all(e[0] == PAYLOAD_CONTINUE for e in events[:-1]))
+
+
+class GameSessionTest(unittest.TestCase):
+    """Game over a socketpair: how a session ends when the client does not finish it."""
+
+    @classmethod
+    def setUpClass(cls):
+        timers.start()
+
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+        self.addCleanup(self.client.close)
+        self.before = metrics.snapshot().counters
+
+    def serve(self):
+        """Runs Game.start on the server end in a thread."""
+        def run():
+            try:
+                Game.start(self.server)
+            finally:
+                self.server.close()
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def delta(self, counter):
+        return metrics.snapshot().counters[counter] - self.before[counter]
+
+    def first_frame(self):
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        frame = decoder.read_frame(self.client)
+        return frame[0], bytes(frame[1])
+
+    def test_eof_mid_session(self):
+        thread = self.serve()
+        self.client.sendall(pack_request(50, "Leaver", PROTOCOL_V2))
+        self.assertEqual(self.first_frame()[0], MSG_TYPE_CARDS)
+        self.client.shutdown(socket.SHUT_WR)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        # The round in progress is played out; the other 49 are not
+        self.assertEqual((self.delta(SESSIONS), self.delta(ROUNDS), self.delta(ABANDONED)), (1, 1, 1))
+        self.assertEqual((self.delta(CLIENT_ERRORS), self.delta(PROTOCOL_ERRORS)), (0, 0))
+
+    def test_send_error(self):
+        thread = self.serve()
+        self.client.sendall(pack_request(50, "Leaver", PROTOCOL_V2))
+        self.client.close()  # Gone before the deal: the first send fails
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((self.delta(SESSIONS), self.delta(ROUNDS), self.delta(ABANDONED)), (1, 1, 1))
+        self.assertEqual(self.delta(CLIENT_ERRORS), 0)
+
+    def test_bad_frame(self):
+        thread = self.serve()
+        self.client.sendall(pack_request(50, "Garbler", PROTOCOL_V2))
+        self.first_frame()
+        self.client.sendall(b"\x00" * 10)
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((self.delta(ROUNDS), self.delta(PROTOCOL_ERRORS), self.delta(ABANDONED)), (1, 1, 0))
+
+    def test_full_session(self):
+        thread = self.serve()
+        self.client.sendall(pack_request(3, "Stander", PROTOCOL_V2))
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        results = []
+        while len(results) < 3:
+            msg_type, frame = decoder.read_frame(self.client)
+            result, cards = unpack_cards(frame)
+            if result == PAYLOAD_CONTINUE:
+                self.assertEqual(len(cards), 3)  # Both player cards and the upcard in one frame
+                self.client.sendall(pack_payload(data_str="Stand"))
+            else:
+                results.append(result)
+        self.client.close()  # Between sessions: the v1 way to end, not an abandoned session
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((self.delta(SESSIONS), self.delta(ROUNDS), self.delta(ABANDONED)), (1, 3, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
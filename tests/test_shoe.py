@@ -0,0 +1,82 @@
+import random
+import unittest
+
+from utils import Shoe, SessionMachine, BETWEEN_ROUNDS
+from shared.exceptions import GameException
+
+
+class ShoeTest(unittest.TestCase):
+
+    def test_reshuffles_at_cut_card(self):
+        shoe = Shoe(1, 0.5, rng=random.Random(1))
+        self.assertEqual(shoe.shuffles, 1)
+        dealt = 0
+        while dealt < 26:
+            shoe.begin_round()
+            self.assertEqual(shoe.shuffles, 1)
+            for _ in range(4):
+                shoe.deal()
+            dealt += 4
+        shoe.begin_round()  # 28 of 52 dealt: past the cut card
+        self.assertEqual((shoe.shuffles, shoe.remaining()), (2, 52))
+
+    def test_multi_deck_cut_card(self):
+        shoe = Shoe(6, 0.75, rng=random.Random(5))  # Cut card after 234 of 312 cards
+        for _ in range(233):
+            shoe.deal()
+        shoe.begin_round()
+        self.assertEqual(shoe.shuffles, 1)
+        shoe.deal()
+        shoe.begin_round()
+        self.assertEqual((shoe.shuffles, shoe.remaining()), (2, 312))
+
+    def test_session_keeps_one_shoe(self):
+        shoe = Shoe(4, 0.75, rng=random.Random(6))
+        machine = SessionMachine(shoe, 200)
+        while machine.state == BETWEEN_ROUNDS:
+            machine.begin_round()
+            machine.decide(False)
+        # About 5 cards a round: 200 rounds deal ~1000 cards, a few passes through a 208-card shoe
+        self.assertTrue(3 <= shoe.shuffles <= 10, shoe.shuffles)
+
+    def test_deck_is_complete(self):
+        shoe = Shoe(2, 1.0, rng=random.Random(2))
+        self.assertEqual(sorted(shoe.deal() for _ in range(104)), sorted(list(range(52)) * 2))
+
+    def test_recycles_discards_mid_round(self):
+        shoe = Shoe(1, 1.0, rng=random.Random(3))
+        for _ in range(50):
+            shoe.deal()
+        shoe.begin_round()  # Cut card not reached yet (penetration 1): no reshuffle
+        in_play = [shoe.deal() for _ in range(4)]  # Two left, then the discards come back
+        self.assertEqual(shoe.shuffles, 2)
+        rest = [shoe.deal() for _ in range(shoe.remaining())]
+        self.assertEqual(len(rest), 48)
+        self.assertEqual(sorted(in_play + rest), list(range(52)))  # Cards in play are not dealt again
+
+    def test_exhausted_within_one_round(self):
+        shoe = Shoe(1, 1.0, rng=random.Random(4))
+        with self.assertRaises(GameException):
+            for _ in range(53):
+                shoe.deal()
+
+    def test_invalid_settings(self):
+        for decks, penetration in ((0, 0.75), (1, 0), (1, 1.5)):
+            with self.assertRaises(GameException):
+                Shoe(decks, penetration)
+
+    def test_seeded_shoes_deal_alike(self):
+        def deal(seed):
+            machine = SessionMachine(Shoe(1, 0.75, rng=random.Random(seed)), 30)
+            cards = []
+            while machine.state == BETWEEN_ROUNDS:
+                machine.begin_round()
+                machine.decide(False)
+                cards.append((bytes(machine.player_cards), bytes(machine.dealer_cards)))
+            return cards
+        self.assertEqual(deal(42), deal(42))
+        self.assertNotEqual(deal(42), deal(43))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from simulation import (HouseRules, threshold_policy, shoe_depth, deal_matrix, play_batch, cross_check,
+                        simulate, WIN, LOSS, TIE)
+from utils import Round, CARD_RANK
+from shared.exceptions import GameException
+
+
+def lowest_cards(decks, depth):
+    """A shoe row that starts with its lowest cards, the deepest any round can go."""
+    shoe = sorted((c for c in range(52) for _ in range(decks)), key=lambda c: min(CARD_RANK[c], 10))
+    return np.array([shoe[:depth]])
+
+
+class SimulationTest(unittest.TestCase):
+
+    def test_depth_grows_with_decks(self):
+        self.assertEqual(shoe_depth(1), 20)
+        self.assertGreater(shoe_depth(2), 26)  # 8 Aces, 8 twos and 8 threes add up to only 48
+        self.assertGreater(shoe_depth(8), 32)  # 32 Aces add up to 32
+        self.assertLess(shoe_depth(2), shoe_depth(8))
+        self.assertGreater(shoe_depth(2, HouseRules(21)), shoe_depth(2))
+
+    def test_deepest_round_fits(self):
+        # Hits every soft hand too: 21 Aces for the player, then the dealer draws Aces to a soft 17
+        hit_soft = lambda points, soft, upcard: (points < 21) | soft
+        for decks in (1, 2, 8):
+            for rules in (HouseRules(), HouseRules(21, hit_soft_17=True), HouseRules(2)):
+                for policy in (hit_soft, threshold_policy(22)):
+                    play_batch(lowest_cards(decks, shoe_depth(decks, rules)), policy, rules)
+        with self.assertRaises(GameException):
+            play_batch(lowest_cards(8, 26), hit_soft, HouseRules())  # The old fixed depth
+
+    def test_matches_scalar_round(self):
+        self.assertEqual(cross_check(3000, threshold_policy(16), decks=2, seed=3), 0)
+        self.assertEqual(deal_matrix(np.random.default_rng(1), 5, 6).shape, (5, shoe_depth(6)))
+
+    def test_simulate_counts(self):
+        stats = simulate(20000, threshold_policy(17), HouseRules(), decks=4, batch=7000, seed=2)
+        self.assertEqual(stats["wins"] + stats["losses"] + stats["ties"], 20000)
+        self.assertTrue(0 < stats["house_edge"] < 0.15, stats["house_edge"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import socket
+import threading
+import unittest
+
+from eventlog import log
+from metrics import metrics, ROUNDS, LOSSES, ABANDONED, EVICT_REQUEST, EVICT_IDLE, EVICT_DECISION
+from timeouts import TimerWheel, Watchdog, timers
+from utils import Game
+from shared.protocol import *
+
+log.set_level("error")
+
+
+class TimerWheelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.wheel = TimerWheel(tick=0.01, slots=8).start()
+
+    def test_fires_after_delay(self):
+        fired = threading.Event()
+        self.wheel.schedule(0.05, fired.set)
+        self.assertFalse(fired.is_set())
+        self.assertTrue(fired.wait(1))
+
+    def test_longer_than_one_rotation(self):
+        fired = threading.Event()
+        self.wheel.schedule(0.2, fired.set)  # 8 slots of 10 ms: waits out two extra rotations
+        self.assertFalse(fired.wait(0.12))
+        self.assertTrue(fired.wait(1))
+
+    def test_cancelled_timer_does_not_fire(self):
+        fired, later = threading.Event(), threading.Event()
+        self.wheel.cancel(self.wheel.schedule(0.03, fired.set))
+        self.wheel.schedule(0.1, later.set)
+        self.assertTrue(later.wait(1))
+        self.assertFalse(fired.is_set())
+
+    def test_watchdog_evicts(self):
+        a, b = socket.socketpair()
+        with a, b:
+            watchdog = Watchdog(a, self.wheel)
+            watchdog.arm("decision", 0.05)
+            self.assertEqual(a.recv(16), b"")  # Read side shut down: EOF
+            self.assertEqual(watchdog.expired, "decision")
+            a.sendall(b"result")  # The write side stays open
+            self.assertEqual(b.recv(16), b"result")
+
+
+class DeadlineTest(unittest.TestCase):
+    """Game over a socketpair with short deadlines: the client is evicted and the connection closed."""
+
+    @classmethod
+    def setUpClass(cls):
+        timers.start()
+
+    def setUp(self):
+        self.server, self.client = socket.socketpair()
+        self.addCleanup(self.client.close)
+        self.before = metrics.snapshot().counters
+
+    def deadline(self, name, seconds):
+        saved = getattr(Game, name)
+        setattr(Game, name, seconds)
+        self.addCleanup(setattr, Game, name, saved)
+
+    def serve(self):
+        thread = threading.Thread(target=lambda: (Game.start(self.server), self.server.close()), daemon=True)
+        thread.start()
+        return thread
+
+    def delta(self, counter):
+        return metrics.snapshot().counters[counter] - self.before[counter]
+
+    def read_all(self):
+        """Frames until the server closes the connection."""
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        frames = []
+        while (frame := decoder.read_frame(self.client)) is not None:
+            frames.append((frame[0], bytes(frame[1])))
+        return frames
+
+    def test_decision_timeout_is_off_by_default(self):
+        self.assertEqual(Game.decision_timeout, 0)
+
+    def test_request_timeout(self):
+        self.deadline("request_timeout", 0.1)
+        thread = self.serve()
+        self.assertEqual(self.read_all(), [])  # Never sends a request
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.delta(EVICT_REQUEST), 1)
+
+    def test_decision_timeout_forfeits(self):
+        self.deadline("decision_timeout", 0.2)
+        thread = self.serve()
+        self.client.sendall(pack_request(50, "Sleeper", PROTOCOL_V2))
+        frames = self.read_all()  # Never decides
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        # The evicted client is still sent its lost round, then the connection closes
+        result, _ = unpack_cards(frames[-1][1])
+        self.assertEqual((len(frames), result), (2, PAYLOAD_LOSS))
+        self.assertEqual((self.delta(EVICT_DECISION), self.delta(ROUNDS), self.delta(LOSSES)), (1, 1, 1))
+        self.assertEqual(self.delta(ABANDONED), 0)
+
+    def test_idle_timeout_between_sessions(self):
+        self.deadline("idle_timeout", 0.1)
+        thread = self.serve()
+        self.client.sendall(pack_request(1, "Idler", PROTOCOL_V2))
+        decoder = FrameDecoder(CLIENT_INBOUND)
+        decoder.read_frame(self.client)
+        self.client.sendall(pack_payload(data_str="Stand"))
+        decoder.read_frame(self.client)  # Session over; the connection stays open, idle
+        self.assertIsNone(decoder.read_frame(self.client))
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual((self.delta(EVICT_IDLE), self.delta(ROUNDS)), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()